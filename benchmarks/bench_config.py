@@ -0,0 +1,47 @@
+"""
+Effect of the GDAL block cache and of the decode threads on reading and writing compressed GeoTIFFs.
+
+Run with `pytest benchmarks/bench_config.py`. The raster is tiled (256 x 256) and DEFLATE compressed.
+"""
+from __future__ import division
+
+import os
+
+import pytest
+import rasterpy as rpy
+
+THREADS = (1, 2, 4, 'ALL_CPUS')
+CACHEMAX = (16, 256, 1024)
+
+
+@pytest.mark.parametrize('num_threads', THREADS)
+def bench_to_array_threads(measure, compressed_raster_file, raster_nbytes, num_threads):
+    def read():
+        with rpy.gdal_config(num_threads=num_threads):
+            rpy.Raster(compressed_raster_file).to_array(flatten=False)
+
+    measure(read, raster_nbytes)
+
+
+@pytest.mark.parametrize('cachemax', CACHEMAX)
+def bench_to_array_cachemax(measure, compressed_raster_file, raster_nbytes, cachemax):
+    def read():
+        with rpy.gdal_config(cachemax=cachemax):
+            raster = rpy.Raster(compressed_raster_file)
+            raster.to_array(band=1, flatten=False)
+            raster.to_array(flatten=False)
+
+    measure(read, raster_nbytes)
+
+
+@pytest.mark.parametrize('num_threads', THREADS)
+def bench_write_threads(measure, compressed_raster_file, out_dir, num_threads):
+    raster = rpy.Raster(compressed_raster_file)
+    raster.to_array(flatten=False)
+    filename = os.path.join(out_dir, 'out.tif')
+
+    def write():
+        with rpy.gdal_config(num_threads=num_threads):
+            raster.write(raster.array, filename, options=['COMPRESS=DEFLATE', 'TILED=YES'])
+
+    measure(write, raster.array.nbytes)
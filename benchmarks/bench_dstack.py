@@ -0,0 +1,74 @@
+"""
+Compare the time and peak memory of Raster.dstack(unfold=True) with the former implementation, which built the stack
+with numpy.column_stack and needed a Raster.flatten call for 3-D arrays.
+
+Usage: python benchmarks/bench_dstack.py [--rows 2000] [--cols 2000] [--bands 6] [--repeat 5]
+"""
+from __future__ import division, print_function
+
+import argparse
+import timeit
+import tracemalloc
+
+import numpy as np
+import rasterpy as rpy
+
+
+def legacy_dstack(array):
+    # Former code path: Raster.flatten for 3-D arrays followed by a second call that column stacks the bands.
+    if array.ndim >= 3:
+        image = np.zeros((array.shape[0], array[0].size,), dtype=array.dtype)
+
+        for b in range(array.shape[0]):
+            image[b] = array[b].flatten()
+
+        array = image
+
+    return np.column_stack(tuple([array[i] for i in range(array.shape[0])]))
+
+
+def current_dstack(array, copy):
+    raster = rpy.Raster.__new__(rpy.Raster)
+    raster.raster = None
+    raster.array = array
+    raster.dstack(unfold=True, copy=copy)
+
+    return raster.stack
+
+
+def measure(func, repeat):
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--cols', type=int, default=2000)
+    parser.add_argument('--bands', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    array = np.random.rand(args.bands, args.rows, args.cols).astype(np.float32)
+    size = array.nbytes / 2 ** 20
+
+    print("Array (bands, rows, cols) = {0}, {1:.1f} MB".format(array.shape, size))
+    print("{0:<24}{1:>12}{2:>16}".format('implementation', 'time [ms]', 'peak [MB]'))
+
+    cases = (('legacy (flatten + stack)', lambda: legacy_dstack(array)),
+             ('dstack (view)', lambda: current_dstack(array, False)),
+             ('dstack (copy=True)', lambda: current_dstack(array, True)))
+
+    for name, func in cases:
+        seconds, peak = measure(func, args.repeat)
+        print("{0:<24}{1:>12.2f}{2:>16.1f}".format(name, seconds * 1000, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Import time of rasterpy in a fresh interpreter.
+
+Run with `pytest benchmarks/bench_import.py`. Each round starts a new Python process, so the modules are not cached.
+The time of the interpreter start without any import is attached as extra info 'baseline_s'. The extra info 'modules'
+lists the GDAL modules loaded by the statement.
+"""
+from __future__ import division
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+STATEMENTS = {
+    'conversion': 'import rasterpy.conversion',
+    'package': 'import rasterpy',
+    'raster': 'import rasterpy; rasterpy.Raster',
+}
+
+OSGEO = "import sys; print(','.join(sorted([name for name in sys.modules if name.startswith('osgeo.')])))"
+
+
+def interpreter(statement):
+    subprocess.check_call([sys.executable, '-c', statement])
+
+
+@pytest.mark.parametrize('name', sorted(STATEMENTS))
+def bench_import(benchmark, name):
+    statement = STATEMENTS[name]
+
+    start = time.time()
+    for _ in range(5):
+        interpreter('pass')
+    baseline = (time.time() - start) / 5
+
+    benchmark.pedantic(interpreter, args=(statement,), rounds=5)
+
+    modules = subprocess.check_output([sys.executable, '-c', statement + '; ' + OSGEO])
+
+    benchmark.extra_info['baseline_s'] = baseline
+    benchmark.extra_info['modules'] = modules.decode().strip()
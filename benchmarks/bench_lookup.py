@@ -0,0 +1,49 @@
+"""
+Compare the time of the conversion of an integer array with convert_kernel and with the lookup table of
+Raster.convert, e.g. for a quantified BSC in uint16 to a BRF in dB.
+
+Usage: python benchmarks/bench_lookup.py [--rows 4000] [--cols 4000] [--dtype uint16] [--repeat 5]
+"""
+from __future__ import division, print_function
+
+import argparse
+import timeit
+
+import numpy as np
+from rasterpy import conversion
+
+PARAMS = dict(system='BSC', to='BRF', system_unit='linear', output_unit='dB', iza=0.5, vza=0.3, angle_unit='RAD',
+              nodata=-99999, quantification_factor=10000)
+
+
+def lookup(array):
+    table = conversion.lookup_table(array.dtype, **PARAMS)
+
+    return conversion.lookup_kernel(array, table=table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=4000)
+    parser.add_argument('--cols', type=int, default=4000)
+    parser.add_argument('--dtype', default='uint16')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    info = np.iinfo(args.dtype)
+    array = np.random.randint(info.min, info.max + 1, size=(args.rows, args.cols)).astype(args.dtype)
+
+    print("Array (rows, cols) = {0}, {1}".format(array.shape, array.dtype))
+    print("{0:<24}{1:>12}".format('implementation', 'time [ms]'))
+
+    cases = (('convert_kernel', lambda: conversion.convert_kernel(array, **PARAMS)),
+             ('lookup table', lambda: lookup(array)))
+
+    with np.errstate(divide='ignore'):
+        for name, func in cases:
+            seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print("{0:<24}{1:>12.2f}".format(name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmarks of the read, convert and write hot paths of rasterpy.Raster.
+
+Run with `pytest benchmarks` (requires pytest-benchmark). See benchmarks/conftest.py for the raster options.
+"""
+from __future__ import division
+
+import os
+
+import numpy as np
+import pytest
+import rasterpy as rpy
+
+CONVERSIONS = (('BSC', 'BRDF'), ('BSC', 'BRF'), ('BRDF', 'BSC'), ('BRDF', 'BRF'), ('BRF', 'BSC'), ('BRF', 'BRDF'))
+UNITS = (('linear', 'linear'), ('linear', 'dB'), ('dB', 'linear'), ('dB', 'dB'))
+
+
+def bench_open(measure, raster_file):
+    measure(lambda: rpy.Raster(raster_file), os.path.getsize(raster_file))
+
+
+@pytest.mark.parametrize('flatten', (True, False))
+def bench_to_array(measure, raster_file, raster_nbytes, flatten):
+    raster = rpy.Raster(raster_file)
+    measure(lambda: raster.to_array(flatten=flatten), raster_nbytes)
+
+
+@pytest.mark.parametrize('band', (1, (1, 2)))
+def bench_to_array_band(measure, raster_file, raster_config, band):
+    raster = rpy.Raster(raster_file)
+    nbands = 1 if isinstance(band, int) else len(band)
+    nbytes = raster_config['rows'] * raster_config['cols'] * nbands * raster_config['dtype'].itemsize
+
+    measure(lambda: raster.to_array(band=band), nbytes)
+
+
+def bench_to_array_quantification(measure, raster_file, raster_nbytes):
+    raster = rpy.Raster(raster_file)
+    measure(lambda: raster.to_array(flatten=False, quantification_factor=10000), raster_nbytes)
+
+
+@pytest.mark.parametrize('system, to', CONVERSIONS)
+@pytest.mark.parametrize('system_unit, output_unit', UNITS)
+def bench_convert(measure, raster_file, system, to, system_unit, output_unit):
+    raster = rpy.Raster(raster_file)
+    raster.to_array(flatten=False)
+    array = raster.array
+
+    def setup():
+        raster.array = array.copy()
+
+    measure(lambda: raster.convert(system, to, system_unit, output_unit, iza=0.5, vza=0.3), array.nbytes,
+            setup=setup)
+
+
+@pytest.mark.parametrize('copy', (False, True))
+def bench_dstack(measure, raster_file, copy):
+    raster = rpy.Raster(raster_file)
+    raster.to_array()
+    measure(lambda: raster.dstack(unfold=True, copy=copy), raster.array.nbytes)
+
+
+def bench_extract_point(measure, raster_file, point_file, raster_config):
+    raster = rpy.Raster(raster_file)
+    nbytes = raster_config['points'] * raster_config['bands'] * raster_config['dtype'].itemsize
+
+    measure(lambda: raster.extract_point(point_file), nbytes)
+
+
+@pytest.mark.parametrize('extension', ('tif', 'bin'))
+def bench_write(measure, raster_file, out_dir, extension):
+    raster = rpy.Raster(raster_file)
+    raster.to_array(flatten=False)
+    filename = os.path.join(out_dir, 'out.{0}'.format(extension))
+
+    measure(lambda: raster.write(raster.array, filename), raster.array.nbytes)
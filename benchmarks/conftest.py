@@ -0,0 +1,183 @@
+"""
+Fixtures of the benchmark suite. The raster files are synthesized with the size, number of bands, data type, tiling
+and compression given on the command line, e.g.
+
+    pytest benchmarks --rows 4096 --cols 4096 --bands 4 --dtype uint16 --tile 256 --compress DEFLATE
+
+Besides the timings of pytest-benchmark, the extra info of each benchmark contains the throughput in MB/s, the peak
+of the numpy allocations (tracemalloc) and the maximum resident set size of the process in MB.
+"""
+from __future__ import division
+
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+from osgeo import gdal, gdal_array, ogr, osr
+
+if sys.platform != 'win32':
+    import resource
+else:
+    resource = None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('rasterpy', 'synthetic rasters of the rasterpy benchmarks')
+    group.addoption('--rows', type=int, default=2048, help='Number of rows of the synthetic raster.')
+    group.addoption('--cols', type=int, default=2048, help='Number of columns of the synthetic raster.')
+    group.addoption('--bands', type=int, default=4, help='Number of bands of the synthetic raster.')
+    group.addoption('--dtype', default='float32', help='Numpy data type of the synthetic raster.')
+    group.addoption('--tile', type=int, default=0, help='Tile size of the GeoTIFF. 0 writes a striped GeoTIFF.')
+    group.addoption('--compress', default='NONE', help='GeoTIFF compression like NONE, LZW or DEFLATE.')
+    group.addoption('--points', type=int, default=1000, help='Number of points for extract_point.')
+
+
+@pytest.fixture(scope='session')
+def raster_config(request):
+    option = request.config.getoption
+
+    return dict(rows=option('rows'), cols=option('cols'), bands=option('bands'), dtype=np.dtype(option('dtype')),
+                tile=option('tile'), compress=option('compress'), points=option('points'))
+
+
+def synthesize(filename, rows, cols, bands, dtype, tile=0, compress='NONE'):
+    """
+    Synthesize a GeoTIFF in UTM 32N with 20 m resolution.
+    """
+    options = ['COMPRESS={0}'.format(compress)]
+    if tile > 0:
+        options += ['TILED=YES', 'BLOCKXSIZE={0}'.format(tile), 'BLOCKYSIZE={0}'.format(tile)]
+
+    gdal_dtype = gdal_array.NumericTypeCodeToGDALTypeCode(dtype.type)
+    outds = gdal.GetDriverByName('GTiff').Create(filename, cols, rows, bands, gdal_dtype, options)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32632)
+    outds.SetGeoTransform([625680.0, 20.0, 0.0, 5693480.0, 0.0, -20.0])
+    outds.SetProjection(srs.ExportToWkt())
+
+    random = np.random.RandomState(42)
+    for i in range(bands):
+        if np.issubdtype(dtype, np.integer):
+            data = random.randint(1, 10000, (rows, cols))
+        else:
+            data = random.uniform(0.01, 1, (rows, cols))
+
+        out_band = outds.GetRasterBand(i + 1)
+        out_band.WriteArray(data.astype(dtype))
+        out_band.SetNoDataValue(0)
+
+    outds = None
+
+    return filename
+
+
+@pytest.fixture(scope='session')
+def raster_file(tmpdir_factory, raster_config):
+    """
+    GeoTIFF with the options of the command line.
+    """
+    config = raster_config
+    filename = str(tmpdir_factory.mktemp('raster').join('synthetic.tif'))
+
+    return synthesize(filename, config['rows'], config['cols'], config['bands'], config['dtype'], config['tile'],
+                      config['compress'])
+
+
+@pytest.fixture(scope='session')
+def compressed_raster_file(tmpdir_factory, raster_config):
+    """
+    Tiled and DEFLATE compressed GeoTIFF with the size of the command line options.
+    """
+    config = raster_config
+    filename = str(tmpdir_factory.mktemp('raster').join('compressed.tif'))
+
+    return synthesize(filename, config['rows'], config['cols'], config['bands'], config['dtype'], 256, 'DEFLATE')
+
+
+@pytest.fixture(scope='session')
+def point_file(tmpdir_factory, raster_config):
+    """
+    Point shape file with random points within the synthetic raster.
+    """
+    config = raster_config
+    filename = str(tmpdir_factory.mktemp('shape').join('points.shp'))
+
+    shape = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(filename)
+    layer = shape.CreateLayer('points', geom_type=ogr.wkbPoint)
+
+    random = np.random.RandomState(42)
+    xs = 625680.0 + random.uniform(0, config['cols'] * 20.0, config['points'])
+    ys = 5693480.0 - random.uniform(0, config['rows'] * 20.0, config['points'])
+
+    for x, y in zip(xs, ys):
+        point = ogr.Geometry(ogr.wkbPoint)
+        point.AddPoint(x, y)
+
+        feat = ogr.Feature(layer.GetLayerDefn())
+        feat.SetGeometry(point)
+        layer.CreateFeature(feat)
+
+    shape = None
+
+    return filename
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Benchmark a function and attach the throughput and memory usage to the extra info of the benchmark.
+
+    The returned function takes the benchmarked function, the number of processed bytes and optionally a setup
+    function, which is called before each round and is not timed.
+    """
+
+    def run(func, nbytes, setup=None, rounds=5):
+        if setup is None:
+            result = benchmark(func)
+        else:
+            result = benchmark.pedantic(func, setup=setup, rounds=rounds)
+
+        if setup is not None:
+            setup()
+
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        mean = benchmark.stats.stats.mean
+        benchmark.extra_info['MB'] = nbytes / 2 ** 20
+        benchmark.extra_info['MB/s'] = nbytes / 2 ** 20 / mean if mean > 0 else float('inf')
+        benchmark.extra_info['peak_alloc_MB'] = peak / 2 ** 20
+
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+            scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+            benchmark.extra_info['max_rss_MB'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+        return result
+
+    return run
+
+
+@pytest.fixture
+def raster_nbytes(raster_config):
+    config = raster_config
+
+    return config['rows'] * config['cols'] * config['bands'] * config['dtype'].itemsize
+
+
+@pytest.fixture
+def out_dir(tmpdir):
+    return str(tmpdir)
+
+
+@pytest.fixture(autouse=True)
+def keep_cwd():
+    # Raster and Raster.write change the working directory if a path is given.
+    cwd = os.getcwd()
+    yield
+    os.chdir(cwd)
@@ -1,2 +1,31 @@
-from .raster import Raster
-from .auxiliary import RasterResult
\ No newline at end of file
+import importlib
+import sys
+
+from .auxiliary import RasterResult
+from .profiling import Profiler
+from .executor import SerialExecutor, ThreadExecutor, ProcessExecutor
+from . import cache
+from . import conversion
+from . import focal
+from . import polsar
+
+# Raster and gdal_config import GDAL. With Python >= 3.7 they are imported on first access, so the conversions and
+# executors can be used without loading GDAL.
+_lazy = {'Raster': '.raster', 'gdal_config': '.config'}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in _lazy:
+            value = getattr(importlib.import_module(_lazy[name], __name__), name)
+            globals()[name] = value
+
+            return value
+
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+    def __dir__():
+        return sorted(list(globals().keys()) + list(_lazy.keys()))
+
+else:
+    from .raster import Raster
+    from .config import gdal_config
@@ -0,0 +1,177 @@
+"""
+Asyncio interface of Raster (Python >= 3.5).
+
+The blocking GDAL calls are offloaded to a bounded thread pool. The number of operations in flight is limited by a
+semaphore per event loop, so a producer which awaits the operations is slowed down when the pool is saturated
+(backpressure). Operations of the same Raster are serialized, because a GDAL data set must not be used by several
+threads at once.
+
+Example
+-------
+>>> import asyncio
+>>> from rasterpy.aio import Raster
+>>> async def read(filename):
+...     raster = await Raster.aopen(filename)
+...     await raster.ato_array(flatten=False)
+...     return raster.array
+>>> async def main(filenames):
+...     return await asyncio.gather(*[read(f) for f in filenames])
+>>> arrays = asyncio.run(main(filenames))
+
+Notes
+-----
+Raster changes the working directory if a path is given. Use absolute filenames and path=None with concurrent
+operations. A cancelled operation which is already running in the pool is finished in the background, because GDAL
+reads cannot be interrupted. Its slot is released afterwards.
+"""
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+from . import raster
+
+__all__ = ['Raster', 'run', 'set_limits']
+
+_limits = {'max_workers': min(32, cpu_count() + 4), 'max_in_flight': 256}
+_pool = None
+_semaphores = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+# asyncio.get_event_loop returns the running loop inside of coroutines, but is deprecated since Python 3.10.
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+def set_limits(max_workers=None, max_in_flight=None):
+    """
+    Set the size of the thread pool and the maximum number of operations in flight.
+
+    Parameters
+    ----------
+    max_workers : int or None, optional
+        Number of threads of the pool, which execute the GDAL calls. Default is min(32, CPUs + 4).
+    max_in_flight : int or None, optional
+        Maximum number of submitted operations per event loop, including the queued ones. Further operations wait
+        until a slot is free. Default is 256.
+
+    """
+    global _pool
+
+    with _lock:
+        if max_workers is not None:
+            _limits['max_workers'] = max_workers
+
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+                _pool = None
+
+        if max_in_flight is not None:
+            _limits['max_in_flight'] = max_in_flight
+            _semaphores.clear()
+
+
+def _executor():
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(_limits['max_workers'])
+
+        return _pool
+
+
+def _semaphore(loop):
+    with _lock:
+        semaphore = _semaphores.get(loop)
+
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(_limits['max_in_flight'])
+            _semaphores[loop] = semaphore
+
+        return semaphore
+
+
+def _release(loop, semaphore):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # The event loop is already closed.
+        pass
+
+
+async def run(func, *args, **kwargs):
+    """
+    Execute a blocking function in the thread pool of rasterpy.aio.
+
+    The slot of the operation is released when the function has finished in the pool, also if the awaiting task was
+    cancelled in the meantime.
+    """
+    loop = _running_loop()
+    semaphore = _semaphore(loop)
+
+    await semaphore.acquire()
+
+    try:
+        future = _executor().submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        semaphore.release()
+        raise
+
+    future.add_done_callback(lambda _: _release(loop, semaphore))
+
+    return await asyncio.wrap_future(future, loop=loop)
+
+
+def _serialized(raster, method, *args, **kwargs):
+    """
+    Call a method of a Raster while holding the lock of the Raster.
+    """
+    with _lock:
+        lock = raster.__dict__.setdefault('_aio_lock', threading.Lock())
+
+    with lock:
+        return getattr(raster, method)(*args, **kwargs)
+
+
+class Raster(raster.Raster):
+    """
+    Raster with coroutines for opening, reading and writing. See rasterpy.Raster for the parameters.
+    """
+
+    def __getstate__(self):
+        state = super(Raster, self).__getstate__()
+        state.pop('_aio_lock', None)
+
+        return state
+
+    @classmethod
+    async def aopen(cls, filename=None, path=None, extension=None, check_dim=False):
+        """
+        Open raster files without blocking the event loop.
+
+        Returns
+        -------
+        rasterpy.aio.Raster
+
+        """
+        return await run(cls, filename, path=path, extension=extension, check_dim=check_dim)
+
+    async def arun(self, method, *args, **kwargs):
+        """
+        Execute a method of Raster, e.g. 'to_cube' or 'extract_point', without blocking the event loop.
+        """
+        return await run(_serialized, self, method, *args, **kwargs)
+
+    async def ato_array(self, *args, **kwargs):
+        """
+        Coroutine of Raster.to_array.
+        """
+        return await self.arun('to_array', *args, **kwargs)
+
+    async def awrite(self, *args, **kwargs):
+        """
+        Coroutine of Raster.write.
+        """
+        return await self.arun('write', *args, **kwargs)
@@ -1,3 +1,12 @@
+import sys
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+if sys.version_info >= (3, 0):
+    intern = sys.intern
+
+
 class RasterResult(dict):
     """ Represents the reflectance result.
 
@@ -53,4 +62,357 @@ class RasterResult(dict):
             return self.__class__.__name__ + "()"
 
     def __dir__(self):
-        return list(self.keys())
\ No newline at end of file
+        return list(self.keys())
+
+
+class FootprintIndex(object):
+    """
+    Grid index over the footprints of raster files.
+
+    The footprints are assigned to the cells of a regular grid, whose cell size is the median footprint size. A query
+    only tests the footprints in the cell of each point. All operations are vectorised with numpy.
+
+    Parameters
+    ----------
+    xmin, ymin, xmax, ymax : array_like
+        Bounds of the footprints in map coordinates.
+    cell_size : float or None, optional
+        Size of the grid cells in map units. If None the median size of the footprints is used.
+
+    """
+
+    def __init__(self, xmin, ymin, xmax, ymax, cell_size=None):
+        self.xmin = np.asarray(xmin, dtype=np.float64)
+        self.ymin = np.asarray(ymin, dtype=np.float64)
+        self.xmax = np.asarray(xmax, dtype=np.float64)
+        self.ymax = np.asarray(ymax, dtype=np.float64)
+
+        if cell_size is None:
+            cell_size = np.median(np.maximum(self.xmax - self.xmin, self.ymax - self.ymin))
+
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self.x0, self.y0 = self.xmin.min(), self.ymin.min()
+
+        cx0, cy0 = self.__cell(self.xmin, self.ymin)
+        cx1, cy1 = self.__cell(self.xmax, self.ymax)
+
+        self.ncx, self.ncy = int(cx1.max()) + 1, int(cy1.max()) + 1
+
+        keys, tiles = [], []
+        for k in range(self.xmin.size):
+            cx = np.arange(cx0[k], cx1[k] + 1)
+            cy = np.arange(cy0[k], cy1[k] + 1)
+            key = (cy[:, np.newaxis] * self.ncx + cx[np.newaxis, :]).ravel()
+
+            keys.append(key)
+            tiles.append(np.full(key.size, k, dtype=np.intp))
+
+        keys = np.concatenate(keys)
+        tiles = np.concatenate(tiles)
+        order = np.argsort(keys, kind='mergesort')
+
+        self.keys = keys[order]
+        self.tiles = tiles[order]
+
+    def __cell(self, x, y):
+        cx = np.floor((np.asarray(x, dtype=np.float64) - self.x0) / self.cell_size).astype(np.intp)
+        cy = np.floor((np.asarray(y, dtype=np.float64) - self.y0) / self.cell_size).astype(np.intp)
+
+        return cx, cy
+
+    def query(self, x, y):
+        """
+        Find the footprints which contain the points.
+
+        Parameters
+        ----------
+        x, y : array_like
+            Coordinates of the points.
+
+        Returns
+        -------
+        point, tile : array_like
+            Index of the point and index of the footprint for each match, ordered by the point index.
+
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+
+        cx, cy = self.__cell(x, y)
+        valid = (cx >= 0) & (cy >= 0) & (cx < self.ncx) & (cy < self.ncy)
+        key = np.where(valid, cy * self.ncx + cx, -1)
+
+        start = np.searchsorted(self.keys, key, side='left')
+        end = np.searchsorted(self.keys, key, side='right')
+        count = np.where(valid, end - start, 0)
+
+        point = np.repeat(np.arange(x.size), count)
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        tile = self.tiles[np.repeat(start, count) + offset]
+
+        inside = ((x[point] >= self.xmin[tile]) & (x[point] < self.xmax[tile]) &
+                  (y[point] > self.ymin[tile]) & (y[point] <= self.ymax[tile]))
+
+        return point[inside], tile[inside]
+
+
+class FileRecord(object):
+    """
+    Metadata of one raster file in a MetadataTable.
+    """
+
+    __slots__ = ('cols', 'rows', 'bands', 'geotransform', 'nodata', 'projection', 'dtype', 'driver')
+
+    def __init__(self, cols, rows, bands, geotransform, nodata, projection, dtype, driver):
+        self.cols = cols
+        self.rows = rows
+        self.bands = bands
+        self.geotransform = geotransform
+        self.nodata = nodata
+        self.projection = projection
+        self.dtype = dtype
+        self.driver = driver
+
+    def __repr__(self):
+        return 'FileRecord(cols={0}, rows={1}, bands={2}, dtype={3}, driver={4})'.format(
+            self.cols, self.rows, self.bands, self.dtype, self.driver)
+
+
+class MetadataTable(object):
+    """
+    Metadata of raster files as a structure of arrays.
+
+    The numeric metadata are stored in one numpy structured array with a row for each file. Projections, data types and
+    driver names are stored once and referenced by their index, so equal strings of many files are not repeated.
+    Extents, dimension checks and geotransform calculations are vectorised over all files.
+
+    Parameters
+    ----------
+    cols, rows, bands : sequence
+        Dimension of each file.
+    geotransform : sequence
+        Geotransform of each file.
+    nodata : sequence
+        No data value of each file.
+    projection, dtype, driver : sequence
+        Projection (WKT), GDAL data type name and driver name of each file.
+
+    Attributes
+    ----------
+    data : numpy.ndarray
+        Structured array with the fields cols, rows, bands, geotransform, nodata, projection, dtype and driver. The last
+        three fields are indices into the lists projections, dtypes and drivers.
+    projections, dtypes, drivers : list
+        Unique, interned strings.
+
+    """
+
+    DTYPE = np.dtype([('cols', np.int64), ('rows', np.int64), ('bands', np.int32), ('geotransform', np.float64, (6,)),
+                      ('nodata', np.float64), ('projection', np.int32), ('dtype', np.int16), ('driver', np.int16)])
+
+    def __init__(self, cols, rows, bands, geotransform, nodata, projection, dtype, driver):
+        self.data = np.zeros(len(cols), dtype=self.DTYPE)
+
+        self.data['cols'] = cols
+        self.data['rows'] = rows
+        self.data['bands'] = bands
+        self.data['geotransform'] = np.asarray(geotransform, dtype=np.float64).reshape((-1, 6))
+        self.data['nodata'] = nodata
+
+        self.projections, self.data['projection'] = self.__intern(projection)
+        self.dtypes, self.data['dtype'] = self.__intern(dtype)
+        self.drivers, self.data['driver'] = self.__intern(driver)
+
+    @staticmethod
+    def __intern(values):
+        """
+        Unique strings and the index of each value into them.
+        """
+        unique, index = {}, np.zeros(len(values), dtype=np.int32)
+
+        for i, value in enumerate(values):
+            index[i] = unique.setdefault(value, len(unique))
+
+        strings = [None] * len(unique)
+        for value, i in unique.items():
+            strings[i] = intern(value) if isinstance(value, str) else value
+
+        return strings, index
+
+    def __len__(self):
+        return self.data.size
+
+    def __getitem__(self, i):
+        row = self.data[i]
+
+        return FileRecord(int(row['cols']), int(row['rows']), int(row['bands']), tuple(row['geotransform'].tolist()),
+                          float(row['nodata']), self.projections[row['projection']], self.dtypes[row['dtype']],
+                          self.drivers[row['driver']])
+
+    def column(self, name):
+        """
+        Values of a field for all files. Projections, data types and drivers are returned as strings.
+
+        Returns
+        -------
+        tuple
+
+        """
+        if name == 'projection':
+            return tuple([self.projections[i] for i in self.data['projection']])
+        elif name == 'dtype':
+            return tuple([self.dtypes[i] for i in self.data['dtype']])
+        elif name == 'driver':
+            return tuple([self.drivers[i] for i in self.data['driver']])
+        elif name == 'geotransform':
+            return tuple(map(tuple, self.data['geotransform'].tolist()))
+
+        return tuple(self.data[name].tolist())
+
+    def bounds(self):
+        """
+        Extent of each file.
+
+        Returns
+        -------
+        array_like
+            Array with the dimension (files, 4) and the columns xmin, ymin, xmax, ymax.
+
+        """
+        gt = self.data['geotransform']
+
+        x = np.stack([gt[:, 0], gt[:, 0] + self.data['cols'] * gt[:, 1]], axis=1)
+        y = np.stack([gt[:, 3], gt[:, 3] + self.data['rows'] * gt[:, 5]], axis=1)
+
+        return np.column_stack([x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)])
+
+    def intersects(self, bbox):
+        """
+        Indices of the files whose extent intersects a bounding box (xmin, ymin, xmax, ymax).
+        """
+        bounds = self.bounds()
+
+        return np.flatnonzero((bounds[:, 0] < bbox[2]) & (bounds[:, 2] > bbox[0]) &
+                              (bounds[:, 1] < bbox[3]) & (bounds[:, 3] > bbox[1]))
+
+    def same_dim(self, bands=False):
+        """
+        True if all files have the same number of rows and columns, and optionally of bands.
+        """
+        fields = ('rows', 'cols', 'bands') if bands else ('rows', 'cols')
+
+        return all([np.all(self.data[name] == self.data[name][:1]) for name in fields])
+
+
+class CopyOnWrite(NDArrayOperatorsMixin):
+    """
+    Copy of an array, which shares the memory of the source array until it is changed.
+
+    Reading the copy, e.g. indexing, numpy functions or arithmetic operators, uses a read-only view of the source. The
+    first write, i.e. an item assignment or an in-place operation, copies the source into a private buffer, so the
+    source is never changed by the copy. The source must not be changed while it is shared, see Raster.copy.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Array to copy.
+
+    Attributes
+    ----------
+    array : numpy.ndarray
+        A read-only view of the source or the private buffer.
+    materialized : bool
+        True if the copy has a private buffer.
+
+    """
+
+    def __init__(self, source):
+        self.__source = source
+        self.__private = None
+
+    @property
+    def materialized(self):
+        return self.__private is not None
+
+    @property
+    def array(self):
+        if self.__private is not None:
+            return self.__private
+
+        view = self.__source.view()
+        view.flags.writeable = False
+
+        return view
+
+    def materialize(self):
+        """
+        Copy the source into the private buffer, if this has not been done yet, and return the writable buffer.
+        """
+        if self.__private is None:
+            self.__private = np.array(self.__source, copy=True)
+            self.__source = None
+
+        return self.__private
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+    @property
+    def dtype(self):
+        return self.array.dtype
+
+    @property
+    def ndim(self):
+        return self.array.ndim
+
+    @property
+    def size(self):
+        return self.array.size
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    def __len__(self):
+        return len(self.array)
+
+    def __repr__(self):
+        return 'CopyOnWrite({0})'.format(repr(self.array))
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.array, dtype=dtype, copy=True)
+
+        if copy is False and dtype is not None and np.dtype(dtype) != self.dtype:
+            raise ValueError("A copy is required to convert the array to {0}.".format(np.dtype(dtype)))
+
+        return self.array if dtype is None else self.array.astype(dtype, copy=False)
+
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __setitem__(self, index, value):
+        self.materialize()[index] = value
+
+    def __getattr__(self, name):
+        # Further attributes and methods of numpy arrays, e.g. mean or reshape, are taken from the read-only array.
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return getattr(self.array, name)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        out = kwargs.get('out', ())
+
+        if out:
+            kwargs['out'] = tuple([item.materialize() if isinstance(item, CopyOnWrite) else item for item in out])
+
+        inputs = [item.array if isinstance(item, CopyOnWrite) else item for item in inputs]
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+
+        # In-place operators return the copy itself.
+        if len(out) == 1 and isinstance(out[0], CopyOnWrite):
+            return out[0]
+
+        return result
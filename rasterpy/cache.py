@@ -0,0 +1,215 @@
+"""
+Opt-in process-wide cache of band reads.
+
+If the cache is enabled, the bands read by Raster.to_array are stored with the key (path, mtime, band, window, dtype).
+Further Raster instances of the same file read the band from the cache as long as the file is not modified. The cache
+has a budget in bytes and evicts the least recently used bands. The cached arrays are read-only, so they cannot be
+changed by the callers.
+
+Example
+-------
+>>> import rasterpy as rpy
+>>> rpy.cache.enable(max_bytes=512 * 2 ** 20)
+>>> for job in jobs:
+...     grid = rpy.Raster('RGB.byte.tif')
+...     grid.to_array(band=1)
+>>> rpy.cache.info().hits
+"""
+from __future__ import division
+
+import os
+import threading
+from collections import OrderedDict
+
+from .auxiliary import RasterResult
+
+
+class BandCache(object):
+    """
+    LRU cache of arrays with a budget in bytes.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum size of all cached arrays in bytes. Arrays that are larger than the budget are not cached. Default is
+        256 MB.
+
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        """
+        Cached array of the key or None. A hit marks the array as most recently used.
+        """
+        with self.__lock:
+            array = self.__entries.pop(key, None)
+
+            if array is None:
+                self.misses += 1
+                return None
+
+            self.__entries[key] = array
+            self.hits += 1
+
+            return array
+
+    def put(self, key, array):
+        """
+        Store an array. The array is made read-only and the least recently used arrays are evicted, until the budget
+        is kept.
+        """
+        if array.nbytes > self.max_bytes:
+            return
+
+        array.flags.writeable = False
+
+        with self.__lock:
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+
+            self.__entries[key] = array
+            self.nbytes += array.nbytes
+
+            self.__evict()
+
+    def resize(self, max_bytes):
+        """
+        Change the budget. The least recently used arrays are evicted at once, until the new budget is kept.
+        """
+        with self.__lock:
+            self.max_bytes = int(max_bytes)
+            self.__evict()
+
+    def __evict(self):
+        # Must be called with the lock held.
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.__entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Delete all arrays and reset the counters.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.nbytes = self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """
+        Counters of the cache.
+
+        Returns
+        -------
+        RasterResult
+            The attributes hits, misses, evictions, entries, nbytes and max_bytes.
+
+        """
+        return RasterResult(hits=self.hits, misses=self.misses, evictions=self.evictions, entries=len(self),
+                            nbytes=self.nbytes, max_bytes=self.max_bytes)
+
+
+# The cache of the process. None as long as the cache is disabled.
+_cache = None
+
+
+def enable(max_bytes=256 * 2 ** 20):
+    """
+    Enable the band cache of the process or change its budget.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum size of all cached bands in bytes. Default is 256 MB.
+
+    Returns
+    -------
+    BandCache
+
+    """
+    global _cache
+
+    if _cache is None:
+        _cache = BandCache(max_bytes)
+    else:
+        _cache.resize(max_bytes)
+
+    return _cache
+
+
+def disable():
+    """
+    Disable the band cache and release the cached bands.
+    """
+    global _cache
+
+    if _cache is not None:
+        _cache.clear()
+
+    _cache = None
+
+
+def active():
+    """
+    The band cache of the process or None if it is disabled.
+    """
+    return _cache
+
+
+def clear():
+    """
+    Delete all cached bands and reset the counters.
+    """
+    if _cache is not None:
+        _cache.clear()
+
+
+def info():
+    """
+    Counters of the band cache. See BandCache.info.
+    """
+    if _cache is None:
+        return RasterResult(hits=0, misses=0, evictions=0, entries=0, nbytes=0, max_bytes=0)
+
+    return _cache.info()
+
+
+def key(path, band, window, dtype):
+    """
+    Cache key of a band read. Only files on disk are cached, so the key is None for in-memory and virtual data sets.
+
+    Parameters
+    ----------
+    path : str
+        Filename of the data set.
+    band : int
+        GDAL band index.
+    window : tuple
+        Pixel window (xoff, yoff, xsize, ysize).
+    dtype : str
+        GDAL data type name.
+
+    Returns
+    -------
+    tuple or None
+
+    """
+    if not path or not os.path.isfile(path):
+        return None
+
+    stat = os.stat(path)
+
+    return os.path.abspath(path), stat.st_mtime, stat.st_size, band, tuple(window), dtype
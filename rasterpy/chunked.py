@@ -0,0 +1,188 @@
+"""
+Lazily read arrays of raster files for chunked array libraries like dask.
+
+A `BandArray` behaves like a read-only numpy array with the dimension (bands, rows, cols). Indexing it with slices
+reads only the requested window with GDAL. Each thread opens its own GDAL data set, because data sets must not be
+shared between threads. The data sets are closed with `BandArray.close` or when the BandArray is deleted. Data sets
+without a file, e.g. the in-memory virtual data sets of a target grid or a mosaic, are shared and read under a lock.
+"""
+from __future__ import division
+
+import os
+import threading
+import uuid
+
+import numpy as np
+from osgeo import gdal
+from osgeo.gdalconst import GA_ReadOnly
+
+
+class BandArray(object):
+    """
+    Array-like view of the bands of a raster file, which is read lazily with windowed GDAL reads.
+
+    Parameters
+    ----------
+    dataset : osgeo.gdal.Dataset
+        Opened gdal data set.
+    bands : list
+        GDAL band indices.
+    window : tuple
+        Pixel window (xoff, yoff, xsize, ysize) of the view.
+    dtype : numpy.dtype
+        Data type of the view.
+    nodata : int or float
+        No data value, which replaces NaN values.
+    quantification_factor : int, optional
+        If greater than 1 the values are divided by the factor. Default is 1.
+
+    Attributes
+    ----------
+    token : str
+        Identity of the data, e.g. for the names of dask arrays. It is the path of the file or a unique id for data
+        sets without a file.
+
+    """
+
+    ndim = 3
+
+    def __init__(self, dataset, bands, window, dtype, nodata, quantification_factor=1):
+        description = dataset.GetDescription()
+
+        if description and os.path.exists(description):
+            self.path = os.path.abspath(description)
+        elif description.startswith('/vsi') and not description.startswith('/vsimem/'):
+            self.path = description
+        else:
+            self.path = None
+
+        self.token = self.path or 'rasterpy-{0}'.format(uuid.uuid4().hex)
+        self.bands = list(bands)
+        self.window = tuple(window)
+        self.dtype = np.dtype(dtype)
+        self.nodata = nodata
+        self.quantification_factor = quantification_factor
+        self.shape = (len(self.bands), self.window[3], self.window[2])
+
+        self.__dataset = dataset
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__opened = []
+
+    def __getstate__(self):
+        if self.path is None:
+            raise TypeError("The data set has no file and cannot be read in another process.")
+
+        state = self.__dict__.copy()
+        for key in ('_BandArray__dataset', '_BandArray__local', '_BandArray__lock', '_BandArray__opened'):
+            del state[key]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dataset = None
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__opened = []
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        # The array is read into a new buffer, so it is never a copy of existing data.
+        array = self[:, :, :]
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def close(self):
+        """
+        Close the data sets opened by the threads. Further reads open them again.
+        """
+        with self.__lock:
+            del self.__opened[:]
+            self.__local = threading.local()
+
+    def __dataset_of_thread(self):
+        if self.path is None:
+            return self.__dataset
+
+        local = self.__local
+        dataset = getattr(local, 'dataset', None)
+
+        if dataset is None:
+            dataset = gdal.Open(self.path, GA_ReadOnly)
+
+            if dataset is None:
+                raise IOError("Couldn't open file {0}.".format(self.path))
+
+            # The data sets of all threads are kept in a list, so that close can release them.
+            with self.__lock:
+                self.__opened.append(dataset)
+                local.dataset = dataset
+
+        return dataset
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+
+        if Ellipsis in index:
+            i = index.index(Ellipsis)
+            index = index[:i] + (slice(None),) * (self.ndim - len(index) + 1) + index[i + 1:]
+
+        index = index + (slice(None),) * (self.ndim - len(index))
+
+        if len(index) != self.ndim or not all([isinstance(item, slice) for item in index]):
+            raise IndexError("BandArray only supports indexing with slices.")
+
+        band_index = srange_of(index[0], self.shape[0])
+        y0, y1, ystep = index[1].indices(self.shape[1])
+        x0, x1, xstep = index[2].indices(self.shape[2])
+
+        y1, x1 = max(y0, y1), max(x0, x1)
+        array = np.empty((len(band_index), y1 - y0, x1 - x0), dtype=self.dtype)
+
+        if array.size > 0:
+            xoff, yoff = self.window[0] + x0, self.window[1] + y0
+
+            if self.path is None:
+                with self.__lock:
+                    self.__read(self.__dataset, band_index, xoff, yoff, array)
+            else:
+                self.__read(self.__dataset_of_thread(), band_index, xoff, yoff, array)
+
+            if self.quantification_factor > 1:
+                array /= self.quantification_factor
+
+            if np.issubdtype(self.dtype, np.floating):
+                array[np.isnan(array)] = self.nodata
+
+        return array[:, ::ystep, ::xstep]
+
+    def __read(self, dataset, band_index, xoff, yoff, array):
+        for j, i in enumerate(band_index):
+            # GDAL converts the data type while reading into the slice of the array.
+            dataset.GetRasterBand(self.bands[i]).ReadAsArray(xoff, yoff, array.shape[2], array.shape[1],
+                                                             buf_obj=array[j])
+
+
+def srange_of(index, size):
+    """
+    Positions selected by a slice in an axis of the size.
+    """
+    return list(range(*index.indices(size)))
+
+
+def block_chunks(dataset, band):
+    """
+    Block size (rows, cols) of a band, which is used as the previous chunk size to align the chunks to the blocks.
+    """
+    xsize, ysize = dataset.GetRasterBand(band).GetBlockSize()
+
+    return ysize, xsize
@@ -0,0 +1,105 @@
+"""
+Scoped GDAL configuration for the I/O of Raster.
+
+rasterpy does not change the GDAL configuration by itself. With `gdal_config` the block cache, the number of decode
+threads and the VSI caching can be set for the scope of a with statement or a decorated function. The former values
+are restored afterwards.
+
+Example
+-------
+>>> import rasterpy as rpy
+>>> with rpy.gdal_config(cachemax=1024, num_threads='ALL_CPUS', vsi_cache=True):
+...     grid = rpy.Raster('RGB.byte.tif')
+...     grid.to_array()
+"""
+from __future__ import division
+
+import functools
+
+from osgeo import gdal
+
+
+class gdal_config(object):
+    """
+    Context manager and decorator which sets GDAL configuration options within its scope.
+
+    Options like GDAL_NUM_THREADS and VSI_CACHE are evaluated by GDAL when a file is opened. Thus, the Raster should be
+    created within the scope if these options should affect its reads.
+
+    Parameters
+    ----------
+    cachemax : int or None, optional
+        Size of the GDAL block cache in MB (GDAL_CACHEMAX). Default is None, which keeps the actual size.
+    num_threads : int, str or None, optional
+        Number of threads used to decode and encode compressed blocks, e.g. 4 or 'ALL_CPUS' (GDAL_NUM_THREADS).
+        Default is None, which keeps the actual value.
+    vsi_cache : bool or None, optional
+        Enable the cache of the virtual file system (VSI_CACHE). Default is None, which keeps the actual value.
+    vsi_cache_size : int or None, optional
+        Size of the VSI cache per file in bytes (VSI_CACHE_SIZE). Default is None, which keeps the actual value.
+    thread_local : bool, optional
+        If True and supported by GDAL the options are only set for the actual thread. The size of the block cache is
+        always global. Default is False.
+    **options : str
+        Further GDAL configuration options like GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'.
+
+    """
+
+    def __init__(self, cachemax=None, num_threads=None, vsi_cache=None, vsi_cache_size=None, thread_local=False,
+                 **options):
+        self.cachemax = cachemax
+        self.options = dict()
+
+        if num_threads is not None:
+            self.options['GDAL_NUM_THREADS'] = str(num_threads)
+
+        if vsi_cache is not None:
+            self.options['VSI_CACHE'] = 'TRUE' if vsi_cache else 'FALSE'
+
+        if vsi_cache_size is not None:
+            self.options['VSI_CACHE_SIZE'] = str(int(vsi_cache_size))
+
+        for key, value in options.items():
+            self.options[key] = str(value)
+
+        if thread_local and hasattr(gdal, 'SetThreadLocalConfigOption'):
+            self.__set = gdal.SetThreadLocalConfigOption
+            self.__get = gdal.GetThreadLocalConfigOption
+        else:
+            self.__set = gdal.SetConfigOption
+            self.__get = gdal.GetConfigOption
+
+        self.__previous = []
+
+    def __enter__(self):
+        previous_options = dict()
+        for key, value in self.options.items():
+            previous_options[key] = self.__get(key, None)
+            self.__set(key, value)
+
+        previous_cachemax = None
+        if self.cachemax is not None:
+            previous_cachemax = gdal.GetCacheMax()
+            gdal.SetCacheMax(int(self.cachemax) * 2 ** 20)
+
+        # A stack allows the reuse of the same instance in nested scopes.
+        self.__previous.append((previous_options, previous_cachemax))
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        previous_options, previous_cachemax = self.__previous.pop()
+
+        for key, value in previous_options.items():
+            self.__set(key, value)
+
+        if previous_cachemax is not None:
+            gdal.SetCacheMax(previous_cachemax)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return wrapper
@@ -0,0 +1,251 @@
+"""
+Conversions between radar backscatter coefficients (BSC), BRDF and BRF and between linear and dB values.
+
+The functions only depend on numpy, so they can be used without importing GDAL. They are also available as static
+methods of Raster, e.g. Raster.BRDF.
+"""
+from __future__ import division
+
+import numpy as np
+
+
+def dB(x):
+    """
+    Convert a linear value to dB.
+    """
+    with np.errstate(invalid='ignore'):
+        return 10 * np.log10(x)
+
+
+def linear(x):
+    """
+    Convert a dB value in linear.
+    """
+    return 10 ** (x / 10)
+
+
+def BRDF(BSC, iza, vza, angle_unit='RAD'):
+    """
+    Convert a Radar Backscatter Coefficient (BSC) into a BRDF.
+
+    Parameters
+    ----------
+    BSC : int, float or array_like
+        Radar Backscatter Coefficient (sigma 0).
+
+    iza : int, float or array_like
+        Sun or incidence zenith angle.
+
+    vza : int, float or array_like
+        View or scattering zenith angle.
+
+    angle_unit : {'DEG', 'RAD'} (default = 'RAD'), optional
+        * 'DEG': All input angles (iza, vza, raa) are in [DEG].
+        * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+
+    Returns
+    -------
+    BRDF value : int, float or array_like
+
+    """
+    if angle_unit == 'RAD':
+        return BSC / (np.cos(iza) * np.cos(vza) * (4 * np.pi))
+
+    elif angle_unit == 'DEG':
+        return BSC / (np.cos(np.radians(iza)) * np.cos(np.radians(vza)) * (4 * np.pi))
+    else:
+        raise ValueError("angle_unit must be 'RAD' or 'DEG'")
+
+
+def BRF(BRDF):
+    """
+    Convert a BRDF into a BRF.
+
+    Parameters
+    ----------
+    BRDF : int, float or array_like
+        BRDF value.
+
+    Returns
+    -------
+    BRF value : int, float or array_like
+
+    """
+    return np.pi * BRDF
+
+
+def BSC(BRDF, iza, vza, angle_unit='RAD'):
+    """
+    Convert a BRDF in to a Radar Backscatter Coefficient (BSC).
+
+    Parameters
+    ----------
+    BSC : int, float or array_like
+        Radar Backscatter Coefficient (sigma 0).
+
+    iza : int, float or array_like
+        Sun or incidence zenith angle.
+
+    vza : int, float or array_like
+        View or scattering zenith angle.
+
+    angle_unit : {'DEG', 'RAD'} (default = 'RAD'), optional
+        * 'DEG': All input angles (iza, vza, raa) are in [DEG].
+        * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+
+    Returns
+    -------
+    BRDF value : int, float or array_like
+
+    """
+    if angle_unit == 'RAD':
+        return BRDF * np.cos(iza) * np.cos(vza) * 4 * np.pi
+
+    elif angle_unit == 'DEG':
+        return BRDF * np.cos(np.radians(iza)) * np.cos(np.radians(vza)) * (4 * np.pi)
+    else:
+        raise ValueError("angle_unit must be 'RAD' or 'DEG'")
+
+
+def convert_kernel(array, system='BSC', to='BRDF', system_unit='linear', output_unit='linear', iza=None, vza=None,
+                   angle_unit='RAD', nodata=None, quantification_factor=1):
+    """
+    Convert an array from BSC, BRDF, BRF to BRDF, BSC or BRF. This is the kernel of Raster.convert, which the
+    executors apply to the whole array or to strips of it.
+
+    The values are divided by the quantification factor, converted into a linear BRDF and from there into the desired
+    system and unit. NaN values of dB outputs are replaced with the no data value.
+
+    See Also
+    --------
+    Raster.convert
+
+    """
+    if quantification_factor > 1:
+        array = array / quantification_factor
+
+    if system_unit == 'dB':
+        array = linear(array)
+
+    if system == 'BSC' and to != 'BSC':
+        array = BRDF(array, iza, vza, angle_unit)
+
+    elif system == 'BRF' and to != 'BRF':
+        array = array / np.pi
+
+    if to == 'BRF' and system != 'BRF':
+        array = BRF(array)
+
+    elif to == 'BSC' and system != 'BSC':
+        array = BSC(array, iza, vza, angle_unit)
+
+    if output_unit == 'dB':
+        array = dB(array)
+        array[np.isnan(array)] = nodata
+
+    return array
+
+
+def lookup_supported(dtype):
+    """
+    True if a lookup table of all values of the data type is feasible, i.e. for integers with 8 or 16 bit.
+    """
+    dtype = np.dtype(dtype)
+
+    return dtype.kind in ('i', 'u') and dtype.itemsize <= 2
+
+
+def lookup_table(dtype, **params):
+    """
+    Lookup table of convert_kernel for all values of an integer data type with 8 or 16 bit.
+
+    The table has 256 or 65536 entries, so the conversion of large integer arrays costs one lookup per pixel instead
+    of the logarithms and cosines of convert_kernel. Signed values are looked up with their unsigned bit pattern.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype
+        Integer data type of the array.
+    **params
+        Keyword arguments of convert_kernel. The angles must be scalars.
+
+    Returns
+    -------
+    array_like
+
+    See Also
+    --------
+    lookup_kernel
+
+    """
+    dtype = np.dtype(dtype)
+    unsigned = np.dtype('u{0}'.format(dtype.itemsize))
+    values = np.arange(2 ** (8 * dtype.itemsize), dtype=unsigned).view(dtype)
+
+    return convert_kernel(values, **params)
+
+
+def lookup_kernel(array, table=None, nodata=None):
+    """
+    Convert an integer array with a table of lookup_table. This is the kernel of Raster.convert for integer arrays.
+    """
+    index = array.view('u{0}'.format(array.dtype.itemsize))
+
+    return np.take(table, index)
+
+
+COMPONENTS = ('complex', 'intensity', 'amplitude', 'phase')
+
+
+def component_dtype(dtype):
+    """
+    Data type of the intensity, amplitude or phase of an array with the data type dtype. It is float64 for double
+    precision data and float32 otherwise.
+    """
+    return np.dtype(np.float64) if np.dtype(dtype) in (np.complex128, np.float64) else np.dtype(np.float32)
+
+
+def component_kernel(array, component='intensity', out=None):
+    """
+    Derive the intensity, amplitude or phase from complex SAR data, e.g. of a SLC or a PolSARpro matrix.
+
+    Parameters
+    ----------
+    array : array_like
+        Complex or real values.
+    component : {'intensity', 'amplitude', 'phase', 'complex'}, optional
+        * 'intensity': The squared absolute value |x| ** 2 (default).
+        * 'amplitude': The absolute value |x|.
+        * 'phase': The phase angle in [RAD].
+        * 'complex': The array is returned unchanged.
+    out : array_like or None, optional
+        Output array. If None a new array with the data type of component_dtype is created.
+
+    Returns
+    -------
+    array_like
+
+    """
+    if component not in COMPONENTS:
+        raise AssertionError("Component must be one of {0}. The component is {1}".format(str(COMPONENTS),
+                                                                                       str(component)))
+
+    if component == 'complex':
+        return array
+
+    if out is None:
+        out = np.empty(np.shape(array), dtype=component_dtype(array.dtype))
+
+    if component == 'phase':
+        return np.arctan2(np.imag(array), np.real(array), out=out)
+
+    if component == 'amplitude':
+        return np.abs(array, out=out, casting='unsafe')
+
+    # The intensity is computed without the square root of np.abs.
+    np.multiply(np.real(array), np.real(array), out=out, casting='unsafe')
+
+    if np.iscomplexobj(array):
+        out += np.imag(array) ** 2
+
+    return out
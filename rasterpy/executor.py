@@ -0,0 +1,394 @@
+"""
+Execution backends for the array kernels of Raster, like the conversion of Raster.convert.
+
+The array is partitioned into row strips. The kernel is applied to each strip, and the results are written into one
+preallocated output array. Array operands of the kernel (e.g. angles) are broadcast against the array and partitioned
+in the same way.
+
+* SerialExecutor: Apply the kernel to the whole array in the calling thread.
+* ThreadExecutor: Apply the kernel to the strips in a thread pool. NumPy releases the GIL in its ufuncs, so the
+  strips are processed in parallel.
+* ProcessExecutor: Apply the kernel to the strips in a process pool. The array, the operands and the output are
+  exchanged via multiprocessing.shared_memory (Python >= 3.8), so only the names of the shared memory blocks and the
+  strip indices are pickled. The result is returned in its shared memory block without a copy.
+"""
+from __future__ import division
+
+import multiprocessing
+import weakref
+
+import numpy as np
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = ProcessPoolExecutor = None
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+
+def strips(shape, n):
+    """
+    Partition an array into row strips.
+
+    The rows are the second last axis of arrays with three or more dimensions, e.g. (bands, rows, cols), and the
+    last axis otherwise, e.g. the pixels of flatten (bands, pixels) arrays.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the array.
+    n : int
+        Number of strips.
+
+    Returns
+    -------
+    list
+        Index tuples of the strips.
+
+    """
+    axis = len(shape) - 2 if len(shape) >= 3 else len(shape) - 1
+    n = max(1, min(n, shape[axis]))
+    edges = np.linspace(0, shape[axis], n + 1).astype(int)
+
+    index_list = []
+    for i in range(n):
+        index = [slice(None)] * len(shape)
+        index[axis] = slice(edges[i], edges[i + 1])
+        index_list.append(tuple(index))
+
+    return index_list
+
+
+def operand_strip(value, shape, index):
+    """
+    Strip of an operand, which is broadcast against an array of the shape. Scalars are returned as they are.
+    """
+    if isinstance(value, np.ndarray) and value.ndim > 0:
+        return np.broadcast_to(value, shape)[index]
+
+    return value
+
+
+def result_dtype(kernel, array, operands, params):
+    """
+    Data type of the kernel result, derived from the result of the first element.
+    """
+    index = tuple([slice(0, 1)] * array.ndim)
+    sample = dict([(key, operand_strip(value, array.shape, index)) for key, value in operands.items()])
+    sample.update(params)
+
+    return np.asarray(kernel(array[index], **sample)).dtype
+
+
+def skip_empty_kernel(array, block_kernel=None, nodata=None, block_rows=256, **kwargs):
+    """
+    Apply a kernel only to the row blocks of an array, which contain other values than the no data value.
+
+    Blocks that only contain the no data value are set to the no data value in the result without calling the block
+    kernel. Checking a block is much cheaper than most kernels, so mostly empty arrays are processed in a fraction of
+    the time. The function itself is a kernel for the executors, so the blocks of each strip are checked in parallel.
+
+    Parameters
+    ----------
+    array : array_like
+        Input array.
+    block_kernel : callable
+        Function like block_kernel(array, nodata=nodata, **kwargs). It must be a module level function for
+        ProcessExecutor.
+    nodata : int or float
+        No data value.
+    block_rows : int, optional
+        Number of rows of the blocks. Default is 256.
+    **kwargs
+        Further keyword arguments of the block kernel. Arrays are broadcast against the array and partitioned like it.
+
+    Returns
+    -------
+    array_like
+
+    """
+    if array.ndim == 0 or array.size == 0 or nodata is None:
+        return block_kernel(array, nodata=nodata, **kwargs)
+
+    axis = array.ndim - 2 if array.ndim >= 3 else array.ndim - 1
+    out = np.empty(array.shape, dtype=result_dtype(block_kernel, array, kwargs, dict(nodata=nodata)))
+
+    for start in range(0, array.shape[axis], block_rows):
+        index = [slice(None)] * array.ndim
+        index[axis] = slice(start, start + block_rows)
+        index = tuple(index)
+
+        block = array[index]
+
+        if np.all(block == nodata):
+            out[index] = nodata
+        else:
+            operands = dict([(key, operand_strip(value, array.shape, index)) for key, value in kwargs.items()])
+            out[index] = block_kernel(block, nodata=nodata, **operands)
+
+    return out
+
+
+class SerialExecutor(object):
+    """
+    Apply kernels to the whole array in the calling thread.
+    """
+
+    max_workers = 1
+
+    def run(self, kernel, array, operands=None, **params):
+        """
+        Apply a kernel to an array.
+
+        Parameters
+        ----------
+        kernel : callable
+            Function like kernel(array, **operands, **params), which returns an array with the shape of the array.
+        array : array_like
+            Input array.
+        operands : dict or None, optional
+            Keyword arguments of the kernel, which are scalars or arrays broadcastable against the array.
+        **params
+            Further scalar keyword arguments of the kernel.
+
+        Returns
+        -------
+        array_like
+
+        """
+        kwargs = dict(operands or {})
+        kwargs.update(params)
+
+        return kernel(array, **kwargs)
+
+    def close(self):
+        pass
+
+    def __getstate__(self):
+        # Pools cannot be pickled. They are created again by the next run.
+        state = self.__dict__.copy()
+
+        if '_pool' in state:
+            state['_pool'] = None
+
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ThreadExecutor(SerialExecutor):
+    """
+    Apply kernels to row strips of the array in a thread pool.
+
+    Parameters
+    ----------
+    max_workers : int or None, optional
+        Number of threads. If None the number of CPUs is used.
+
+    """
+
+    def __init__(self, max_workers=None):
+        if ThreadPoolExecutor is None:
+            raise ImportError("ThreadExecutor requires concurrent.futures (Python 3 or the futures backport).")
+
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._pool = None
+
+    def run(self, kernel, array, operands=None, **params):
+        operands = operands or {}
+        out = np.empty(array.shape, dtype=result_dtype(kernel, array, operands, params))
+
+        def work(index):
+            kwargs = dict([(key, operand_strip(value, array.shape, index)) for key, value in operands.items()])
+            kwargs.update(params)
+            out[index] = kernel(array[index], **kwargs)
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers)
+
+        list(self._pool.map(work, strips(array.shape, self.max_workers)))
+
+        return out
+
+    def close(self):
+        """
+        Shut down the pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _attach(spec):
+    """
+    Attach to a shared memory block and return the block and an array view of it.
+    """
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _process_strip(task):
+    """
+    Apply a kernel to a strip of arrays in shared memory. Executed in the worker processes.
+    """
+    kernel, array_spec, out_spec, operand_specs, params, index = task
+
+    blocks, views = [], []
+    try:
+        for spec in [array_spec, out_spec] + [value for kind, value in operand_specs.values() if kind == 'shared']:
+            block, view = _attach(spec)
+            blocks.append(block)
+            views.append(view)
+
+        array, out, shared = views[0], views[1], iter(views[2:])
+
+        kwargs = dict(params)
+        for key, (kind, value) in operand_specs.items():
+            kwargs[key] = operand_strip(next(shared) if kind == 'shared' else value, array.shape, index)
+
+        out[index] = kernel(array[index], **kwargs)
+
+    finally:
+        # The views must be released before the blocks are closed.
+        array = out = shared = kwargs = None
+        del views[:]
+
+        for block in blocks:
+            block.close()
+
+
+def _close_block(block):
+    """
+    Close a shared memory block, when the array in it is released.
+    """
+    try:
+        block.close()
+    except BufferError:
+        pass
+
+
+class ProcessExecutor(SerialExecutor):
+    """
+    Apply kernels to row strips of the array in a process pool with shared memory buffers.
+
+    The kernel must be a module level function, so it can be pickled.
+
+    Parameters
+    ----------
+    max_workers : int or None, optional
+        Number of processes. If None the number of CPUs is used.
+
+    """
+
+    def __init__(self, max_workers=None):
+        if shared_memory is None or ProcessPoolExecutor is None:
+            raise ImportError("ProcessExecutor requires multiprocessing.shared_memory (Python 3.8 or newer).")
+
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._pool = None
+
+    @staticmethod
+    def __share(array, blocks, views):
+        """
+        Copy an array into a new shared memory block and return the specification to attach to it.
+        """
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        blocks.append(block)
+
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        view[...] = array
+        views.append(view)
+
+        return block.name, array.shape, array.dtype.str
+
+    def run(self, kernel, array, operands=None, **params):
+        operands = operands or {}
+        array = np.asarray(array)
+        dtype = result_dtype(kernel, array, operands, params)
+
+        blocks, views = [], []
+        out = owner = None
+        try:
+            array_spec = self.__share(array, blocks, views)
+            out_spec = self.__share(np.empty(array.shape, dtype=dtype), blocks, views)
+
+            operand_specs = dict()
+            for key, value in operands.items():
+                if isinstance(value, np.ndarray) and value.ndim > 0:
+                    operand_specs[key] = ('shared', self.__share(value, blocks, views))
+                else:
+                    operand_specs[key] = ('value', value)
+
+            tasks = [(kernel, array_spec, out_spec, operand_specs, params, index)
+                     for index in strips(array.shape, self.max_workers)]
+
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+
+            list(self._pool.map(_process_strip, tasks))
+
+            # The output is returned in its block. The block is closed when the array and all views of it are released.
+            out, owner = views[1], blocks[1]
+
+        finally:
+            # The views must be released before the blocks are closed.
+            del views[:]
+
+            for block in blocks:
+                if block is not owner:
+                    block.close()
+
+                # The name is removed at once. The memory of the output stays mapped until its block is closed.
+                block.unlink()
+
+        finalizer = weakref.finalize(out, _close_block, owner)
+        finalizer.atexit = False
+
+        return out
+
+    def close(self):
+        """
+        Shut down the pool.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def get_executor(executor='serial', max_workers=None):
+    """
+    Create an executor by name.
+
+    Parameters
+    ----------
+    executor : {'serial', 'threads', 'processes'} or executor instance
+        Name of the backend. Instances are returned as they are.
+    max_workers : int or None, optional
+        Number of workers. If None the number of CPUs is used.
+
+    Returns
+    -------
+    SerialExecutor, ThreadExecutor or ProcessExecutor
+
+    """
+    if not isinstance(executor, str):
+        return executor
+
+    if executor == 'serial':
+        return SerialExecutor()
+    elif executor == 'threads':
+        return ThreadExecutor(max_workers)
+    elif executor == 'processes':
+        return ProcessExecutor(max_workers)
+    else:
+        raise AssertionError("Executor must be 'serial', 'threads' or 'processes'")
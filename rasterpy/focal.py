@@ -0,0 +1,139 @@
+"""
+Focal operations and speckle filters for radar images.
+
+The functions operate on the last two axes (rows, cols) of an array, so (rows, cols) and (bands, rows, cols) arrays
+are supported. Windows are clipped at the borders of the array, i.e. a pixel at the border is filtered with the part
+of its window that lies inside the array. Thus, a block read with a halo of size // 2 pixels gives the same result as
+the whole array, which is used by Raster.focal to process large rasters block by block.
+
+Pixels with the no data value are ignored in the windows and stay no data in the result.
+"""
+from __future__ import division
+
+import numpy as np
+
+
+def window_sum(array, size):
+    """
+    Sum of the values in a square moving window, computed with an integral image.
+
+    The costs do not depend on the window size.
+
+    Parameters
+    ----------
+    array : array_like
+        Array with the dimension (..., rows, cols).
+    size : int
+        Side length of the window in pixels. Must be odd.
+
+    Returns
+    -------
+    array_like
+        Window sums as float64.
+
+    """
+    if size < 1 or size % 2 == 0:
+        raise AssertionError("The window size must be an odd number greater than 0. The size is {0}".format(size))
+
+    array = np.asarray(array)
+    rows, cols = array.shape[-2:]
+    radius = size // 2
+
+    integral = np.zeros(array.shape[:-2] + (rows + 1, cols + 1), dtype=np.float64)
+    np.cumsum(array, axis=-2, dtype=np.float64, out=integral[..., 1:, 1:])
+    np.cumsum(integral[..., 1:, 1:], axis=-1, out=integral[..., 1:, 1:])
+
+    y0 = np.clip(np.arange(rows) - radius, 0, rows)[:, np.newaxis]
+    y1 = np.clip(np.arange(rows) + radius + 1, 0, rows)[:, np.newaxis]
+    x0 = np.clip(np.arange(cols) - radius, 0, cols)[np.newaxis, :]
+    x1 = np.clip(np.arange(cols) + radius + 1, 0, cols)[np.newaxis, :]
+
+    return integral[..., y1, x1] - integral[..., y0, x1] - integral[..., y1, x0] + integral[..., y0, x0]
+
+
+def _valid(array, nodata):
+    if nodata is None:
+        return None
+
+    return ~np.isnan(array) if np.isnan(nodata) else array != nodata
+
+
+def boxcar(array, size=3, nodata=None):
+    """
+    Boxcar filter (multilooking), the mean of a square moving window.
+
+    Parameters
+    ----------
+    array : array_like
+        Array with the dimension (..., rows, cols), e.g. intensities.
+    size : int, optional
+        Side length of the window in pixels. Must be odd. Default is 3.
+    nodata : int, float or None, optional
+        No data value. These pixels are ignored. Default is None.
+
+    Returns
+    -------
+    array_like
+        Filtered array as float32.
+
+    """
+    array = np.asarray(array)
+    valid = _valid(array, nodata)
+
+    if valid is None:
+        count = window_sum(np.ones(array.shape[-2:], dtype=np.uint8), size)
+        return (window_sum(array, size) / count).astype(np.float32)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = window_sum(np.where(valid, array, 0), size) / window_sum(valid, size)
+
+    mean[~valid] = nodata
+
+    return mean.astype(np.float32)
+
+
+def lee(array, size=7, looks=1, nodata=None):
+    """
+    Lee speckle filter for intensities.
+
+    The filtered value is mean + k * (value - mean) with the local mean and variance of the window. The weight k
+    is the share of the local variance, which is not explained by the speckle with the coefficient of variation
+    1 / sqrt(looks). In homogeneous areas k is close to 0 (mean), at edges and point targets close to 1 (value).
+
+    Parameters
+    ----------
+    array : array_like
+        Intensities with the dimension (..., rows, cols).
+    size : int, optional
+        Side length of the window in pixels. Must be odd. Default is 7.
+    looks : int or float, optional
+        Equivalent number of looks of the image. Default is 1.
+    nodata : int, float or None, optional
+        No data value. These pixels are ignored. Default is None.
+
+    Returns
+    -------
+    array_like
+        Filtered array as float32.
+
+    """
+    array = np.asarray(array, dtype=np.float64)
+    valid = _valid(array, nodata)
+
+    values = array if valid is None else np.where(valid, array, 0)
+    count = window_sum(np.ones(array.shape[-2:], dtype=np.uint8) if valid is None else valid, size)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = window_sum(values, size) / count
+        variance = np.maximum(window_sum(values ** 2, size) / count - mean ** 2, 0)
+
+        cu2 = 1 / looks
+        variance_x = np.maximum((variance - mean ** 2 * cu2) / (1 + cu2), 0)
+        weight = np.where(variance > 0, variance_x / variance, 0)
+
+    result = mean + weight * (values - mean)
+
+    if valid is not None:
+        result[~valid] = nodata
+
+    return result.astype(np.float32)
@@ -0,0 +1,377 @@
+"""
+Polarimetric decompositions of PolSARpro covariance (C3) and coherency (T3) matrices.
+
+A PolSARpro C3 or T3 directory contains one binary file for each element of the upper triangle of the 3x3 matrix,
+e.g. C11.bin, C12_real.bin, C12_imag.bin, ..., C33.bin. Open the directory with
+`rasterpy.Raster(extension='.bin', path='C3')` and pass the Raster to a decomposition. The files are read in strips of
+rows, so only one strip of matrices is in memory. The matrices of a strip are stacked to an array with the dimension
+(rows, cols, 3, 3) and the decompositions are computed for all pixels at once, e.g. with a batched eigen decomposition.
+
+Example
+-------
+>>> import rasterpy as rpy
+>>> from rasterpy import polsar
+>>> grid = rpy.Raster(extension='.bin', path='C3')
+>>> polsar.h_a_alpha(grid, filename='H_A_alpha.tif')
+"""
+from __future__ import division
+
+import os
+import sys
+
+import numpy as np
+
+# python 3.6 comparability
+if sys.version_info < (3, 0):
+    srange = xrange
+else:
+    srange = range
+
+# Elements of the upper triangle as (row, col, part) with the part 'real', 'imag' or None for the diagonal.
+ELEMENTS = ((0, 0, None), (0, 1, 'real'), (0, 1, 'imag'), (0, 2, 'real'), (0, 2, 'imag'), (1, 1, None),
+            (1, 2, 'real'), (1, 2, 'imag'), (2, 2, None))
+
+# Unitary transformation from the lexicographic (C3) to the Pauli basis (T3): T3 = D C3 D^H.
+_D = np.array([[1, 0, 1], [1, 0, -1], [0, np.sqrt(2), 0]]) / np.sqrt(2)
+
+
+def element_names(kind):
+    """
+    File names of the matrix elements without extension, e.g. 'C11', 'C12_real', ..., 'C33'.
+
+    Parameters
+    ----------
+    kind : {'C3', 'T3'}
+
+    Returns
+    -------
+    list
+
+    """
+    if kind not in ('C3', 'T3'):
+        raise AssertionError("The matrix must be 'C3' or 'T3'. The matrix is {0}".format(str(kind)))
+
+    return ['{0}{1}{2}{3}'.format(kind[0], i + 1, j + 1, '' if part is None else '_' + part)
+            for i, j, part in ELEMENTS]
+
+
+def matrix_files(raster):
+    """
+    Find the matrix elements in the files of a Raster.
+
+    Parameters
+    ----------
+    raster : Raster
+        Raster over the files of a PolSARpro C3 or T3 directory. Further files like a mask are ignored.
+
+    Returns
+    -------
+    tuple
+        The matrix type 'C3' or 'T3' and a list with the index of the file of each element in the order of ELEMENTS.
+
+    """
+    filenames = raster.filename if isinstance(raster.filename, tuple) else (raster.filename,)
+    names = [os.path.splitext(os.path.basename(item))[0] for item in filenames]
+
+    for kind in ('C3', 'T3'):
+        if all([item in names for item in element_names(kind)]):
+            if isinstance(raster.cols, tuple):
+                index = [names.index(item) for item in element_names(kind)]
+                if len(set([raster.cols[i] for i in index])) != 1 or len(set([raster.rows[i] for i in index])) != 1:
+                    raise AssertionError("Status: Input dimensions of the matrix elements must agree")
+
+            return kind, [names.index(item) for item in element_names(kind)]
+
+    raise AssertionError("The files {0} are no PolSARpro C3 or T3 matrix. The elements {1} or {2} are required."
+                         .format(str(names), str(element_names('C3')), str(element_names('T3'))))
+
+
+def read_matrix(raster, index, yoff, nrows):
+    """
+    Read a strip of rows of all matrix elements.
+
+    Parameters
+    ----------
+    raster : Raster
+        Raster over the files of a PolSARpro C3 or T3 directory.
+    index : list
+        Index of the file of each element. See matrix_files.
+    yoff, nrows : int
+        First row and number of rows of the strip.
+
+    Returns
+    -------
+    array_like
+        Hermitian matrices as complex64 with the dimension (nrows, cols, 3, 3).
+
+    """
+    datasets = raster.raster if isinstance(raster.raster, tuple) else (raster.raster,)
+    cols = datasets[index[0]].RasterXSize
+
+    matrix = np.zeros((nrows, cols, 3, 3), dtype=np.complex64)
+
+    for (i, j, part), k in zip(ELEMENTS, index):
+        values = datasets[k].GetRasterBand(1).ReadAsArray(0, yoff, cols, nrows)
+
+        if part == 'imag':
+            matrix[..., i, j] += 1j * values
+        else:
+            matrix[..., i, j] += values
+
+    for i, j in ((1, 0), (2, 0), (2, 1)):
+        matrix[..., i, j] = np.conj(matrix[..., j, i])
+
+    return matrix
+
+
+def t3_from_c3(matrix):
+    """
+    Transform covariance matrices (C3) into coherency matrices (T3).
+
+    Parameters
+    ----------
+    matrix : array_like
+        C3 matrices with the dimension (..., 3, 3).
+
+    Returns
+    -------
+    array_like
+
+    """
+    return np.matmul(np.matmul(_D, matrix), _D.T).astype(matrix.dtype)
+
+
+def c3_from_t3(matrix):
+    """
+    Transform coherency matrices (T3) into covariance matrices (C3).
+
+    Parameters
+    ----------
+    matrix : array_like
+        T3 matrices with the dimension (..., 3, 3).
+
+    Returns
+    -------
+    array_like
+
+    """
+    return np.matmul(np.matmul(_D.T, matrix), _D).astype(matrix.dtype)
+
+
+def pauli_kernel(matrix):
+    """
+    Pauli decomposition of coherency matrices.
+
+    Parameters
+    ----------
+    matrix : array_like
+        T3 matrices with the dimension (..., 3, 3).
+
+    Returns
+    -------
+    array_like
+        The powers |HH - VV|^2 / 2 (double bounce, red), 2 |HV|^2 (volume, green) and |HH + VV|^2 / 2 (surface, blue)
+        with the dimension (3, ...).
+
+    """
+    return np.stack([matrix[..., 1, 1].real, matrix[..., 2, 2].real, matrix[..., 0, 0].real]).astype(np.float32)
+
+
+def freeman_durden_kernel(matrix):
+    """
+    Freeman-Durden three component decomposition of covariance matrices.
+
+    The volume power is estimated from the cross-polarised power. The remaining powers are split into a surface and a
+    double bounce scattering depending on the sign of Re(<HH VV*>). Negative powers, where the volume power exceeds the
+    co-polarised powers, are set to 0.
+
+    Parameters
+    ----------
+    matrix : array_like
+        C3 matrices with the dimension (..., 3, 3).
+
+    Returns
+    -------
+    array_like
+        The powers of the double bounce, volume and surface scattering with the dimension (3, ...).
+
+    """
+    hhhh = matrix[..., 0, 0].real.astype(np.float64)
+    vvvv = matrix[..., 2, 2].real.astype(np.float64)
+    hhvv = matrix[..., 0, 2].astype(np.complex128)
+    span = hhhh + matrix[..., 1, 1].real + vvvv
+
+    # C22 is 2 <|HV|^2> and the volume contributes fv / 3 to <|HV|^2>.
+    fv = 1.5 * matrix[..., 1, 1].real
+    a = hhhh - fv
+    b = vvvv - fv
+    c = hhvv - fv / 3
+    det = a * b - np.abs(c) ** 2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Surface dominated: alpha = -1.
+        fd_s = det / (a + b + 2 * c.real)
+        fs_s = b - fd_s
+        beta = (c + fd_s) / fs_s
+        ps_s = fs_s * (1 + np.abs(beta) ** 2)
+        pd_s = 2 * fd_s
+
+        # Double bounce dominated: beta = 1.
+        fs_d = det / (a + b - 2 * c.real)
+        fd_d = b - fs_d
+        alpha = (c - fs_d) / fd_d
+        ps_d = 2 * fs_d
+        pd_d = fd_d * (1 + np.abs(alpha) ** 2)
+
+    surface = c.real >= 0
+    pv = 8 * fv / 3
+    ps = np.where(surface, ps_s, ps_d)
+    pd = np.where(surface, pd_s, pd_d)
+
+    valid = (a > 0) & (b > 0)
+    ps = np.where(valid & np.isfinite(ps), np.clip(ps, 0, span), 0)
+    pd = np.where(valid & np.isfinite(pd), np.clip(pd, 0, span), 0)
+    pv = np.where(valid, pv, span)
+
+    return np.stack([pd, pv, ps]).astype(np.float32)
+
+
+def h_a_alpha_kernel(matrix):
+    """
+    Entropy, anisotropy and mean alpha angle (Cloude-Pottier) of coherency matrices.
+
+    The eigenvalues and eigenvectors of all matrices are computed at once with np.linalg.eigh.
+
+    Parameters
+    ----------
+    matrix : array_like
+        T3 matrices with the dimension (..., 3, 3).
+
+    Returns
+    -------
+    array_like
+        The entropy H, the anisotropy A and the mean alpha angle in [DEG] with the dimension (3, ...).
+
+    """
+    values, vectors = np.linalg.eigh(matrix)
+
+    # The eigenvalues are sorted in ascending order.
+    values = np.clip(values, 0, None)
+    total = values.sum(axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = values / total[..., np.newaxis]
+        entropy = -np.sum(np.where(p > 0, p * np.log(p), 0), axis=-1) / np.log(3)
+        anisotropy = (values[..., 1] - values[..., 0]) / (values[..., 1] + values[..., 0])
+
+    alpha = np.sum(p * np.degrees(np.arccos(np.clip(np.abs(vectors[..., 0, :]), 0, 1))), axis=-1)
+
+    result = np.stack([entropy, anisotropy, alpha])
+    result[~np.isfinite(result)] = 0
+
+    return result.astype(np.float32)
+
+
+def decompose(raster, kernel, basis, filename=None, block_size=256, options=None):
+    """
+    Apply a decomposition to a PolSARpro C3 or T3 matrix in strips of rows.
+
+    Parameters
+    ----------
+    raster : Raster
+        Raster over the files of a PolSARpro C3 or T3 directory.
+    kernel : callable
+        Decomposition, which takes matrices with the dimension (..., 3, 3) and returns an array with the dimension
+        (bands, ...).
+    basis : {'C3', 'T3'}
+        Matrix type the kernel expects. The matrices are transformed if the files contain the other type.
+    filename : str or None, optional
+        If not None each strip is written to a '.tif' or '.bin' file with the grid of the first matrix element as
+        soon as it is computed (see Raster.block_writer), so the result is never in memory as a whole. Default is
+        None.
+    block_size : int, optional
+        Number of rows which are processed at once. Default is 256.
+    options : list or None, optional
+        GDAL creation options of the driver. Default is None.
+
+    Returns
+    -------
+    array_like or Raster
+        The result with the dimension (bands, rows, cols) or a Raster of the written file, if filename is not None.
+
+    """
+    kind, index = matrix_files(raster)
+    rows = raster.rows[index[0]] if isinstance(raster.rows, tuple) else raster.rows
+
+    result = writer = None
+
+    # The writer is closed on errors, too, so that the data set is released and the file can be removed.
+    try:
+        for yoff in srange(0, rows, block_size):
+            nrows = min(block_size, rows - yoff)
+            matrix = read_matrix(raster, index, yoff, nrows)
+
+            if kind != basis:
+                matrix = t3_from_c3(matrix) if basis == 'T3' else c3_from_t3(matrix)
+
+            block = kernel(matrix)
+
+            if filename is not None:
+                if writer is None:
+                    writer = raster.block_writer(filename, block.shape[0], reference=index[0], options=options)
+
+                writer.write(block, 0, yoff)
+                continue
+
+            if result is None:
+                result = np.zeros((block.shape[0], rows, block.shape[-1]), dtype=block.dtype)
+
+            result[:, yoff:yoff + nrows] = block
+
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        return type(raster)(filename, path=None)
+
+    return result
+
+
+def pauli(raster, filename=None, block_size=256, options=None):
+    """
+    Pauli decomposition, e.g. for an RGB composite. See pauli_kernel and decompose.
+
+    Returns
+    -------
+    array_like or Raster
+        Double bounce, volume and surface power with the dimension (3, rows, cols).
+
+    """
+    return decompose(raster, pauli_kernel, 'T3', filename, block_size, options)
+
+
+def freeman_durden(raster, filename=None, block_size=256, options=None):
+    """
+    Freeman-Durden decomposition. See freeman_durden_kernel and decompose.
+
+    Returns
+    -------
+    array_like or Raster
+        Double bounce, volume and surface power with the dimension (3, rows, cols).
+
+    """
+    return decompose(raster, freeman_durden_kernel, 'C3', filename, block_size, options)
+
+
+def h_a_alpha(raster, filename=None, block_size=256, options=None):
+    """
+    H/A/alpha decomposition. See h_a_alpha_kernel and decompose.
+
+    Returns
+    -------
+    array_like or Raster
+        Entropy, anisotropy and mean alpha angle in [DEG] with the dimension (3, rows, cols).
+
+    """
+    return decompose(raster, h_a_alpha_kernel, 'T3', filename, block_size, options)
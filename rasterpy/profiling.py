@@ -0,0 +1,239 @@
+"""
+Opt-in instrumentation of Raster operations.
+
+The public methods of Raster are wrapped with `instrument`. As long as no Profiler is active the wrapper only checks
+an empty list and calls the method, so the overhead is negligible. Within the scope of a Profiler each call is recorded
+with its duration, the size of its result and of the data it writes and optionally the peak of the memory allocations.
+
+Example
+-------
+>>> import rasterpy as rpy
+>>> with rpy.Profiler(log=True) as prof:
+...     grid = rpy.Raster('RGB.byte.tif')
+...     grid.to_array()
+>>> prof.summary()['Raster.to_array']['bytes_out']
+"""
+from __future__ import division
+
+import functools
+import inspect
+import logging
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from .auxiliary import RasterResult
+
+logger = logging.getLogger('rasterpy')
+
+# Active profilers. Raster methods are only timed if this list is not empty.
+_profilers = []
+_lock = threading.Lock()
+
+# Allocation peaks of the instrumented calls of each thread, which are in progress. The innermost call is the last.
+_frames = threading.local()
+
+
+def nbytes(value):
+    """
+    Number of bytes of an array or of a tuple with arrays.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum([nbytes(item) for item in value])
+
+    return getattr(value, 'nbytes', 0)
+
+
+def instrument(result=None, write=None):
+    """
+    Decorator which records the calls of a Raster method in all active profilers.
+
+    Parameters
+    ----------
+    result : str or None, optional
+        Name of the attribute of Raster that contains the result of the method, e.g. 'array'. Its size in memory is
+        recorded as bytes_out. This is not the number of bytes GDAL reads from the file, which differs for compressed
+        files, converted data types and cached bands.
+    write : str or None, optional
+        Name of the argument of the method that contains the data written by the method, e.g. 'data'.
+
+    """
+
+    def decorator(func):
+        name = 'Raster.' + func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profilers:
+                return func(*args, **kwargs)
+
+            trace = any([item.trace_allocations for item in _profilers]) and tracemalloc is not None
+            started = False
+
+            if trace and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+
+            if trace:
+                peaks = _frames.__dict__.setdefault('peaks', [])
+
+                if hasattr(tracemalloc, 'reset_peak'):
+                    # The peak is reset for the call, so the peak of the calling method is saved before.
+                    if peaks:
+                        peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+
+                    tracemalloc.reset_peak()
+
+                before = tracemalloc.get_traced_memory()[0]
+                peaks.append(before)
+
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+
+            finally:
+                elapsed = time.time() - start
+
+                record = RasterResult(method=name, time=elapsed, bytes_out=0, bytes_written=0, allocated=None)
+
+                if trace:
+                    peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+                    record.allocated = peak - before
+
+                    # The peak of the call is part of the peak of the calling method.
+                    if peaks:
+                        peaks[-1] = max(peaks[-1], peak)
+
+                    if started:
+                        tracemalloc.stop()
+
+                if result is not None:
+                    record.bytes_out = nbytes(getattr(args[0], result, None))
+
+                if write is not None:
+                    try:
+                        record.bytes_written = nbytes(inspect.getcallargs(func, *args, **kwargs)[write])
+                    except (TypeError, KeyError):
+                        pass
+
+                for profiler in list(_profilers):
+                    profiler.add(record)
+
+        return wrapper
+
+    return decorator
+
+
+class Profiler(object):
+    """
+    Record the timings, result sizes, bytes written and allocations of Raster methods.
+
+    Parameters
+    ----------
+    trace_allocations : bool, optional
+        If True the peak of the memory allocations of each call is recorded with tracemalloc. This slows down the
+        calls. Default is False.
+    log : bool, optional
+        If True each call is logged with the logger 'rasterpy'. Default is False.
+    level : int, optional
+        Logging level. Default is logging.INFO.
+    callback : callable or None, optional
+        Function which is called with the record of each call. Default is None.
+
+    Attributes
+    ----------
+    records : list
+        A RasterResult with the attributes method, time, bytes_out, bytes_written and allocated for each call. bytes_out
+        is the size of the result in memory, not the number of bytes read from the file.
+
+    """
+
+    def __init__(self, trace_allocations=False, log=False, level=logging.INFO, callback=None):
+        self.trace_allocations = trace_allocations
+        self.log = log
+        self.level = level
+        self.callbacks = [] if callback is None else [callback]
+        self.records = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Start recording. The Profiler can also be used as a context manager.
+        """
+        with _lock:
+            if self not in _profilers:
+                _profilers.append(self)
+
+        return self
+
+    def stop(self):
+        """
+        Stop recording.
+        """
+        with _lock:
+            if self in _profilers:
+                _profilers.remove(self)
+
+    def add_callback(self, callback):
+        """
+        Register a function which is called with the record of each call.
+        """
+        self.callbacks.append(callback)
+
+    def add(self, record):
+        """
+        Add the record of a call.
+        """
+        self.records.append(record)
+
+        if self.log:
+            logger.log(self.level, "%s: %.6f s, %d bytes out, %d bytes written", record.method, record.time,
+                       record.bytes_out, record.bytes_written)
+
+        for callback in self.callbacks:
+            callback(record)
+
+    def summary(self):
+        """
+        Summary of the records for each method.
+
+        Returns
+        -------
+        dict
+            A dictionary with the method names as keys. The values contain the number of calls, the total time, the
+            size of the results, the bytes written, the throughput of both in MB/s and the maximum allocation peak.
+
+        """
+        summary = {}
+
+        for record in self.records:
+            item = summary.setdefault(record.method, RasterResult(calls=0, time=0.0, bytes_out=0, bytes_written=0,
+                                                                  allocated=None))
+            item.calls += 1
+            item.time += record.time
+            item.bytes_out += record.bytes_out
+            item.bytes_written += record.bytes_written
+
+            if record.allocated is not None:
+                item.allocated = max(item.allocated or 0, record.allocated)
+
+        for item in summary.values():
+            item.out_MBps = item.bytes_out / 2 ** 20 / item.time if item.time > 0 else None
+            item.write_MBps = item.bytes_written / 2 ** 20 / item.time if item.time > 0 else None
+
+        return summary
+
+    def reset(self):
+        """
+        Delete all records.
+        """
+        self.records = []
@@ -2,11 +2,20 @@ from __future__ import division
 
 import os
 import sys
+import uuid
+import weakref
 
 import numpy as np
-from osgeo import (gdal, gdal_array, osr, ogr)
+from osgeo import (gdal, gdal_array)
 from osgeo.gdalconst import GA_ReadOnly
-from .auxiliary import RasterResult
+from . import cache as band_cache
+from . import conversion
+from . import focal as focal_ops
+from .auxiliary import RasterResult, FootprintIndex, MetadataTable, CopyOnWrite
+from .chunked import BandArray, block_chunks
+from .conversion import convert_kernel
+from .executor import SerialExecutor, get_executor, skip_empty_kernel
+from .profiling import instrument
 
 # python 3.6 comparability
 if sys.version_info < (3, 0):
@@ -15,7 +24,7 @@ else:
     srange = range
 
 
-class Raster:
+class Raster(object):
     """
     Import a binary file of ENVI or PolSARpro or a tif to a raster object.
 
@@ -56,6 +65,10 @@ class Raster:
         No data values.
     info : RasterResult
         All information in a dictionary with point access.
+    table : auxiliary.MetadataTable
+        Metadata of all raster files in one structured array, e.g. for vectorised extent filters with
+        `Raster.table.intersects(bbox)` or for the metadata of one file with `Raster.table[i]`. The attributes above
+        are derived from the table on first access.
 
     See Also
     --------
@@ -63,22 +76,12 @@ class Raster:
 
     """
 
+    @instrument()
     def __init__(self, filename=None, path=None, extension=None, check_dim=False):
 
         self.filename = filename
 
-        self.__TYPEMAP = {}
-        for name in dir(np):
-            obj = getattr(np, name)
-            if hasattr(obj, 'dtype'):
-
-                try:
-                    npn = obj(0)
-                    nat = np.asscalar(npn)
-                    if gdal_array.NumericTypeCodeToGDALTypeCode(npn.dtype.type):
-                        self.__TYPEMAP[npn.dtype.name] = gdal_array.NumericTypeCodeToGDALTypeCode(npn.dtype.type)
-                except:
-                    pass
+        self.__TYPEMAP = self.__typemap()
 
         driver = gdal.GetDriverByName('ENVI')
         driver.Register()
@@ -122,7 +125,6 @@ class Raster:
         if isinstance(self.filename, tuple):
 
             inds = tuple(map(lambda x: gdal.Open(x, GA_ReadOnly), self.filename))
-            self.raster = inds
 
             for i in srange(len(inds)):
                 if inds[i] is None:
@@ -131,99 +133,422 @@ class Raster:
                 else:
                     pass
 
-            self.cols = tuple(map(lambda items: items.RasterXSize, inds))
-            self.rows = tuple(map(lambda items: items.RasterYSize, inds))
+        else:
+            inds = gdal.Open(self.filename, GA_ReadOnly)
 
-            if check_dim:
-                _col = self.cols[1:] == self.cols[:-1]
-                _row = self.rows[1:] == self.rows[:-1]
+            if inds is None:
+                raise IOError(
+                    "Couldn't open file {0}. Perhaps you need an .hdr file?".format(str(self.filename)))
+            else:
+                pass
 
-                if _col is not True or _row is not True:
-                    raise AssertionError("Status: Input dimensions must agree",
-                                         "shapes: cols = {0}, rows = {1}".format(self.cols, self.rows))
+        self.__set_metadata(inds)
 
-            self.bands = tuple(map(lambda items: items.RasterCount, inds))
-            self.dim = [self.rows, self.cols, self.bands]
+        if check_dim and isinstance(self.raster, tuple):
+            if not self.table.same_dim():
+                raise AssertionError("Status: Input dimensions must agree",
+                                     "shapes: cols = {0}, rows = {1}".format(self.cols, self.rows))
 
-            self.driver = tuple(map(lambda items: items.GetDriver(), inds))
-            self.dtype = tuple(map(lambda items: gdal.GetDataTypeName(items.GetRasterBand(1).DataType), inds))
+    @staticmethod
+    def __typemap():
+        """
+        Note
+        ----------
+        Map numpy data type names to GDAL data type codes.
 
-            self.projection = tuple(map(lambda items: items.GetProjection(), inds))
-            self.srs = tuple(map(lambda items: osr.SpatialReference(wkt=items), self.projection))
+        Returns
+        -------
+        dict
 
-            self.geotransform = tuple(map(lambda items: items.GetGeoTransform(), inds))
+        """
+        typemap = {}
+        for name in dir(np):
+            obj = getattr(np, name)
+            if hasattr(obj, 'dtype'):
 
-            self.xmin = tuple(map(lambda items: items[0], self.geotransform))
-            self.ymin = tuple(map(lambda items: items[3], self.geotransform))
-            self.xres = tuple(map(lambda items: items[1], self.geotransform))
-            self.yres = tuple(map(lambda items: items[5], self.geotransform))
+                try:
+                    npn = obj(0)
+                    if gdal_array.NumericTypeCodeToGDALTypeCode(npn.dtype.type):
+                        typemap[npn.dtype.name] = gdal_array.NumericTypeCodeToGDALTypeCode(npn.dtype.type)
+                except:
+                    pass
 
-            self.nodata = tuple(map(lambda items: items.GetRasterBand(1).GetNoDataValue(), inds))
+        return typemap
 
-            self.nodata = list(self.nodata)
-            for i in srange(len(self.nodata)):
-                if self.nodata[i] is None:
-                    self.nodata[i] = -99999
+    @classmethod
+    def __from_dataset(cls, inds, filename, sources=None):
+        """
+        Note
+        ----------
+        Create a Raster from an opened gdal data set, e.g. an in-memory virtual data set.
 
-            self.nodata = tuple(self.nodata)
+        Parameters
+        ----------
+        inds:            osgeo.gdal.Dataset or tuple
+                         Opened gdal data set or a tuple with data sets.
 
-            self.info = RasterResult(files=self.filename,
-                                     bands=self.bands,
-                                     dim=self.dim,
-                                     dtype=self.dtype,
-                                     projection=self.projection,
-                                     geotrandform=self.geotransform,
-                                     xmin=self.xmin,
-                                     ymin=self.ymin,
-                                     xres=self.xres,
-                                     yres=self.yres,
-                                     nodata=self.nodata)
+        filename:        str or tuple
+                         Filename or description of the data set.
 
+        sources:         osgeo.gdal.Dataset, tuple or None
+                         Data sets the new data set refers to. They are kept open as long as the Raster exists.
+        Returns
+        -------
+        Raster
 
+        """
+        raster = cls.__new__(cls)
+        raster.filename = filename
+        raster.__TYPEMAP = cls.__typemap()
+        raster.__sources = sources
+        raster.__set_metadata(inds)
 
-        else:
-            inds = gdal.Open(self.filename, GA_ReadOnly)
-            self.raster = inds
+        return raster
 
-            if inds is None:
-                raise IOError(
-                    "Couldn't open file {0}. Perhaps you need an .hdr file?".format(str(self.filename)))
+    @classmethod
+    @instrument()
+    def from_bytes(cls, buf, filename='raster.tif'):
+        """
+        Open a raster file from its content in memory, e.g. the body of a request.
+
+        The content is copied into the in-memory file system of GDAL (/vsimem/), which is freed with the Raster.
+        Nothing is written to disk.
+
+        Parameters
+        ----------
+        buf : bytes, bytearray or memoryview
+            Content of a raster file in a format that GDAL can read, e.g. a GeoTIFF.
+        filename : str, optional
+            Name of the file. Some drivers use the extension to recognize the format. Default is 'raster.tif'.
+
+        Returns
+        -------
+        Raster
+
+        """
+        name = cls.__vsimem_name(filename)
+        gdal.FileFromMemBuffer(name, bytes(buf))
+
+        file = VsimemFile(name)
+        inds = gdal.Open(name, GA_ReadOnly)
+
+        if inds is None:
+            raise IOError("Couldn't open the raster file {0} from bytes.".format(str(filename)))
+
+        return cls.__from_dataset(inds, filename, sources=file)
+
+    @classmethod
+    @instrument()
+    def from_array(cls, array, geotransform, projection='', nodata=None):
+        """
+        Create a Raster from an array with the in-memory driver (MEM) of GDAL.
+
+        If the array is C-contiguous the data set refers to its memory, so the array is not copied. Changes of the
+        array are visible in the data set.
+
+        Parameters
+        ----------
+        array : array_like
+            Array with the dimension (rows, cols) or (bands, rows, cols).
+        geotransform : tuple
+            Geotransform of the grid like (xmin, xres, 0, ymax, 0, yres).
+        projection : str, optional
+            Projection as WKT. Default is ''.
+        nodata : int, float or None, optional
+            No data value of all bands. Default is None.
+
+        Returns
+        -------
+        Raster
+
+        """
+        array = np.ascontiguousarray(array)
+
+        if array.ndim not in (2, 3):
+            raise AssertionError("The array must have the dimension (rows, cols) or (bands, rows, cols).")
+
+        inds = gdal_array.OpenArray(array)
+
+        if inds is None:
+            raise AssertionError("The data type {0} is not supported by GDAL.".format(str(array.dtype)))
+
+        inds.SetGeoTransform(tuple(geotransform))
+        inds.SetProjection(projection)
+
+        if nodata is not None:
+            for i in srange(inds.RasterCount):
+                inds.GetRasterBand(i + 1).SetNoDataValue(nodata)
+
+        # The data set refers to the memory of the array, which must stay alive.
+        return cls.__from_dataset(inds, None, sources=array)
+
+    def __set_metadata(self, inds):
+        """
+        Note
+        ----------
+        Assign the gdal data sets and read their dimension and geo-spatial information.
+
+        Parameters
+        ----------
+        inds:            osgeo.gdal.Dataset or tuple
+                         Opened gdal data set or a tuple with data sets.
+        Returns
+        -------
+        None
+
+        """
+        self.__index = None
+        self.__srs = None
+        self.__columns = {}
+        self.__multiple = isinstance(inds, tuple)
+        self.raster = inds
+
+        datasets = self.__as_tuple(inds)
+        nodata = [item.GetRasterBand(1).GetNoDataValue() for item in datasets]
+
+        # The metadata of all files are collected in one structured array. Equal projections, data types and drivers
+        # of the files refer to the same objects. The attributes like Raster.cols are derived from the table.
+        self.table = MetadataTable(cols=[item.RasterXSize for item in datasets],
+                                   rows=[item.RasterYSize for item in datasets],
+                                   bands=[item.RasterCount for item in datasets],
+                                   geotransform=[item.GetGeoTransform() for item in datasets],
+                                   nodata=[-99999 if item is None else item for item in nodata],
+                                   projection=[item.GetProjection() for item in datasets],
+                                   dtype=[gdal.GetDataTypeName(item.GetRasterBand(1).DataType) for item in datasets],
+                                   driver=[item.GetDriver().ShortName for item in datasets])
+
+    def __column(self, name):
+        """
+        Note
+        ----------
+        Metadata attribute derived from Raster.table. It is a tuple with a value for each file, if the Raster was
+        created with a tuple of files, and the value of the file otherwise. The attribute is created on first access,
+        so unused attributes need no memory.
+
+        """
+        columns = self.__dict__.setdefault('_Raster__columns', {})
+
+        if name not in columns:
+            gt = self.table.data['geotransform']
+
+            if name in ('xmin', 'ymin', 'xres', 'yres'):
+                values = tuple(gt[:, {'xmin': 0, 'ymin': 3, 'xres': 1, 'yres': 5}[name]].tolist())
+            elif name == 'driver':
+                unique = [gdal.GetDriverByName(item) for item in self.table.drivers]
+                values = tuple([unique[i] for i in self.table.data['driver']])
             else:
-                pass
+                values = self.table.column(name)
+
+            columns[name] = values if self.__multiple else values[0]
+
+        return columns[name]
+
+    @property
+    def cols(self):
+        """Number of columns of the raster file or a tuple with the number of each file."""
+        return self.__column('cols')
+
+    @property
+    def rows(self):
+        """Number of rows of the raster file or a tuple with the number of each file."""
+        return self.__column('rows')
+
+    @property
+    def bands(self):
+        """Number of bands of the raster file or a tuple with the number of each file."""
+        return self.__column('bands')
+
+    @property
+    def dim(self):
+        """The dimension [rows, cols, bands]."""
+        return [self.rows, self.cols, self.bands]
+
+    @property
+    def driver(self):
+        """GDAL driver of the raster file or a tuple with the driver of each file."""
+        return self.__column('driver')
+
+    @property
+    def dtype(self):
+        """GDAL data type name of the raster file or a tuple with the data type of each file."""
+        return self.__column('dtype')
+
+    @property
+    def projection(self):
+        """Projection (WKT) of the raster file or a tuple with the projection of each file."""
+        return self.__column('projection')
+
+    @property
+    def geotransform(self):
+        """Geotransform of the raster file or a tuple with the geotransform of each file."""
+        return self.__column('geotransform')
+
+    @property
+    def xmin(self):
+        """x coordinate of the origin of the raster file or a tuple with the coordinate of each file."""
+        return self.__column('xmin')
+
+    @property
+    def ymin(self):
+        """y coordinate of the origin of the raster file or a tuple with the coordinate of each file."""
+        return self.__column('ymin')
+
+    @property
+    def xres(self):
+        """Pixel width of the raster file or a tuple with the width of each file."""
+        return self.__column('xres')
+
+    @property
+    def yres(self):
+        """Pixel height of the raster file or a tuple with the height of each file."""
+        return self.__column('yres')
+
+    @property
+    def nodata(self):
+        """No data value of the raster file or a tuple with the value of each file."""
+        return self.__column('nodata')
+
+    @nodata.setter
+    def nodata(self, value):
+        self.table.data['nodata'] = value
+        self.__dict__.setdefault('_Raster__columns', {})['nodata'] = value
+
+    @property
+    def info(self):
+        """
+        All information in a dictionary with point access (RasterResult) or in a dictionary for a single file.
+        """
+        if self.__multiple:
+            return RasterResult(files=self.filename, bands=self.bands, dim=self.dim, dtype=self.dtype,
+                                projection=self.projection, geotrandform=self.geotransform, xmin=self.xmin,
+                                ymin=self.ymin, xres=self.xres, yres=self.yres, nodata=self.nodata)
+
+        return {'bands': self.bands,
+                'dim': self.bands,
+                'dtype': self.dtype,
+                'projection': self.projection,
+                'geotrandform': self.geotransform,
+                'xmin': self.xmin,
+                'ymin': self.ymin,
+                'xres': self.xres,
+                'yres': self.yres,
+                'nodata': self.nodata}
+
+    @property
+    def srs(self):
+        """
+        Spatial reference (osr.SpatialReference) of the raster file or a tuple with one for each file. The spatial
+        references are created on first access. Files with the same projection share one object.
+        """
+        if self.__dict__.get('_Raster__srs') is None:
+            from osgeo import osr
+
+            srs = [osr.SpatialReference(wkt=item) for item in self.table.projections]
+            srs = tuple([srs[i] for i in self.table.data['projection']])
+
+            self.__srs = srs if isinstance(self.projection, tuple) else srs[0]
 
-            self.cols = inds.RasterXSize
-            self.rows = inds.RasterYSize
-            self.bands = inds.RasterCount
-            self.dim = [self.rows, self.cols, self.bands]
+        return self.__srs
+
+    @property
+    def raster(self):
+        """
+        The gdal data set or a tuple with data sets. After unpickling the data sets are reopened on first access.
+        """
+        if self.__dict__.get('_Raster__raster') is None and self.__dict__.get('_Raster__specs') is not None:
+            datasets = tuple([self.__reopen(spec) for spec in self.__specs])
 
-            self.driver = inds.GetDriver()
-            self.dtype = gdal.GetDataTypeName(inds.GetRasterBand(1).DataType)
+            # The metadata of several files are tuples.
+            self.__raster = datasets if isinstance(self.projection, tuple) else datasets[0]
+            self.__specs = None
 
-            self.projection = inds.GetProjection()
-            # self.srs = osr.SpatialReference(wkt=inds)
+        return self.__dict__.get('_Raster__raster')
+
+    @raster.setter
+    def raster(self, value):
+        self.__raster = value
+        self.__specs = None
+
+    @property
+    def array(self):
+        """
+        The imported arrays. Copies of Raster.copy, which still share the memory of the arrays, get their private
+        buffers first, so changes of the arrays are never seen by the copies.
+        """
+        self.__detach_copies()
+
+        try:
+            return self.__dict__['_Raster__array']
+        except KeyError:
+            raise AttributeError("'{0}' object has no attribute 'array'".format(type(self).__name__))
+
+    @array.setter
+    def array(self, value):
+        # Copies keep the replaced arrays, which stay read-only, because nothing else may change them.
+        self.__copies = []
+        self.__shared = []
+        self.__array = value
+
+    @staticmethod
+    def __open_spec(dataset):
+        """
+        Note
+        ----------
+        Description of a gdal data set, which is sufficient to reopen it in another process: the absolute path of a
+        file or the XML of an in-memory virtual data set (VRT).
+
+        """
+        xml = dataset.GetMetadata('xml:VRT') if dataset.GetDriver().ShortName == 'VRT' else None
 
-            self.geotransform = inds.GetGeoTransform()
+        if xml:
+            return 'vrt', xml[0]
 
-            self.xmin = self.geotransform[0]
-            self.ymin = self.geotransform[3]
-            self.xres = self.geotransform[1]
-            self.yres = self.geotransform[5]
+        description = dataset.GetDescription()
 
-            self.nodata = inds.GetRasterBand(1).GetNoDataValue()
+        if description and os.path.exists(description):
+            return 'file', os.path.abspath(description)
 
-            if self.nodata is None:
-                self.nodata = -99999
+        if description.startswith('/vsi') and not description.startswith('/vsimem/'):
+            return 'file', description
 
-            self.info = {'bands': self.bands,
-                         'dim': self.bands,
-                         'dtype': self.dtype,
-                         'projection': self.projection,
-                         'geotrandform': self.geotransform,
-                         'xmin': self.xmin,
-                         'ymin': self.ymin,
-                         'xres': self.xres,
-                         'yres': self.yres,
-                         'nodata': self.nodata}
+        raise TypeError("The data set {0} has no file and cannot be pickled.".format(repr(description)))
+
+    @staticmethod
+    def __reopen(spec):
+        kind, value = spec
+        dataset = gdal.Open(value, GA_ReadOnly)
+
+        if dataset is None:
+            raise IOError("Couldn't reopen the {0} {1}.".format('virtual data set' if kind == 'vrt' else 'file',
+                                                                value if kind == 'file' else ''))
+
+        return dataset
+
+    def __getstate__(self):
+        """
+        Pickle the filenames and the metadata instead of the gdal data sets. They are reopened lazily after
+        unpickling, so a Raster can be sent to worker processes without repeating Raster.__init__.
+        """
+        state = self.__dict__.copy()
+
+        if state.get('_Raster__raster') is not None:
+            state['_Raster__specs'] = tuple([self.__open_spec(item) for item in self.__as_tuple(self.__raster)])
+
+        state['_Raster__raster'] = None
+        if state.get('_Raster__unwarped') is not None:
+            state['_Raster__unwarped_specs'] = tuple([self.__open_spec(item)
+                                                      for item in self.__as_tuple(self.__unwarped)])
+
+        state['_Raster__sources'] = None
+        state['_Raster__unwarped'] = None
+        state['_Raster__srs'] = None
+        state.pop('_Raster__copies', None)
+        state.pop('_Raster__shared', None)
+
+        # The attributes derived from Raster.table contain gdal drivers and are created again on first access.
+        state.pop('_Raster__columns', None)
+
+        return state
 
     def __subset(self, x, y):
         """
@@ -255,38 +580,513 @@ class Raster:
         if isinstance(self.array, tuple):
             arrays = []
             for i in srange(len(self.array)):
-                arrays_subset = self.array[i][y[0]:y[1], x[0]:x[1]]
+                arrays_subset = self.array[i][..., y[0]:y[1], x[0]:x[1]]
                 arrays.append(arrays_subset)
 
             data = tuple(arrays)
 
         else:
-            data = self.array[y[0]:y[1], x[0]:x[1]]
+            data = self.array[..., y[0]:y[1], x[0]:x[1]]
 
         return data
 
-    def copy(self):
+    def __warp(self, target_grid, resampling='near'):
+        """
+        Note
+        ----------
+        Replace the gdal data sets with in-memory warped virtual data sets on a target grid. Raster.raster and the
+        metadata are replaced permanently. Each warp starts from the data sets before the first warp, which are kept
+        open, so repeated warps are not stacked and the resampling errors don't add up.
+
+        Parameters
+        ----------
+        target_grid:     int or tuple
+                         Index of the reference raster file or a tuple like (geotransform, projection, cols, rows).
+                         The index refers to the grid of the file before the first warp.
+
+        resampling:      str
+                         Resampling method of GDAL.
+        Returns
+        -------
+        None
+
+        """
+        # The warped data sets refer to the data sets before the first warp, which must stay open.
+        if self.__dict__.get('_Raster__unwarped') is None:
+            specs = self.__dict__.get('_Raster__unwarped_specs')
+
+            if specs is None:
+                self.__unwarped = self.raster
+            else:
+                datasets = tuple([self.__reopen(spec) for spec in specs])
+                self.__unwarped = datasets if isinstance(self.raster, tuple) else datasets[0]
+                self.__unwarped_specs = None
+
+        unwarped = self.__as_tuple(self.__unwarped)
+
+        if isinstance(target_grid, int):
+            reference = unwarped[target_grid] if isinstance(self.raster, tuple) else unwarped[0]
+
+            geotransform, projection = reference.GetGeoTransform(), reference.GetProjection()
+            cols, rows = reference.RasterXSize, reference.RasterYSize
+
+        else:
+            geotransform, projection, cols, rows = target_grid
+
+        xs = sorted([geotransform[0], geotransform[0] + cols * geotransform[1]])
+        ys = sorted([geotransform[3], geotransform[3] + rows * geotransform[5]])
+
+        warped = []
+        for item in unwarped:
+            nodata = item.GetRasterBand(1).GetNoDataValue()
+
+            options = gdal.WarpOptions(format='VRT', outputBounds=(xs[0], ys[0], xs[1], ys[1]), width=cols,
+                                       height=rows, dstSRS=projection or None, resampleAlg=resampling,
+                                       srcNodata=nodata, dstNodata=nodata)
+
+            warped.append(gdal.Warp('', item, options=options))
+
+        self.__set_metadata(tuple(warped) if isinstance(self.raster, tuple) else warped[0])
+
+    def __window(self, file, window=None, bbox=None):
+        """
+        Note
+        ----------
+        Pixel window of a raster file. A bounding box in map coordinates is translated with the geotransform of the
+        file and clipped to its extent.
+
+        Parameters
+        ----------
+        file:            int or None
+                         Index of the raster file. None if only one file is imported.
+
+        window:          tuple or None
+                         Pixel window like (xoff, yoff, xsize, ysize).
+
+        bbox:            tuple or None
+                         Bounding box like (xmin, ymin, xmax, ymax).
+        Returns
+        -------
+        tuple
+
+        """
+        if file is None:
+            cols, rows, geotransform = self.cols, self.rows, self.geotransform
+        else:
+            cols, rows, geotransform = self.cols[file], self.rows[file], self.geotransform[file]
+
+        if window is None and bbox is None:
+            return 0, 0, cols, rows
+
+        if bbox is not None:
+            if bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+                raise AssertionError("The bbox must be defined as (xmin, ymin, xmax, ymax)")
+
+            px = sorted([(bbox[0] - geotransform[0]) / geotransform[1], (bbox[2] - geotransform[0]) / geotransform[1]])
+            py = sorted([(bbox[1] - geotransform[3]) / geotransform[5], (bbox[3] - geotransform[3]) / geotransform[5]])
+
+            x0, x1 = max(int(np.floor(px[0])), 0), min(int(np.ceil(px[1])), cols)
+            y0, y1 = max(int(np.floor(py[0])), 0), min(int(np.ceil(py[1])), rows)
+
+            if x0 >= x1 or y0 >= y1:
+                raise AssertionError("The bbox {0} does not intersect the raster file {1}".format(
+                    str(bbox), str(self.filename if file is None else self.filename[file])))
+
+            return x0, y0, x1 - x0, y1 - y0
+
+        xoff, yoff, xsize, ysize = [int(item) for item in window]
+
+        if xoff < 0 or yoff < 0 or xsize < 1 or ysize < 1 or xoff + xsize > cols or yoff + ysize > rows:
+            raise AssertionError("The window {0} exceeds the dimension of the raster file".format(str(window)),
+                                 "shapes: cols = {0}, rows = {1}".format(cols, rows))
+
+        return xoff, yoff, xsize, ysize
+
+    @staticmethod
+    def __as_tuple(value):
+        """
+        Note
+        ----------
+        Wrap the attribute of a single raster file into a tuple, so that single files and tuples of files can be
+        processed in the same way.
+
+        """
+        return value if isinstance(value, tuple) else (value,)
+
+    @staticmethod
+    def __check_grid(rows, cols):
+        """
+        Note
+        ----------
+        Raise an AssertionError if the raster files do not have the same dimensions.
+
         """
-        Copy the imported array.
+        if len(set(rows)) != 1 or len(set(cols)) != 1:
+            raise AssertionError("Status: Input dimensions must agree",
+                                 "shapes: cols = {0}, rows = {1}".format(cols, rows))
+
+    @staticmethod
+    def __read_dtype(dtype, quantification_factor=1):
+        """
+        Note
+        ----------
+        Common numpy data type of GDAL data types. If a quantification factor is used the data type is float32.
+
+        """
+        if quantification_factor > 1:
+            return np.dtype(np.float32)
+
+        return np.result_type(*[gdal_array.GDALTypeCodeToNumericTypeCode(gdal.GetDataTypeByName(item))
+                                for item in dtype])
+
+    def __band_list(self, band, bands):
+        """
+        Note
+        ----------
+        Convert a band selection into a list of GDAL band indices.
+
+        Parameters
+        ----------
+        band:            int, tuple, list or None
+                         Selected bands. If None all bands are selected.
 
+        bands:           int
+                         Number of bands in the raster file.
         Returns
         -------
-        copy : array_like or tuple
-            A copy of Raster.array attribute.
+        list
+
+        """
+        if band is None:
+            return [x + 1 for x in srange(bands)]
+
+        elif isinstance(band, int):
+            band = [band]
+
+        else:
+            band = list(band)
+
+        if min(band) < 1 or max(band) > bands:
+            raise AssertionError("Band selection {0} is out of range. The raster file has {1} bands.".format(
+                str(tuple(band)), str(bands)))
+
+        return band
+
+    @instrument(result='cube')
+    def to_cube(self, band=None, quantification_factor=1, memmap=None):
+        """
+        Read the raster files into one contiguous array with the dimension (time, band, rows, cols).
+
+        In contrast to Raster.to_array the files of a tuple are not stored as separate arrays. The cube is allocated
+        once and each band of each file is read by GDAL directly into its slice of the cube.
+
+        Parameters
+        ----------
+        band : int, tuple or None, optional:
+            Define bands which you want to import. If None (default) import all bands. You can also specify bands in a
+            tuple. E.g. band=(1, 3) will load the first and third band of each image.
+        quantification_factor : int, optional
+            A quantification factor that scales the reflectance values from 0 to 1. If the factor is greater than 1
+            the cube has the data type float32. Default is 1, which have no effect.
+        memmap : str or None, optional
+            If a filename is given, the cube is allocated as a numpy.memmap in this file instead of the memory.
+            Default is None.
+
+        Attributes
+        ----------
+        cube : array_like
+            Raster files as a four dimensional array.
+
+        """
+        raster, rows, cols, bands, dtype, nodata = map(self.__as_tuple, (self.raster, self.rows, self.cols,
+                                                                        self.bands, self.dtype, self.nodata))
+
+        self.__check_grid(rows, cols)
+
+        if band is None and len(set(bands)) != 1:
+            raise AssertionError("Status: Number of bands must agree. Select the bands with the band parameter",
+                                 "bands = {0}".format(bands))
+
+        band_list = [self.__band_list(band, bands[i]) for i in srange(len(raster))]
+        cube_dtype = self.__read_dtype(dtype, quantification_factor)
+
+        shape = (len(raster), len(band_list[0]), rows[0], cols[0])
+
+        if memmap is None:
+            cube = np.empty(shape, dtype=cube_dtype)
+        else:
+            cube = np.memmap(memmap, dtype=cube_dtype, mode='w+', shape=shape)
+
+        for i in srange(len(raster)):
+            for j, b in enumerate(band_list[i]):
+                # GDAL converts the data type while reading into the contiguous slice of the cube.
+                raster[i].GetRasterBand(b).ReadAsArray(buf_obj=cube[i, j])
+
+            if quantification_factor > 1:
+                cube[i] /= quantification_factor
+
+            if np.issubdtype(cube_dtype, np.floating):
+                cube[i][np.isnan(cube[i])] = nodata[i]
+
+        self.cube = cube
+
+    @instrument(result='stack')
+    def to_stack(self, band=None, quantification_factor=1):
+        """
+        Read the raster files directly into a pixel interleaved (BIP) stack.
+
+        The result is the same as Raster.to_array followed by Raster.dstack(unfold=True), but the values are written
+        by GDAL with the pixel and line spacing of the stack. Thus, there is no intermediate band sequential array and
+        each pixel is read only once. If more than one file is imported, the bands of all files are stacked for each
+        pixel in the order of the files.
+
+        Parameters
+        ----------
+        band : int, tuple or None, optional:
+            Define bands which you want to import. If None (default) import all bands. You can also specify bands in a
+            tuple. E.g. band=(1, 3) will load the first and third band of each image.
+        quantification_factor : int, optional
+            A quantification factor that scales the reflectance values from 0 to 1. If the factor is greater than 1
+            the stack has the data type float32. Default is 1, which have no effect.
+
+        Attributes
+        ----------
+        stack : array_like
+            Stacked array with the dimension (rows * cols, bands). With `Raster.stack[pixel]` one gets the values of
+            all bands for a pixel.
+
+        """
+        raster, rows, cols, bands, dtype, nodata = map(self.__as_tuple, (self.raster, self.rows, self.cols,
+                                                                        self.bands, self.dtype, self.nodata))
+
+        self.__check_grid(rows, cols)
+
+        band_list = [self.__band_list(band, bands[i]) for i in srange(len(raster))]
+        stack_dtype = self.__read_dtype(dtype, quantification_factor)
+
+        stack = np.empty((rows[0], cols[0], sum(map(len, band_list))), dtype=stack_dtype)
+
+        k = 0
+        for i in srange(len(raster)):
+            start = k
+            for b in band_list[i]:
+                # The view stack[:, :, k] has a pixel spacing of all bands, so GDAL writes the band interleaved by
+                # pixel.
+                raster[i].GetRasterBand(b).ReadAsArray(buf_obj=stack[:, :, k])
+                k += 1
+
+            part = stack[:, :, start:k]
+
+            if quantification_factor > 1:
+                part /= quantification_factor
+
+            if np.issubdtype(stack_dtype, np.floating):
+                part[np.isnan(part)] = nodata[i]
+
+        self.stack = stack.reshape((rows[0] * cols[0], k))
+
+    @instrument()
+    def to_dask(self, band=None, chunks=(1, 'auto', 'auto'), quantification_factor=1, window=None, bbox=None):
+        """
+        Wrap the raster files as lazily read dask arrays with the dimension (bands, rows, cols).
+
+        Nothing is read until the array is computed. Each chunk is read with a windowed GDAL read, so conversions
+        like Raster.convert and reductions are executed out-of-core and in parallel by the dask scheduler. The threaded
+        scheduler opens one GDAL data set per thread. With the process scheduler each chunk is read by the worker
+        processes, if the data set is a file.
+
+        Parameters
+        ----------
+        band : int, tuple or None, optional:
+            Define bands which you want to import. If None (default) import all bands. You can also specify bands in a
+            tuple. E.g. band=(1, 3) will load the first and third band of the image.
+        chunks : tuple, int or str, optional
+            Chunk size of dask. Automatic chunk sizes are aligned to the blocks of the raster files. Default is one
+            band per chunk and automatic rows and columns.
+        quantification_factor : int, optional
+            A quantification factor that scales the reflectance values from 0 to 1. If the factor is greater than 1
+            the array has the data type float32. Default is 1, which have no effect.
+        window : tuple or None, optional
+            Pixel window (xoff, yoff, xsize, ysize) of the arrays. See Raster.to_array. Default is None.
+        bbox : tuple or None, optional
+            Bounding box (xmin, ymin, xmax, ymax) of the arrays in map coordinates. See Raster.to_array. Default is
+            None.
+
+        Attributes
+        ----------
+        array : dask.array.Array or tuple
+            Raster files as lazy arrays. Use `Raster.array.compute()` or `numpy.asarray` to read them.
+        window : tuple
+            The pixel window (xoff, yoff, xsize, ysize) of the array or a tuple with a window for each file.
 
         """
         try:
-            self.array
-        except AttributeError:
+            import dask.array as da
+            from dask.base import tokenize
+        except ImportError:
+            raise ImportError("Raster.to_dask requires dask. Install it with 'pip install dask[array]'.")
+
+        if window is not None and bbox is not None:
+            raise AssertionError("You must define a window OR a bbox")
+
+        arrays, windows = [], []
+        for i, dataset in enumerate(self.__as_tuple(self.raster)):
+            file = i if isinstance(self.raster, tuple) else None
+
+            band_list = self.__band_list(band, dataset.RasterCount)
+            dtype = self.__read_dtype((gdal.GetDataTypeName(dataset.GetRasterBand(1).DataType),),
+                                      quantification_factor)
+
+            windows.append(self.__window(file, window, bbox))
+            view = BandArray(dataset, band_list, windows[i], dtype, self.__as_tuple(self.nodata)[i],
+                             quantification_factor)
+
+            normalized = da.core.normalize_chunks(chunks, view.shape, dtype=dtype,
+                                                  previous_chunks=(1,) + block_chunks(dataset, band_list[0]))
+
+            name = 'rasterpy-' + tokenize(view.token, band_list, windows[i], dtype.str, quantification_factor)
+
+            arrays.append(da.from_array(view, chunks=normalized, name=name, fancy=False,
+                                        meta=np.empty((0, 0, 0), dtype=dtype)))
+
+        if isinstance(self.raster, tuple):
+            self.array, self.window = tuple(arrays), tuple(windows)
+        else:
+            self.array, self.window = arrays[0], windows[0]
+
+    def __origin(self, reference=0):
+        """
+        Note
+        ----------
+        Origin of the reference grid. If the array was read with a window, the origin of the window is returned.
+
+        Parameters
+        ----------
+        reference:       int
+                         Index of the reference grid, if the Raster import contains several grids.
+        Returns
+        -------
+        tuple
+
+        """
+        geotransform = self.geotransform[reference] if isinstance(self.raster, tuple) else self.geotransform
+
+        window = getattr(self, 'window', None)
+
+        if window is None:
+            xoff, yoff = 0, 0
+        elif isinstance(window[0], tuple):
+            xoff, yoff = window[reference][0], window[reference][1]
+        else:
+            xoff, yoff = window[0], window[1]
+
+        return geotransform[0] + xoff * geotransform[1], geotransform[3] + yoff * geotransform[5]
+
+    def copy(self):
+        """
+        Copy the imported array with copy-on-write semantics.
+
+        The copy shares the memory of Raster.array until one of them is changed. The first item assignment or
+        in-place operation of the copy allocates its private buffer, so Raster.array is never changed by the copy.
+        Vice versa, the copies get their private buffers as soon as Raster.array is accessed again, e.g. by
+        Raster.set_nodata, Raster.convert or by the caller. Until then the shared arrays are read-only, so older
+        references to Raster.array can't change the copies either.
+
+        Returns
+        -------
+        copy : auxiliary.CopyOnWrite or tuple
+            A copy of Raster.array attribute. Lazy dask arrays are immutable and are returned as they are.
+
+        """
+        # Raster.array would give earlier copies their private buffers.
+        if '_Raster__array' not in self.__dict__:
             raise AssertionError(
                 "Before you can copy a array you must convert the raster files to an array with Raster.to_array().")
 
-        return self.array
+        shared = self.__dict__.get('_Raster__shared', [])
+
+        copies = []
+        for item in self.__as_tuple(self.__array):
+            if not isinstance(item, np.ndarray):
+                copies.append(item)
+                continue
+
+            if item.flags.writeable:
+                item.flags.writeable = False
+                shared.append(item)
+
+            copies.append(CopyOnWrite(item))
+
+        self.__shared = shared
+        self.__copies = [weakref.ref(item) for item in copies if isinstance(item, CopyOnWrite)] + [
+            item for item in self.__dict__.get('_Raster__copies', []) if item() is not None]
+
+        return tuple(copies) if isinstance(self.__array, tuple) else copies[0]
+
+    def __detach_copies(self):
+        """
+        Note
+        ----------
+        Give the copy-on-write copies of Raster.array their private buffers and make the shared arrays writable
+        again, before Raster.array is handed out.
+
+        """
+        if not self.__dict__.get('_Raster__copies') and not self.__dict__.get('_Raster__shared'):
+            return
+
+        for item in self.__copies:
+            copy = item()
+            if copy is not None:
+                copy.materialize()
+
+        for item in self.__shared:
+            item.flags.writeable = True
 
+        self.__copies = []
+        self.__shared = []
+
+    @instrument()
+    def mosaic(self, resolution='highest', resampling='near'):
+        """
+        Build a virtual mosaic of the imported raster files.
+
+        The mosaic is an in-memory virtual data set (VRT) over all raster files. Thus, windowed reads, point
+        extraction and statistics work across the boundaries of adjacent tiles, without copying the data into a
+        merged file.
+
+        Parameters
+        ----------
+        resolution : {'highest', 'lowest', 'average'}, optional
+            Resolution of the mosaic if the resolution of the raster files differ. Default is 'highest'.
+        resampling : str, optional
+            Resampling method of GDAL like 'near', 'bilinear' or 'cubic', if the resolution of the raster files
+            differ. Default is 'near'.
+
+        Returns
+        -------
+        Raster
+            A Raster with one data set, which covers the extent of all raster files.
+
+        """
+        if not isinstance(self.raster, tuple):
+            raise AssertionError("You need more than one raster file to build a mosaic.")
+
+        if len(set(self.bands)) != 1:
+            raise AssertionError("Status: Number of bands must agree", "bands = {0}".format(self.bands))
+
+        options = gdal.BuildVRTOptions(resolution=resolution, resampleAlg=resampling)
+        vrt = gdal.BuildVRT('', list(self.raster), options=options)
+
+        return Raster.__from_dataset(vrt, self.filename, sources=self.raster)
+
+    @instrument()
     def extract_point(self, shp, shp_id=None, file=None, band=None):
         """
         Extract raster values from point shape geometry.
 
+        Points outside of a raster file are skipped. If there are more than one raster file in scope, a spatial index
+        over the footprints of the files is used, so each point is only sampled from the files which contain it.
+
         Parameters
         ----------
         shp : str
@@ -302,130 +1102,472 @@ class Raster:
         Returns
         -------
         list
+            A list with [ID, values] for each point. If there are more than one raster file and file is None, a list
+            with such a list for each file is returned.
 
         """
+        from osgeo import ogr
+
         shape = ogr.Open(shp)
         layer = shape.GetLayer()
 
-        li_values = list()
+        ids, xs, ys = list(), list(), list()
+        for j in range(len(layer)):
+
+            feat = layer[j]
+
+            geom = feat.GetGeometryRef()
+
+            if shp_id is None:
+                feat_id = j
+            else:
+                feat_id = feat.GetField(shp_id)
+
+            ids.append(feat_id)
+            xs.append(geom.GetX())
+            ys.append(geom.GetY())
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        points = np.arange(len(ids))
 
         if isinstance(self.raster, tuple):
             if file is None:
-                temp_value = list()
+                point, tile = self.footprint_index().query(xs, ys)
 
-                for k in range(len(self.raster)):
+                # Group the matches by file.
+                order = np.argsort(tile, kind='mergesort')
+                point, tile = point[order], tile[order]
+                bounds = np.searchsorted(tile, np.arange(len(self.raster) + 1))
 
-                    for j in range(len(layer)):
+                li_values = list()
+                for k in srange(len(self.raster)):
+                    li_values.append(
+                        self.__extract_point(k, ids, xs, ys, point[bounds[k]:bounds[k + 1]], band))
 
-                        feat = layer[j]
+                return li_values
 
-                        geom = feat.GetGeometryRef()
+            return self.__extract_point(file, ids, xs, ys, points, band)
 
-                        if shp_id is None:
-                            feat_id = j
-                        else:
-                            feat_id = feat.GetField(shp_id)
+        return self.__extract_point(None, ids, xs, ys, points, band)
 
-                        mx, my = geom.GetX(), geom.GetY()
+    def __extract_point(self, file, ids, xs, ys, points, band):
+        """
+        Note
+        ----------
+        Extract the raster values of one raster file at the selected points. See Raster.extract_point.
 
-                        px = int((mx - self.geotransform[k][0]) / self.geotransform[k][1])
-                        py = int((my - self.geotransform[k][3]) / self.geotransform[k][5])
+        """
+        if file is None:
+            raster, cols, rows, bands, geotransform = self.raster, self.cols, self.rows, self.bands, self.geotransform
+        else:
+            raster, cols, rows, bands = self.raster[file], self.cols[file], self.rows[file], self.bands[file]
+            geotransform = self.geotransform[file]
 
-                        if band is None:
-                            values = np.zeros((1, self.bands[k]))
+        px = np.floor((xs[points] - geotransform[0]) / geotransform[1]).astype(np.intp)
+        py = np.floor((ys[points] - geotransform[3]) / geotransform[5]).astype(np.intp)
 
-                            for i in range(values.shape[1]):
-                                rb = self.raster[k].GetRasterBand(i + 1)
-                                intval = rb.ReadAsArray(px, py, 1, 1)
+        inside = (px >= 0) & (px < cols) & (py >= 0) & (py < rows)
 
-                                values[0, i] = intval[0, 0]
+        if band is None:
+            rbs = [raster.GetRasterBand(i + 1) for i in srange(bands)]
+        else:
+            rb = raster.GetRasterBand(band)
 
-                        else:
-                            rb = self.raster.GetRasterBand(band)
-                            intval = rb.ReadAsArray(px, py, 1, 1)
+        li_values = list()
+        for j, x, y in zip(points[inside], px[inside], py[inside]):
+            x, y = int(x), int(y)
 
-                            values = intval[0, 0]
+            if band is None:
+                values = np.zeros((1, bands))
 
-                        temp_value.append([feat_id, values])
+                for i in range(values.shape[1]):
+                    intval = rbs[i].ReadAsArray(x, y, 1, 1)
 
-                    li_values.append(temp_value)
+                    values[0, i] = intval[0, 0]
 
             else:
+                intval = rb.ReadAsArray(x, y, 1, 1)
 
-                for j in range(len(layer)):
+                values = intval[0, 0]
 
-                    feat = layer[j]
+            li_values.append([ids[j], values])
 
-                    geom = feat.GetGeometryRef()
+        return li_values
 
-                    if shp_id is None:
-                        feat_id = j
-                    else:
-                        feat_id = feat.GetField(shp_id)
+    def footprint_index(self):
+        """
+        Spatial index over the footprints of the raster files.
+
+        The index is derived from the geotransform and the dimension of each file and is cached until the data sets
+        change.
+
+        Returns
+        -------
+        auxiliary.FootprintIndex
+
+        """
+        if getattr(self, '_Raster__index', None) is None:
+            bounds = self.table.bounds()
+
+            self.__index = FootprintIndex(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+
+        return self.__index
+
+    @instrument()
+    def zonal_stats(self, shp, shp_id=None, stats=('mean', 'median', 'count'), file=None, band=None, block_size=256,
+                    all_touched=False):
+        """
+        Calculate statistics of the raster values within polygons of a shape file.
+
+        The polygons are rasterized block by block into an in-memory label raster with the grid of the raster file.
+        The statistics of all polygons are accumulated at once for each block, so each pixel is read only once.
+
+        Parameters
+        ----------
+        shp : str
+            Path to a shape file with polygons. The shape file must have the projection of the raster files.
+        shp_id : str
+            Name of the ID column of the shape file. If None the ID is a continuous number.
+        stats : tuple
+            Statistics to calculate. Supported are 'count', 'sum', 'mean', 'std', 'min', 'max' and 'median'. Default
+            is ('mean', 'median', 'count').
+        file : int
+            If there are more than one raster file in scope you can define which element you want to use. If None
+            all elements will be recognized.
+        band : int, tuple or None
+            You can define which bands you want to use. If None all bands will be recognized.
+        block_size : int
+            Number of rows which are processed at once. Default is 256.
+        all_touched : bool
+            If True all pixels touched by a polygon are used, otherwise only pixels whose center is within the polygon.
+            Default is False.
+
+        Returns
+        -------
+        RasterResult or tuple
+            The IDs of the polygons as attribute `id` and an array with the dimension (polygons, bands) for each
+            statistic. If band is an int the arrays are one dimensional. Pixels with no data values are ignored. If
+            there are more than one raster file and file is None, a tuple with a result for each file is returned.
+
+        """
+        supported = ('count', 'sum', 'mean', 'std', 'min', 'max', 'median')
+        if isinstance(stats, str):
+            stats = (stats,)
+
+        for item in stats:
+            if item not in supported:
+                raise AssertionError("Statistic {0} is not supported. Use one of {1}".format(str(item), str(supported)))
+
+        from osgeo import ogr
+
+        shape = ogr.Open(shp)
+
+        if shape is None:
+            raise IOError("Couldn't open file {0}.".format(str(shp)))
+
+        layer = shape.GetLayer()
+
+        # The polygons are copied into a memory layer with the continuous label 1, 2, ... as burn value.
+        zones = ogr.GetDriverByName('Memory').CreateDataSource('zones')
+        zones_layer = zones.CreateLayer('zones', srs=layer.GetSpatialRef(), geom_type=layer.GetGeomType())
+        zones_layer.CreateField(ogr.FieldDefn('label', ogr.OFTInteger))
+
+        ids = list()
+        for j in range(len(layer)):
+            feat = layer[j]
+            ids.append(j if shp_id is None else feat.GetField(shp_id))
+
+            zone = ogr.Feature(zones_layer.GetLayerDefn())
+            zone.SetGeometry(feat.GetGeometryRef())
+            zone.SetField('label', j + 1)
+            zones_layer.CreateFeature(zone)
+
+        if isinstance(self.raster, tuple):
+            if file is None:
+                return tuple([self.__zonal_stats(k, zones_layer, ids, stats, band, block_size, all_touched)
+                              for k in srange(len(self.raster))])
+
+            return self.__zonal_stats(file, zones_layer, ids, stats, band, block_size, all_touched)
+
+        return self.__zonal_stats(None, zones_layer, ids, stats, band, block_size, all_touched)
+
+    def __zonal_stats(self, file, zones_layer, ids, stats, band, block_size, all_touched):
+        """
+        Note
+        ----------
+        Zonal statistics of one raster file. See Raster.zonal_stats.
+
+        """
+        if file is None:
+            raster, cols, rows, bands = self.raster, self.cols, self.rows, self.bands
+            geotransform, projection, nodata = self.geotransform, self.projection, self.nodata
+        else:
+            raster, cols, rows, bands = self.raster[file], self.cols[file], self.rows[file], self.bands[file]
+            geotransform, projection, nodata = self.geotransform[file], self.projection[file], self.nodata[file]
+
+        band_list = self.__band_list(band, bands)
+        nzones = len(ids) + 1
+        shape = (nzones, len(band_list))
+
+        count = np.zeros(shape)
+        total = np.zeros(shape)
+        squares = np.zeros(shape)
+        minimum = np.full(shape, np.inf)
+        maximum = np.full(shape, -np.inf)
+        pairs = [[] for _ in band_list]
+
+        options = ['ATTRIBUTE=label']
+        if all_touched:
+            options.append('ALL_TOUCHED=TRUE')
+
+        mem_driver = gdal.GetDriverByName('MEM')
+
+        for row in srange(0, rows, block_size):
+            nrows = min(block_size, rows - row)
+
+            origin_y = geotransform[3] + row * geotransform[5]
+            block_geotransform = (geotransform[0], geotransform[1], geotransform[2], origin_y, geotransform[4],
+                                  geotransform[5])
 
-                    mx, my = geom.GetX(), geom.GetY()
+            # Only polygons which intersect the block are rasterized.
+            ys = sorted([origin_y, origin_y + nrows * geotransform[5]])
+            zones_layer.SetSpatialFilterRect(geotransform[0], ys[0], geotransform[0] + cols * geotransform[1], ys[1])
 
-                    px = int((mx - self.geotransform[file][0]) / self.geotransform[file][1])
-                    py = int((my - self.geotransform[file][3]) / self.geotransform[file][5])
+            label_raster = mem_driver.Create('', cols, nrows, 1, gdal.GDT_UInt32)
+            label_raster.SetGeoTransform(block_geotransform)
+            label_raster.SetProjection(projection)
+            gdal.RasterizeLayer(label_raster, [1], zones_layer, options=options)
+
+            labels = label_raster.GetRasterBand(1).ReadAsArray().ravel().astype(np.intp)
+            label_raster = None
+
+            inside = labels > 0
+            if not inside.any():
+                continue
+
+            for k, b in enumerate(band_list):
+                values = raster.GetRasterBand(b).ReadAsArray(0, row, cols, nrows).ravel()[inside].astype(np.float64)
+                label = labels[inside]
+
+                valid = ~np.isnan(values) & (values != nodata)
+                values, label = values[valid], label[valid]
+
+                count[:, k] += np.bincount(label, minlength=nzones)
+                total[:, k] += np.bincount(label, weights=values, minlength=nzones)
+
+                if 'std' in stats:
+                    squares[:, k] += np.bincount(label, weights=values ** 2, minlength=nzones)
+
+                if 'min' in stats:
+                    np.minimum.at(minimum[:, k], label, values)
+
+                if 'max' in stats:
+                    np.maximum.at(maximum[:, k], label, values)
+
+                if 'median' in stats:
+                    pairs[k].append((label, values))
+
+        zones_layer.SetSpatialFilter(None)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+
+            result = RasterResult(id=ids)
+
+            for item in stats:
+                if item == 'count':
+                    value = count
+                elif item == 'sum':
+                    value = total
+                elif item == 'mean':
+                    value = mean
+                elif item == 'std':
+                    value = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+                elif item == 'min':
+                    value = np.where(count > 0, minimum, np.nan)
+                elif item == 'max':
+                    value = np.where(count > 0, maximum, np.nan)
+                else:
+                    value = np.column_stack([self.__label_median(item_pairs, nzones) for item_pairs in pairs])
+
+                # Label 0 is the background.
+                value = value[1:]
+                result[item] = value[:, 0] if isinstance(band, int) else value
+
+        return result
+
+    @staticmethod
+    def __label_median(pairs, nzones):
+        """
+        Note
+        ----------
+        Median of values grouped by labels.
+
+        Parameters
+        ----------
+        pairs:           list
+                         List with tuples of label and value arrays.
+
+        nzones:          int
+                         Number of labels including the background label 0.
+        Returns
+        -------
+        array_like
+
+        """
+        median = np.full(nzones, np.nan)
+
+        if len(pairs) == 0:
+            return median
+
+        label = np.concatenate([item[0] for item in pairs])
+        values = np.concatenate([item[1] for item in pairs])
+
+        order = np.lexsort((values, label))
+        label, values = label[order], values[order]
+
+        count = np.bincount(label, minlength=nzones)
+        start = np.concatenate(([0], np.cumsum(count)[:-1]))
+        has_values = count > 0
+
+        lower = (start + (count - 1) // 2)[has_values]
+        upper = (start + count // 2)[has_values]
+        median[has_values] = (values[lower] + values[upper]) / 2
+
+        return median
+
+    @staticmethod
+    def __read_band(band, xoff, yoff, xsize, ysize, skip_empty=False):
+        """
+        Note
+        ----------
+        Read a window of a band. If the band cache is enabled, the band is read from or stored in the cache. See
+        rasterpy.cache.
+
+        Returns
+        -------
+        array_like
+
+        """
+        cache = band_cache.active()
+
+        if cache is None:
+            if skip_empty:
+                return Raster.__read_sparse(band, xoff, yoff, xsize, ysize)
+
+            return band.ReadAsArray(xoff, yoff, xsize, ysize)
+
+        key = band_cache.key(band.GetDataset().GetDescription(), band.GetBand(), (xoff, yoff, xsize, ysize),
+                             gdal.GetDataTypeName(band.DataType))
+
+        array = None if key is None else cache.get(key)
+
+        if array is None:
+            if skip_empty:
+                array = Raster.__read_sparse(band, xoff, yoff, xsize, ysize)
+            else:
+                array = band.ReadAsArray(xoff, yoff, xsize, ysize)
+
+            if key is not None:
+                cache.put(key, array)
+
+        return array
+
+    @staticmethod
+    def __read_sparse(band, xoff, yoff, xsize, ysize):
+        """
+        Note
+        ----------
+        Read a window of a band, but skip the blocks without data. GDAL reports the blocks of sparse files, which were
+        never written, as empty. These blocks are filled with the no data value of the band (or 0) without reading or
+        decoding them. Drivers that cannot report the coverage are read completely.
 
-                    if band is None:
-                        values = np.zeros((1, self.bands[file]))
+        Returns
+        -------
+        array_like
 
-                        for i in range(values.shape[1]):
-                            rb = self.raster[file].GetRasterBand(i + 1)
-                            intval = rb.ReadAsArray(px, py, 1, 1)
+        """
+        flags = band.GetDataCoverageStatus(xoff, yoff, xsize, ysize)[0]
 
-                            values[0, i] = intval[0, 0]
+        if not flags & gdal.GDAL_DATA_COVERAGE_STATUS_EMPTY:
+            return band.ReadAsArray(xoff, yoff, xsize, ysize)
 
-                    else:
-                        rb = self.raster.GetRasterBand(band)
-                        intval = rb.ReadAsArray(px, py, 1, 1)
+        nodata = band.GetNoDataValue()
+        array = np.full((ysize, xsize), 0 if nodata is None else nodata,
+                        dtype=gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType))
 
-                        values = intval[0, 0]
+        if not flags & gdal.GDAL_DATA_COVERAGE_STATUS_DATA:
+            return array
 
-                    li_values.append([feat_id, values])
+        bx, by = band.GetBlockSize()
 
-        else:
-            for j in range(len(layer)):
+        for y in srange(yoff - yoff % by, yoff + ysize, by):
+            for x in srange(xoff - xoff % bx, xoff + xsize, bx):
+                x0, y0 = max(x, xoff), max(y, yoff)
+                x1, y1 = min(x + bx, xoff + xsize), min(y + by, yoff + ysize)
 
-                feat = layer[j]
+                if band.GetDataCoverageStatus(x0, y0, x1 - x0, y1 - y0)[0] & gdal.GDAL_DATA_COVERAGE_STATUS_DATA:
+                    band.ReadAsArray(x0, y0, x1 - x0, y1 - y0, buf_obj=array[y0 - yoff:y1 - yoff, x0 - xoff:x1 - xoff])
 
-                geom = feat.GetGeometryRef()
+        return array
 
-                if shp_id is None:
-                    feat_id = j
-                else:
-                    feat_id = feat.GetField(shp_id)
+    @staticmethod
+    def __image_dtype(dtype, component, keep_dtype=False):
+        """
+        Note
+        ----------
+        numpy data type of the array read by Raster.to_array. Real bands are read as float64 or with the data type of
+        the raster file, if keep_dtype is True. Complex bands keep their data type and derived components are float32
+        or float64.
 
-                mx, my = geom.GetX(), geom.GetY()
+        """
+        numeric = Raster.__read_dtype((dtype,))
 
-                px = int((mx - self.geotransform[0]) / self.geotransform[1])
-                py = int((my - self.geotransform[3]) / self.geotransform[5])
+        if component != 'complex':
+            return conversion.component_dtype(numeric)
 
-                if band is None:
-                    values = np.zeros((1, self.bands))
+        if keep_dtype or np.issubdtype(numeric, np.complexfloating):
+            return numeric
 
-                    for i in range(values.shape[1]):
-                        rb = self.raster.GetRasterBand(i + 1)
-                        intval = rb.ReadAsArray(px, py, 1, 1)
+        return np.dtype(np.float64)
 
-                        values[0, i] = intval[0, 0]
+    @staticmethod
+    def __read_into(out, band, xoff, yoff, xsize, ysize, skip_empty=False, component='complex'):
+        """
+        Note
+        ----------
+        Read a window of a band into the array out. If a component is derived, the band is read in strips of at least
+        256 rows, which are aligned to the blocks of the band. Only one strip of complex values is in memory. Pixels
+        with the no data value of the band keep it.
 
-                else:
-                    rb = self.raster.GetRasterBand(band)
-                    intval = rb.ReadAsArray(px, py, 1, 1)
+        """
+        if component == 'complex':
+            out[...] = Raster.__read_band(band, xoff, yoff, xsize, ysize, skip_empty)
+            return
 
-                    values = intval[0, 0]
+        nodata = band.GetNoDataValue()
+        by = max(band.GetBlockSize()[1], 1)
+        nrows = by * max(256 // by, 1)
 
-                li_values.append([feat_id, values])
+        for y in srange(0, ysize, nrows):
+            n = min(nrows, ysize - y)
+            strip = Raster.__read_band(band, xoff, yoff + y, xsize, n, skip_empty)
+            conversion.component_kernel(strip, component, out=out[y:y + n])
 
-        return li_values
+            if nodata is not None:
+                out[y:y + n][strip == nodata] = nodata
 
-    def to_array(self, band=None, flatten=True, quantification_factor=1):
+    @instrument(result='array')
+    def to_array(self, band=None, flatten=True, quantification_factor=1, window=None, bbox=None, target_grid=None,
+                 resampling='near', skip_empty=False, component='complex', keep_dtype=False):
         """
         Converts a binary file of ENVI or PolSARpro or a tif to a numpy
         array.
 
+        If the band cache is enabled with `rasterpy.cache.enable`, the bands are read from the cache, if the same band
+        and window of an unchanged file was read before.
+
         Parameters
         ----------
         band : int, tuple or None, optional:
@@ -437,16 +1579,64 @@ class Raster:
         quantification_factor : int, optional
             A quantification factor that scales the reflectance values from 0 to 1. It is only required if the imported
             raster files are reflectance values. For sentinel 2 the factor is 10000. Default is 1, which have no effect.
+        window : tuple or None, optional
+            Read only a subset of the raster files, defined in pixel coordinates as (xoff, yoff, xsize, ysize). If
+            more than one file is imported, the same window is read from each file. Default is None.
+        bbox : tuple or None, optional
+            Read only a subset of the raster files, defined in map coordinates as (xmin, ymin, xmax, ymax). The
+            bounding box is translated with the geotransform of each file into a pixel window and is clipped to the
+            extent of the file. Default is None.
+        target_grid : int, tuple or None, optional
+            Reproject and resample the raster files on read to a common grid. The grid is either the index of a raster
+            file, whose grid is used as reference, or a tuple like (geotransform, projection, cols, rows). The files
+            are warped in memory with virtual data sets (VRT), so only the requested blocks are warped and nothing is
+            written to disk. Afterwards the Raster refers to the warped data sets permanently, i.e. Raster.raster,
+            the dimension, geotransform and projection of all files are those of the target grid. A window or bbox
+            refers to the target grid. Another target_grid warps the original files again, so warps are not stacked.
+            Default is None.
+        resampling : str, optional
+            Resampling method of GDAL like 'near', 'bilinear', 'cubic', 'average' or 'mode'. Only used with a
+            target_grid. Default is 'near'.
+        skip_empty : bool, optional
+            If True the data coverage of each block is queried with GDAL and empty blocks, e.g. the blocks of sparse
+            GeoTIFFs that were never written, are filled with the no data value of the band (or 0) instead of being
+            read. This pays off for files which are mostly empty, like scenes at the edges of an orbit. Default is
+            False.
+        component : {'complex', 'intensity', 'amplitude', 'phase'}, optional
+            Quantity which is derived from complex data like SLCs or PolSARpro matrices (CInt16, CFloat32). The bands
+            are read in strips of blocks and the quantity is computed from each strip, so the complex data is never
+            in memory as a whole. The array has the data type float32 (float64 for CFloat64). See
+            rasterpy.conversion.component_kernel. Default is 'complex', which reads the values unchanged.
+        keep_dtype : bool, optional
+            If True real bands are read with the data type of the raster files, e.g. uint8 or uint16, instead of
+            float64. Integer arrays need less memory and Raster.convert applies a lookup table to them. Default is
+            False.
 
         Attributes
         ----------
         array : array_like or tuple with array_likes
-            Raster files as arrays.
+            Raster files as arrays. Real bands are float64 (float32 with a quantification factor), unless keep_dtype
+            is True, and complex bands keep their data type.
+        window : tuple
+            The pixel window (xoff, yoff, xsize, ysize) of the array or a tuple with a window for each file.
 
         """
+        if window is not None and bbox is not None:
+            raise AssertionError("You must define a window OR a bbox")
+
+        if component not in conversion.COMPONENTS:
+            raise AssertionError("Component must be one of {0}. The component is {1}".format(
+                str(conversion.COMPONENTS), str(component)))
+
+        if target_grid is not None:
+            self.__warp(target_grid, resampling)
+
         if isinstance(self.raster, tuple):
+            self.window = tuple([self.__window(i, window, bbox) for i in srange(len(self.raster))])
+
             images = []
             for i in srange(len(self.raster)):
+                xoff, yoff, xsize, ysize = self.window[i]
 
                 if band is not None:
                     if isinstance(band, list):
@@ -464,12 +1654,12 @@ class Raster:
                     band = range(self.bands[i])
                     band = [x + 1 for x in band]
 
-                image = np.zeros((nband, self.rows[i], self.cols[i]),
-                                 dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype[i]))
+                dtype = self.__image_dtype(self.dtype[i], component, keep_dtype)
+                image = np.zeros((nband, ysize, xsize), dtype=dtype)
 
                 if isinstance(band, int):
                     band_ = self.raster[i].GetRasterBand(band)
-                    image[0] = band_.ReadAsArray()
+                    self.__read_into(image[0], band_, xoff, yoff, xsize, ysize, skip_empty, component)
 
                 else:
                     band_select_list = []
@@ -480,7 +1670,8 @@ class Raster:
 
                     for j in srange(nband):
                         # Read in the band's data into the third dimension of our array
-                        image[j] = band_select_list[j].ReadAsArray()
+                        self.__read_into(image[j], band_select_list[j], xoff, yoff, xsize, ysize, skip_empty,
+                                         component)
 
                 if quantification_factor > 1:
                     image = image.astype(np.float32) / quantification_factor
@@ -490,8 +1681,7 @@ class Raster:
                 if flatten:
                     array = image
 
-                    image = np.zeros((nband, array[0].size,),
-                                     dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype))
+                    image = np.zeros((nband, array[0].size,), dtype=array.dtype)
 
                     if isinstance(band, int):
                         image[0] = array.flatten()
@@ -503,13 +1693,18 @@ class Raster:
 
                         image = image.flatten() if nband == 1 else image
 
-                image[np.isnan(image)] = self.nodata[i]
+                # Integer arrays have no NaN values and may not be able to hold the no data value.
+                if np.issubdtype(image.dtype, np.inexact):
+                    image[np.isnan(image)] = self.nodata[i]
 
                 images.append(image)
 
             self.array = tuple(images)
 
         else:
+            self.window = self.__window(None, window, bbox)
+            xoff, yoff, xsize, ysize = self.window
+
             if band is not None:
                 if isinstance(band, list):
                     band = tuple(band)
@@ -527,12 +1722,12 @@ class Raster:
                 band = range(self.bands)
                 band = [x + 1 for x in band]
 
-            image = np.zeros((nband, self.rows, self.cols),
-                             dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype))
+            dtype = self.__image_dtype(self.dtype, component, keep_dtype)
+            image = np.zeros((nband, ysize, xsize), dtype=dtype)
 
             if isinstance(band, int):
                 band_ = self.raster.GetRasterBand(band)
-                image[0] = band_.ReadAsArray()
+                self.__read_into(image[0], band_, xoff, yoff, xsize, ysize, skip_empty, component)
 
             else:
                 band_select_list = []
@@ -544,7 +1739,7 @@ class Raster:
 
                 for j in srange(nband):
                     # Read in the band's data into the third dimension of our array
-                    image[j] = band_select_list[j].ReadAsArray()
+                    self.__read_into(image[j], band_select_list[j], xoff, yoff, xsize, ysize, skip_empty, component)
 
             if quantification_factor > 1:
                 self.array = image.astype(np.float32) / quantification_factor
@@ -552,8 +1747,7 @@ class Raster:
                 self.array = image
 
             if flatten:
-                image = np.zeros((nband, self.array[0].size,),
-                                 dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype))
+                image = np.zeros((nband, self.array[0].size,), dtype=self.array.dtype)
 
                 if isinstance(band, int):
                     image[0] = self.array.flatten()
@@ -563,6 +1757,7 @@ class Raster:
 
                 self.array = image.flatten() if nband == 1 else image
 
+    @instrument()
     def reshape(self):
         """
         Reshape loaded arrays to their original dimension.
@@ -577,7 +1772,7 @@ class Raster:
             if self.array[0].ndim == 1:
                 array = []
                 for i in srange(len(self.array)):
-                    temp = self.array[i].reshape((self.rows[i], self.cols[i]))
+                    temp = self.array[i].reshape((self.window[i][3], self.window[i][2]))
                     array.append(temp)
 
                 self.array = tuple(array)
@@ -585,17 +1780,18 @@ class Raster:
             else:
                 array = []
                 for i in srange(len(self.array)):
-                    temp = self.array[i].reshape((self.array[i].shape[0], self.rows[i], self.cols[i]))
+                    temp = self.array[i].reshape((self.array[i].shape[0], self.window[i][3], self.window[i][2]))
                     array.append(temp)
 
                 self.array = tuple(array)
         else:
             if self.array.ndim == 1:
-                self.array = self.array.reshape((self.rows, self.cols))
+                self.array = self.array.reshape((self.window[3], self.window[2]))
 
             else:
-                self.array = self.array.reshape((self.array.shape[0], self.rows, self.cols))
+                self.array = self.array.reshape((self.array.shape[0], self.window[3], self.window[2]))
 
+    @instrument()
     def flatten(self):
         """
         Collapse the loaded arrays into one dimension.
@@ -623,8 +1819,7 @@ class Raster:
             else:
                 images = []
                 for i in srange(len(self.array)):
-                    image = np.zeros((self.bands[i], self.array[i][0].size,),
-                                     dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype[i]))
+                    image = np.zeros((self.bands[i], self.array[i][0].size,), dtype=self.array[i].dtype)
 
                     for b in srange(self.bands[i]):
                         image[b] = self.array[i][b].flatten()
@@ -638,18 +1833,39 @@ class Raster:
                 self.array = self.array.flatten()
 
             else:
-                image = np.zeros((self.bands, self.array[0].size,),
-                                 dtype=gdal_array.GDALTypeCodeToNumericTypeCode(self.dtype))
+                image = np.zeros((self.bands, self.array[0].size,), dtype=self.array.dtype)
 
                 for b in srange(self.bands):
                     image[b] = self.array[b].flatten()
 
                 self.array = image
 
+    @staticmethod
+    def __fit_nodata(array, nodata):
+        """
+        Note
+        ----------
+        The array as float64, if it is an integer array, which can't hold the no data value. Otherwise the array
+        itself.
+
+        """
+        if not np.issubdtype(array.dtype, np.integer):
+            return array
+
+        info = np.iinfo(array.dtype)
+
+        if np.isfinite(nodata) and nodata == np.floor(nodata) and info.min <= nodata <= info.max:
+            return array
+
+        return array.astype(np.float64)
+
+    @instrument()
     def set_nodata(self, nodata):
         """
         Set and assign a new no data value.
 
+        Integer arrays, which can't hold the no data value, e.g. np.nan or -99999 in uint8, are converted to float64.
+
         Parameters
         ----------
         nodata : int, float or np.nan
@@ -666,22 +1882,27 @@ class Raster:
             raise AssertionError(
                 "Before you can assign a new no data value must convert the data to an array with Raster.to_array().")
 
+        self.__detach_copies()
+
         if isinstance(self.raster, tuple):
             nodata_list = []
             for i in srange(len(self.array)):
                 nodata_list.append(nodata)
 
             self.nodata = tuple(nodata_list)
+            self.array = tuple([self.__fit_nodata(item, nodata) for item in self.array])
 
             for i in srange(len(self.array)):
                 self.array[i][np.isnan(self.array[i])] = self.nodata[i]
-                self.array[i][np.where(self.array[0] == 0)] = self.nodata[i]
+                self.array[i][self.array[i] == 0] = self.nodata[i]
         else:
             self.nodata = nodata
+            self.array = self.__fit_nodata(self.array, nodata)
             self.array[np.isnan(self.array)] = self.nodata
-            self.array[np.where(self.array[0] == 0)] = self.nodata
+            self.array[self.array == 0] = self.nodata
 
-    def write(self, data, filename, path=None, reference=0):
+    @instrument(write='data')
+    def write(self, data, filename, path=None, reference=0, options=None, to_bytes=False, sparse=False):
         """
         Convert an array into a binary (.bin) file with header (.hdr) or a Tif file.
 
@@ -697,12 +1918,33 @@ class Raster:
         reference :
             If the Raster import contains several grids, you can specify which of these grids you want to use as
             reference for geo-spatial information (default=0).
+        options : list or None, optional
+            GDAL creation options of the driver, e.g. ['COMPRESS=DEFLATE', 'TILED=YES'] for a tif. Default is None.
+        to_bytes : bool, optional
+            If True the files are written into the in-memory file system of GDAL (/vsimem/) and their content is
+            returned. Nothing is written to disk. The filename only defines the format, which must be a tif. Default
+            is False.
+        sparse : bool, optional
+            If True tif files are written with the creation option SPARSE_OK=TRUE. Blocks which only contain the no
+            data value are not written to the file, which saves space and time for mostly empty rasters. Such files
+            can be read with `Raster.to_array(skip_empty=True)`. Default is False.
 
         Returns
         -------
-        Grid as .tif or .bin
+        Grid as .tif or .bin. If to_bytes is True the content of the file as bytes or a tuple with bytes.
         """
-        if path is not None:
+        if sparse:
+            options = list(options or []) + ['SPARSE_OK=TRUE']
+
+        if to_bytes:
+            for item in self.__as_tuple(filename):
+                if item.split('.')[-1] not in ('tif', 'tiff'):
+                    raise AssertionError("Only tif files can be written to bytes. The filename is {0}".format(item))
+
+            names = tuple([self.__vsimem_name(item) for item in self.__as_tuple(filename)])
+            filename = names if isinstance(filename, tuple) else names[0]
+
+        elif path is not None:
             os.chdir(path)
         else:
             pass
@@ -725,8 +1967,7 @@ class Raster:
                     ndim, rows, cols = data_.shape
 
                 gdal_dtype = self.__TYPEMAP[data_.dtype.name]
-                origin_x = self.xmin[reference] if isinstance(self.xmin, tuple) else self.xmin
-                origin_y = self.ymin[reference] if isinstance(self.ymin, tuple) else self.ymin
+                origin_x, origin_y = self.__origin(reference)
 
                 filename_temp = filename[i].split('.')
 
@@ -739,7 +1980,7 @@ class Raster:
                         "File extension must be `tif`, `tiff` or `bin`. The actual extension is {0}".format(
                             str(filename_temp[-1])))
 
-                outds = outdriver.Create(filename[i], cols, rows, ndim, gdal_dtype)
+                outds = outdriver.Create(filename[i], cols, rows, ndim, gdal_dtype, options or [])
 
                 for j in srange(ndim):
                     post_1 = self.xres[reference] if isinstance(self.xres, tuple) else self.xres
@@ -750,11 +1991,12 @@ class Raster:
                         self.projection[reference] if isinstance(self.projection, tuple) else self.projection)
 
                     out_band = outds.GetRasterBand(j + 1)
+                    # The no data value is set first, so that sparse files can skip blocks with no data.
+                    out_band.SetNoDataValue(self.nodata[reference] if isinstance(self.nodata, tuple) else self.nodata)
                     if data_.ndim > 2:
                         out_band.WriteArray(data_[j])
                     else:
                         out_band.WriteArray(data_)
-                    out_band.SetNoDataValue(self.nodata[reference] if isinstance(self.nodata, tuple) else self.nodata)
 
         else:
             filename_temp = filename.split('.')
@@ -778,10 +2020,9 @@ class Raster:
                 ndim, rows, cols = data.shape
 
             gdal_dtype = self.__TYPEMAP[data.dtype.name]
-            origin_x = self.xmin[reference] if isinstance(self.xmin, tuple) else self.xmin
-            origin_y = self.ymin[reference] if isinstance(self.ymin, tuple) else self.ymin
+            origin_x, origin_y = self.__origin(reference)
 
-            outds = outdriver.Create(filename, cols, rows, ndim, gdal_dtype)
+            outds = outdriver.Create(filename, cols, rows, ndim, gdal_dtype, options or [])
 
             for i in srange(ndim):
                 post_1 = self.xres[reference] if isinstance(self.xres, tuple) else self.xres
@@ -792,112 +2033,63 @@ class Raster:
                     self.projection[reference] if isinstance(self.projection, tuple) else self.projection)
 
                 out_band = outds.GetRasterBand(i + 1)
+                # The no data value is set first, so that sparse files can skip blocks with no data.
+                out_band.SetNoDataValue(self.nodata[reference] if isinstance(self.nodata, tuple) else self.nodata)
                 if data.ndim > 2:
                     out_band.WriteArray(data[i])
                 else:
                     out_band.WriteArray(data)
-                out_band.SetNoDataValue(self.nodata[reference] if isinstance(self.nodata, tuple) else self.nodata)
 
-    @staticmethod
-    def dB(x):
-        """
-        Convert a linear value to dB.
-        """
-        with np.errstate(invalid='ignore'):
-            return 10 * np.log10(x)
+        if to_bytes:
+            # The data sets must be closed, before the files are complete.
+            out_band = outds = None
+            content = tuple([self.__read_vsimem(item) for item in self.__as_tuple(filename)])
 
-    @staticmethod
-    def linear(x):
-        """
-        Convert a dB value in linear.
-        """
-        return 10 ** (x / 10)
+            return content if isinstance(filename, tuple) else content[0]
 
     @staticmethod
-    def BRDF(BSC, iza, vza, angle_unit='RAD'):
+    def __vsimem_name(filename):
         """
-        Convert a Radar Backscatter Coefficient (BSC) into a BRDF.
-
-        Parameters
+        Note
         ----------
-        BSC : int, float or array_like
-            Radar Backscatter Coefficient (sigma 0).
-
-        iza : int, float or array_like
-            Sun or incidence zenith angle.
-
-        vza : int, float or array_like
-            View or scattering zenith angle.
-
-        angle_unit : {'DEG', 'RAD'} (default = 'RAD'), optional
-            * 'DEG': All input angles (iza, vza, raa) are in [DEG].
-            * 'RAD': All input angles (iza, vza, raa) are in [RAD].
-
-        Returns
-        -------
-        BRDF value : int, float or array_like
+        Unique name of a file in the in-memory file system of GDAL.
 
         """
-        if angle_unit == 'RAD':
-            return BSC / (np.cos(iza) * np.cos(vza) * (4 * np.pi))
-
-        elif angle_unit == 'DEG':
-            return BSC / (np.cos(np.radians(iza)) * np.cos(np.radians(vza)) * (4 * np.pi))
-        else:
-            raise ValueError("angle_unit must be 'RAD' or 'DEG'")
+        return '/vsimem/rasterpy_{0}_{1}'.format(uuid.uuid4().hex, os.path.basename(filename))
 
     @staticmethod
-    def BRF(BRDF):
+    def __read_vsimem(name):
         """
-        Convert a BRDF into a BRF.
-
-        Parameters
+        Note
         ----------
-        BRDF : int, float or array_like
-            BRDF value.
-
-        Returns
-        -------
-        BRF value : int, float or array_like
+        Read and delete a file of the in-memory file system of GDAL.
 
         """
-        return np.pi * BRDF
+        handle = gdal.VSIFOpenL(name, 'rb')
 
-    @staticmethod
-    def BSC(BRDF, iza, vza, angle_unit='RAD'):
-        """
-        Convert a BRDF in to a Radar Backscatter Coefficient (BSC).
-
-        Parameters
-        ----------
-        BSC : int, float or array_like
-            Radar Backscatter Coefficient (sigma 0).
-
-        iza : int, float or array_like
-            Sun or incidence zenith angle.
-
-        vza : int, float or array_like
-            View or scattering zenith angle.
+        if handle is None:
+            raise IOError("Couldn't open file {0}.".format(name))
 
-        angle_unit : {'DEG', 'RAD'} (default = 'RAD'), optional
-            * 'DEG': All input angles (iza, vza, raa) are in [DEG].
-            * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+        try:
+            gdal.VSIFSeekL(handle, 0, 2)
+            size = gdal.VSIFTellL(handle)
+            gdal.VSIFSeekL(handle, 0, 0)
 
-        Returns
-        -------
-        BRDF value : int, float or array_like
+            return bytes(gdal.VSIFReadL(1, size, handle))
 
-        """
-        if angle_unit == 'RAD':
-            return BRDF * np.cos(iza) * np.cos(vza) * 4 * np.pi
+        finally:
+            gdal.VSIFCloseL(handle)
+            gdal.Unlink(name)
 
-        elif angle_unit == 'DEG':
-            return BRDF * np.cos(np.radians(iza)) * np.cos(np.radians(vza)) * (4 * np.pi)
-        else:
-            raise ValueError("angle_unit must be 'RAD' or 'DEG'")
+    dB = staticmethod(conversion.dB)
+    linear = staticmethod(conversion.linear)
+    BRDF = staticmethod(conversion.BRDF)
+    BRF = staticmethod(conversion.BRF)
+    BSC = staticmethod(conversion.BSC)
 
+    @instrument()
     def convert(self, system='BSC', to='BRDF', system_unit='linear', output_unit='linear', iza=None, vza=None,
-                angle_unit='RAD'):
+                angle_unit='RAD', skip_empty=False, quantification_factor=1):
         """
         Convert the data from BSC, BRDF, BRF to BRDF, BSC or BRF.
 
@@ -918,6 +2110,19 @@ class Raster:
         angle_unit : {'DEG', 'RAD'}, optional
             * 'DEG': All input angles (iza, vza, raa) are in [DEG] (default).
             * 'RAD': All input angles (iza, vza, raa) are in [RAD].
+        skip_empty : bool, optional
+            If True, blocks of 256 rows that only contain the no data value are not converted and stay no data. By
+            default the no data values are converted like all other values. Default is False.
+        quantification_factor : int, optional
+            The values are divided by this factor before they are converted. Use it instead of the quantification
+            factor of Raster.to_array to keep the integer arrays read with Raster.to_array(keep_dtype=True).
+            Default is 1, which has no effect.
+
+        Notes
+        -----
+        Integer arrays of 8 or 16 bit with scalar angles, e.g. read with Raster.to_array(keep_dtype=True), are converted
+        with a lookup table of all 256 or 65536 values (see rasterpy.conversion.lookup_table), which is much faster
+        than evaluating the conversion for each pixel. The lookup table is not used with skip_empty.
 
         Returns
         -------
@@ -929,500 +2134,448 @@ class Raster:
             raise AssertionError(
                 "Before you can convert you must convert the data to an array with Raster.to_array().")
 
-        if isinstance(self.raster, tuple):
-            if system is 'BSC':
-                if to is 'BRDF':
-                    if system_unit is 'linear':
-
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRDF(self.array[i], iza, vza, angle_unit)
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRDF(self.array[i], iza, vza, angle_unit)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
-
-                    elif system_unit is 'dB':
-
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRDF(temp, iza, vza, angle_unit)
-                                array_list.append(temp)
+        if system not in ('BSC', 'BRDF', 'BRF') or to not in ('BSC', 'BRDF', 'BRF'):
+            raise AssertionError("System and to must be 'BSC', 'BRDF' or 'BRF'")
 
-                            self.array = tuple(array_list)
+        if system_unit not in ('linear', 'dB'):
+            raise AssertionError("System unit must be 'linear' or 'dB'")
 
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRDF(temp, iza, vza, angle_unit)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
+        if output_unit not in ('linear', 'dB'):
+            raise AssertionError("Output unit must be 'linear' or 'dB'")
 
-                            self.array = tuple(array_list)
+        for item in self.__as_tuple(self.array):
+            if np.iscomplexobj(item):
+                raise AssertionError("Complex data can't be converted. Read the intensity with "
+                                     "Raster.to_array(component='intensity').")
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        executor = getattr(self, 'executor', None) or SerialExecutor()
+        operands = dict(iza=iza, vza=vza)
+        params = dict(system=system, to=to, system_unit=system_unit, output_unit=output_unit, angle_unit=angle_unit,
+                      quantification_factor=quantification_factor)
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
-
-                elif to is 'BRF':
-                    if system_unit is 'linear':
-
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRDF(self.array[i], iza, vza, angle_unit)
-                                temp = Raster.BRF(temp)
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRDF(self.array[i], iza, vza, angle_unit)
-                                temp = Raster.BRF(temp)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
-
-                    elif system_unit is 'dB':
-
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRDF(temp, iza, vza, angle_unit)
-                                temp = Raster.BRF(temp)
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRDF(temp, iza, vza, angle_unit)
-                                temp = Raster.BRF(temp)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
-
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
-
-            if system is 'BRDF':
-                if to is 'BSC':
-                    if system_unit is 'linear':
+        def run(array, nodata):
+            # A lookup is as cheap as the check of skip_empty, so the lookup table is only used without it.
+            if (not skip_empty and isinstance(array, np.ndarray) and conversion.lookup_supported(array.dtype) and
+                    np.ndim(iza) == 0 and np.ndim(vza) == 0):
+                table = conversion.lookup_table(array.dtype, nodata=nodata, iza=iza, vza=vza, **params)
 
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BSC(self.array[i], iza, vza, angle_unit)
-                                array_list.append(temp)
+                return executor.run(conversion.lookup_kernel, array, table=table)
 
-                            self.array = tuple(array_list)
+            # Lazy dask arrays are converted completely.
+            if skip_empty and isinstance(array, np.ndarray):
+                return executor.run(skip_empty_kernel, array, operands, block_kernel=convert_kernel, nodata=nodata,
+                                    **params)
 
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BSC(self.array[i], iza, vza, angle_unit)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
+            return executor.run(convert_kernel, array, operands, nodata=nodata, **params)
 
-                            self.array = tuple(array_list)
-
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
-
-                    elif system_unit is 'dB':
-
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BSC(temp, iza, vza, angle_unit)
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BSC(temp, iza, vza, angle_unit)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
-
-                            self.array = tuple(array_list)
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
-
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
-
-                elif to is 'BRF':
-                    if system_unit is 'linear':
+        if isinstance(self.raster, tuple):
+            array_list = []
+            for i in srange(len(self.array)):
+                temp = run(self.array[i], self.nodata[i])
+                array_list.append(temp)
 
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRF(self.array[i])
-                                array_list.append(temp)
+            self.array = tuple(array_list)
 
-                            self.array = tuple(array_list)
+        else:
+            self.array = run(self.array, self.nodata)
 
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.BRF(self.array[i])
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
+    @instrument()
+    def focal(self, func, filename, halo=0, band=None, block_size=512, options=None, **kwargs):
+        """
+        Apply a focal operation block by block and stream the result into a file.
 
-                            self.array = tuple(array_list)
+        Each block is read with a halo of neighbouring pixels, so the windows of the operation are complete at the
+        block edges. The halo is cut off and the block is written to the output file at once. Thus, only one block is
+        in memory and the result is the same as for the whole array.
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        Parameters
+        ----------
+        func : callable
+            Function which is called as func(block, nodata=nodata, **kwargs) with a block of the dimension
+            (bands, rows, cols) and returns an array of the same dimension, e.g. rasterpy.focal.boxcar.
+        filename : str or tuple
+            File names of the output files. Supported file extension are '.tif' or '.bin'. If there are more than one
+            raster file you need as much file names in a tuple as raster files.
+        halo : int, optional
+            Number of pixels which are read around each block. Must be at least the radius of the window, i.e.
+            size // 2. Default is 0.
+        band : int, tuple or None, optional
+            You can define which bands you want to use. If None all bands will be recognized.
+        block_size : int, optional
+            Side length of the blocks in pixels without the halo. Default is 512.
+        options : list or None, optional
+            GDAL creation options of the driver, e.g. ['COMPRESS=DEFLATE', 'TILED=YES'] for a tif. Default is None.
+        **kwargs
+            Further arguments of func.
 
-                    elif system_unit is 'dB':
+        Returns
+        -------
+        Raster
+            The output files as float32 with the grid and no data value of the raster files.
 
-                        if output_unit is 'linear':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRF(temp)
-                                array_list.append(temp)
+        """
+        if halo < 0 or block_size < 1:
+            raise AssertionError("The halo must be >= 0 and the block size > 0. The halo is {0} and the block size "
+                                 "{1}".format(str(halo), str(block_size)))
 
-                            self.array = tuple(array_list)
+        if isinstance(self.raster, tuple):
+            if not isinstance(filename, tuple) or len(filename) != len(self.raster):
+                raise AssertionError("You need as much file names in a tuple as raster files.")
 
-                        elif output_unit is 'dB':
-                            array_list = []
-                            for i in srange(len(self.array)):
-                                temp = Raster.linear(self.array[i])
-                                temp = Raster.BRF(temp)
-                                temp = Raster.dB(temp)
-                                temp[np.isnan(temp)] = self.nodata
-                                array_list.append(temp)
+            inds = tuple([self.__focal(k, func, filename[k], halo, band, block_size, options, kwargs)
+                          for k in srange(len(self.raster))])
 
-                            self.array = tuple(array_list)
+            return Raster.__from_dataset(inds, filename)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        return Raster.__from_dataset(self.__focal(None, func, filename, halo, band, block_size, options, kwargs),
+                                     filename)
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+    def __focal(self, file, func, filename, halo, band, block_size, options, kwargs):
+        """
+        Note
+        ----------
+        Focal operation of one raster file. See Raster.focal. Returns the output file opened read-only.
 
+        """
+        if file is None:
+            raster, cols, rows, bands = self.raster, self.cols, self.rows, self.bands
+            geotransform, projection, nodata = self.geotransform, self.projection, self.nodata
         else:
-            if system is 'BSC':
-                if to is 'BRDF':
-                    if system_unit is 'linear':
+            raster, cols, rows, bands = self.raster[file], self.cols[file], self.rows[file], self.bands[file]
+            geotransform, projection, nodata = self.geotransform[file], self.projection[file], self.nodata[file]
 
-                        if output_unit is 'linear':
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
+        band_list = self.__band_list(band, bands)
+        writer = BlockWriter(filename, cols, rows, len(band_list), geotransform, projection, nodata, options=options)
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
+        for yoff in srange(0, rows, block_size):
+            ysize = min(block_size, rows - yoff)
+            y0, y1 = max(yoff - halo, 0), min(yoff + ysize + halo, rows)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+            for xoff in srange(0, cols, block_size):
+                xsize = min(block_size, cols - xoff)
+                x0, x1 = max(xoff - halo, 0), min(xoff + xsize + halo, cols)
 
-                    elif system_unit is 'dB':
+                block = np.stack([raster.GetRasterBand(item).ReadAsArray(x0, y0, x1 - x0, y1 - y0)
+                                  for item in band_list])
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
+                result = func(block, nodata=nodata, **kwargs)
+                writer.write(result[..., yoff - y0:yoff - y0 + ysize, xoff - x0:xoff - x0 + xsize], xoff, yoff)
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        return writer.close()
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+    def block_writer(self, filename, bands, reference=0, dtype='Float32', nodata=None, options=None):
+        """
+        Create an output file with the grid of a raster file, which is written block by block.
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+        Parameters
+        ----------
+        filename : str
+            File name of the output file. Supported file extension are '.tif' or '.bin'.
+        bands : int
+            Number of bands of the output file.
+        reference : int, optional
+            If the Raster import contains several grids, you can specify which of these grids you want to use as
+            reference for geo-spatial information (default=0).
+        dtype : str, optional
+            GDAL data type name of the output file. Default is 'Float32'.
+        nodata : int, float or None, optional
+            No data value of the output file. Default is None.
+        options : list or None, optional
+            GDAL creation options of the driver. Default is None.
 
-                elif to is 'BRF':
-                    if system_unit is 'linear':
+        Returns
+        -------
+        BlockWriter
 
-                        if output_unit is 'linear':
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.BRF(self.array)
+        """
+        def select(value):
+            return value[reference] if isinstance(self.raster, tuple) else value
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.BRF(self.array)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        return BlockWriter(filename, select(self.cols), select(self.rows), bands, select(self.geotransform),
+                           select(self.projection), nodata, dtype, options)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+    def boxcar(self, filename, size=3, band=None, block_size=512, options=None):
+        """
+        Boxcar filter (multilooking) of the raster files. See Raster.focal and rasterpy.focal.boxcar.
 
-                    elif system_unit is 'dB':
+        Parameters
+        ----------
+        filename : str or tuple
+            File names of the output files.
+        size : int, optional
+            Side length of the window in pixels. Must be odd. Default is 3.
+        band : int, tuple or None, optional
+            You can define which bands you want to use. If None all bands will be recognized.
+        block_size : int, optional
+            Side length of the blocks in pixels. Default is 512.
+        options : list or None, optional
+            GDAL creation options of the driver. Default is None.
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.BRF(self.array)
+        Returns
+        -------
+        Raster
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRDF(self.array, iza, vza, angle_unit)
-                            self.array = Raster.BRF(self.array)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        """
+        return self.focal(focal_ops.boxcar, filename, halo=size // 2, band=band, block_size=block_size,
+                          options=options, size=size)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+    def lee(self, filename, size=7, looks=1, band=None, block_size=512, options=None):
+        """
+        Lee speckle filter of intensities. See Raster.focal and rasterpy.focal.lee.
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+        Parameters
+        ----------
+        filename : str or tuple
+            File names of the output files.
+        size : int, optional
+            Side length of the window in pixels. Must be odd. Default is 7.
+        looks : int or float, optional
+            Equivalent number of looks of the image. Default is 1.
+        band : int, tuple or None, optional
+            You can define which bands you want to use. If None all bands will be recognized.
+        block_size : int, optional
+            Side length of the blocks in pixels. Default is 512.
+        options : list or None, optional
+            GDAL creation options of the driver. Default is None.
 
-            if system is 'BRDF':
-                if to is 'BSC':
-                    if system_unit is 'linear':
+        Returns
+        -------
+        Raster
 
-                        if output_unit is 'linear':
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
+        """
+        return self.focal(focal_ops.lee, filename, halo=size // 2, band=band, block_size=block_size,
+                          options=options, size=size, looks=looks)
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+    def set_executor(self, executor='serial', max_workers=None):
+        """
+        Set the execution backend of the array kernels, e.g. of Raster.convert.
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        The arrays are partitioned into row strips, which are processed in parallel by threads or processes. Processes
+        exchange the strips via shared memory, so the arrays are not pickled.
 
-                    elif system_unit is 'dB':
+        Parameters
+        ----------
+        executor : {'serial', 'threads', 'processes'} or executor instance, optional
+            Execution backend. See rasterpy.executor. Default is 'serial'.
+        max_workers : int or None, optional
+            Number of threads or processes. If None the number of CPUs is used.
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
+        Attributes
+        ----------
+        executor : executor.SerialExecutor, executor.ThreadExecutor or executor.ProcessExecutor
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        """
+        self.executor = get_executor(executor, max_workers)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+    @instrument()
+    def dstack(self, unfold=False, copy=False):
+        """
+        Stack 1-D arrays as columns into a 2-D array.
+        Take a sequence of 1-D arrays and stack them as columns to make a single 2-D array.
+        2-D arrays are stacked as-is, just like with numpy.hstack. 1-D arrays are turned into 2-D columns first.
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+        Parameters
+        ----------
+        unfold : bool, optional
+            If the arrays are multi dimensional this option extracts the individual dimension and stack it to an array.
+            Flatten (bands, pixels) and original (bands, rows, cols) arrays are supported. Default is False.
+        copy : bool, optional
+            The unfolded stack of an array is a transposed view of Raster.array whenever the memory layout permits it,
+            so changes of the stack are visible in Raster.array. If True the stack is always a new C-contiguous array,
+            which is allocated once. Default is False.
 
-                elif to is 'BRF':
-                    if system_unit is 'linear':
+        Attributes
+        ----------
+        stack : array_like or tuple
+            Stacked array. If unfold is True and more than one file is imported, it is a tuple with a stack for each
+            file.
 
-                        if output_unit is 'linear':
-                            self.array = Raster.BRF(self.array)
+        See Also
+        --------
+        Raster.to_stack
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.BRF(self.array)
-                            self.array = Raster.dB(self.array)
+        """
+        try:
+            self.array
+        except AttributeError:
+            raise AssertionError(
+                "Before you can convert you must convert the data to an array with Raster.to_array().")
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        if unfold is False:
+            if not isinstance(self.raster, tuple):
+                raise AssertionError("You need more than one array to build a stack.")
 
-                    elif system_unit is 'dB':
+            self.stack = np.column_stack(self.array)
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRF(self.array)
+        elif isinstance(self.raster, tuple):
+            self.stack = tuple([self.__unfold(item, copy) for item in self.array])
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = Raster.BRF(self.array)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        else:
+            self.stack = self.__unfold(self.array, copy)
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+    @staticmethod
+    def __unfold(array, copy=False):
+        """
+        Note
+        ----------
+        Unfold an array with the dimension (bands, pixels) or (bands, rows, cols) to (pixels, bands).
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+        Parameters
+        ----------
+        array:           array_like
+                         Array with more than one band.
 
-            if system is 'BRF':
-                if to is 'BSC':
-                    if system_unit is 'linear':
+        copy:            bool
+                         If True the result is a C-contiguous copy, otherwise a view if the layout permits it.
+        Returns
+        -------
+        array_like
 
-                        if output_unit is 'linear':
-                            self.array = self.array / np.pi
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
+        """
+        if array.ndim < 2 or array.shape[0] < 2:
+            raise AssertionError("You need more than one dimension to build a folded stack.")
 
-                        elif output_unit is 'dB':
-                            self.array = self.array / np.pi
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        # The reshape is a view for C-contiguous arrays and the transpose is always a view.
+        stack = array.reshape((array.shape[0], -1)).T
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        if copy:
+            return np.ascontiguousarray(stack)
 
-                    elif system_unit is 'dB':
+        return stack
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = self.array / np.pi
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
+    def reset(self):
+        """
+        Delete the attributes Raster.array, Raster.stack and Raster.cube and release their memory.
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = self.array / np.pi
-                            self.array = Raster.BSC(self.array, iza, vza, angle_unit)
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        Memory-mapped cubes are flushed to their file before they are released. Copies of Raster.copy keep the memory
+        of the array until they are deleted or changed. It stays read-only, because the Raster doesn't refer to it
+        anymore.
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+        Returns
+        -------
+        int
+            Number of bytes of the released arrays. Views of the same memory, e.g. an unfolded stack of the array, are
+            counted once. Lazy dask arrays are not counted.
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+        """
+        released = dict()
 
-                elif to is 'BRDF':
-                    if system_unit is 'linear':
+        for name in ('_Raster__array', 'cube', 'stack'):
+            value = self.__dict__.pop(name, None)
 
-                        if output_unit is 'linear':
-                            self.array = self.array / np.pi
+            for item in self.__as_tuple(value):
+                if not isinstance(item, np.ndarray):
+                    continue
 
-                        elif output_unit is 'dB':
-                            self.array = self.array / np.pi
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+                if isinstance(item, np.memmap):
+                    item.flush()
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
+                # Views are counted with the array that owns the memory.
+                base = item
+                while isinstance(base.base, np.ndarray):
+                    base = base.base
 
-                    elif system_unit is 'dB':
+                released[id(base)] = base.nbytes
 
-                        if output_unit is 'linear':
-                            self.array = Raster.linear(self.array)
-                            self.array = self.array / np.pi
+        self.__copies = []
+        self.__shared = []
+        self.__dict__.pop('window', None)
 
-                        elif output_unit is 'dB':
-                            self.array = Raster.linear(self.array)
-                            self.array = self.array / np.pi
-                            self.array = Raster.dB(self.array)
-                            self.array[np.isnan(self.array)] = self.nodata
+        return sum(released.values())
 
-                        else:
-                            raise AssertionError("Output unit must be 'linear' or 'dB'")
 
-                    else:
-                        raise AssertionError("System unit must be 'linear' or 'dB'")
+class VsimemFile(object):
+    """
+    Owner of a file in the in-memory file system of GDAL (/vsimem/). The file is deleted with the owner.
+    """
 
-    def dstack(self, unfold=False):
-        """
-        Stack 1-D arrays as columns into a 2-D array.
-        Take a sequence of 1-D arrays and stack them as columns to make a single 2-D array.
-        2-D arrays are stacked as-is, just like with numpy.hstack. 1-D arrays are turned into 2-D columns first.
+    def __init__(self, name):
+        self.name = name
 
-        Parameters
-        ----------
-         unfold : bool, optional
-            If the arrays are multi dimensional this option extracts the individual dimension and stack it to an array.
-            Default is False.
+    def __del__(self):
+        try:
+            gdal.Unlink(self.name)
+        except Exception:
+            pass
 
-        Attributes
-        ----------
-        stack : array_like
-            Stacked array.
 
-        """
-        try:
-            self.array
-        except AttributeError:
-            raise AssertionError(
-                "Before you can convert you must convert the data to an array with Raster.to_array().")
+class BlockWriter(object):
+    """
+    Output file, which is written block by block, so the result of a block-wise operation is never in memory as a
+    whole. Use Raster.block_writer to create a file with the grid of a raster file.
 
-        if unfold is False:
-            if not isinstance(self.raster, tuple):
-                raise AssertionError("You need more than one array to build a stack.")
+    Parameters
+    ----------
+    filename : str
+        File name of the output file. Supported file extension are '.tif' or '.bin'.
+    cols, rows, bands : int
+        Dimension of the output file.
+    geotransform : tuple
+        Geotransform of the output file.
+    projection : str
+        Projection of the output file as WKT.
+    nodata : int, float or None, optional
+        No data value of the output file. Default is None.
+    dtype : str, optional
+        GDAL data type name of the output file. Default is 'Float32'.
+    options : list or None, optional
+        GDAL creation options of the driver. Default is None.
 
-            self.stack = np.column_stack(self.array)
+    """
 
+    def __init__(self, filename, cols, rows, bands, geotransform, projection, nodata=None, dtype='Float32',
+                 options=None):
+        extension = filename.split('.')[-1]
+        if extension == 'tif' or extension == 'tiff':
+            outdriver = gdal.GetDriverByName("GTiff")
+        elif extension == 'bin':
+            outdriver = gdal.GetDriverByName('ENVI')
         else:
-            if not isinstance(self.raster, tuple):
-                if self.bands < 2:
-                    raise AssertionError("You need more than one dimension to build a folded stack.")
+            raise AssertionError(
+                "File extension must be `tif` or `bin`. The actual extension is {0}".format(str(extension)))
 
-                elif self.array.ndim >= 3:
-                    self.flatten()
+        self.filename = filename
+        self.dataset = outdriver.Create(filename, cols, rows, bands, gdal.GetDataTypeByName(dtype), options or [])
 
-                else:
-                    array_list = []
-                    for i in srange(self.bands):
-                        array_list.append(self.array[i])
+        if self.dataset is None:
+            raise IOError("Couldn't create file {0}.".format(str(filename)))
 
-                    array = tuple(array_list)
+        self.dataset.SetGeoTransform(geotransform)
+        self.dataset.SetProjection(projection)
 
-                    self.stack = np.column_stack(array)
+        if nodata is not None:
+            for j in srange(bands):
+                self.dataset.GetRasterBand(j + 1).SetNoDataValue(nodata)
 
-            else:
-                band_list = []
-                for i in srange(len(self.bands)):
+    def write(self, block, xoff=0, yoff=0):
+        """
+        Write a block with the dimension (bands, rows, cols) or (rows, cols) at the pixel offset (xoff, yoff).
+        """
+        if self.dataset is None:
+            raise AssertionError("The file {0} is already closed.".format(str(self.filename)))
 
-                    if self.bands[i] < 2:
-                        raise AssertionError("You need more than one dimension to build a folded stack.")
+        block = block if block.ndim > 2 else block[np.newaxis]
 
-                    elif self.array[i].ndim >= 3:
-                        self.flatten()
+        for j in srange(block.shape[0]):
+            self.dataset.GetRasterBand(j + 1).WriteArray(block[j], xoff, yoff)
 
-                    else:
-                        array_list = []
-                        for j in srange(self.bands[i]):
-                            array_list.append(self.array[i][j])
+    def close(self):
+        """
+        Close the file, so that it is complete.
 
-                        array_stack = np.column_stack(tuple(array_list))
+        Returns
+        -------
+        osgeo.gdal.Dataset
+            The file opened read-only.
 
-                        band_list.append(array_stack)
+        """
+        # The data set must be closed, before the file is complete.
+        self.dataset = None
 
-                self.stack = tuple(band_list)
+        return gdal.Open(self.filename, GA_ReadOnly)
 
-    def reset(self):
-        """
-        Delete the attributes Raster.array and Raster.stack
-        """
-        try:
-            del self.array
-        except AttributeError:
-            pass
+    def __enter__(self):
+        return self
 
-        try:
-            del self.stack
-        except AttributeError:
-            pass
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.dataset = None
@@ -51,6 +51,7 @@ setup(name='rasterpy',
       # package_data={"": ["*.txt"]},
       include_package_data=True,
       install_requires=['numpy'],
+      extras_require={'dask': ['dask[array]']},
       setup_requires=[
           'pytest-runner',
       ],
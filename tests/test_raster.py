@@ -1,4 +1,7 @@
 import os
+import pickle
+import subprocess
+import sys
 from distutils import dir_util
 
 from pytest import fixture
@@ -150,3 +153,761 @@ class TestRaiseTuple:
         ras = rpy.Raster(files, path=None)
         with pytest.raises(AssertionError):
             ras.dstack()
+
+
+class TestDstack:
+    def test_unfold_flatten(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array()
+        ras.dstack(unfold=True)
+
+        assert ras.stack.shape == (62328, 3)
+        assert np.allclose(ras.stack[100], ras.array[:, 100])
+
+    def test_unfold_3d(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False)
+        ras.dstack(unfold=True, copy=True)
+
+        assert ras.array.ndim == 3
+        assert ras.stack.shape == (62328, 3)
+        assert ras.stack.flags['C_CONTIGUOUS']
+        assert np.allclose(ras.stack[318], ras.array[:, 1, 0])
+
+    def test_unfold_tuple_3d(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+        ras = rpy.Raster(files, path=None)
+        ras.to_array(flatten=False)
+        ras.dstack(unfold=True)
+
+        assert len(ras.stack) == 2
+        assert ras.stack[1].shape == (62328, 3)
+
+    def test_unfold_one_band(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(band=1)
+        with pytest.raises(AssertionError):
+            ras.dstack(unfold=True)
+
+
+def polygon_shape(filename, windows):
+    from osgeo import ogr
+
+    shape = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(filename)
+    layer = shape.CreateLayer('zones', geom_type=ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn('zone', ogr.OFTInteger))
+
+    for i, (xoff, yoff, xsize, ysize) in enumerate(windows):
+        xmin, ymax = 625680.0 + xoff * 20, 5693480.0 - yoff * 20
+        xmax, ymin = xmin + xsize * 20, ymax - ysize * 20
+
+        wkt = 'POLYGON (({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))'.format(xmin, ymax, xmax, ymin)
+        feat = ogr.Feature(layer.GetLayerDefn())
+        feat.SetGeometry(ogr.CreateGeometryFromWkt(wkt))
+        feat.SetField('zone', i + 10)
+        layer.CreateFeature(feat)
+
+    shape = None
+
+    return filename
+
+
+class TestZonalStats:
+    def test_zonal_stats(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        windows = ((10, 20, 100, 50), (200, 100, 50, 40))
+        shp = polygon_shape(datadir('zones.shp'), windows)
+
+        ras = rpy.Raster(file1, path=None)
+        result = ras.zonal_stats(shp, shp_id='zone', stats=('count', 'mean', 'median', 'max'), block_size=32)
+
+        ras.to_array(flatten=False)
+
+        assert result.id == [10, 11]
+        assert result.mean.shape == (2, 3)
+
+        for i, (xoff, yoff, xsize, ysize) in enumerate(windows):
+            values = ras.array[:, yoff:yoff + ysize, xoff:xoff + xsize].reshape((3, -1))
+
+            assert np.allclose(result.count[i], xsize * ysize)
+            assert np.allclose(result.mean[i], values.mean(axis=1))
+            assert np.allclose(result.median[i], np.median(values, axis=1))
+            assert np.allclose(result.max[i], values.max(axis=1))
+
+    def test_zonal_stats_tuple(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        shp = polygon_shape(datadir('zones.shp'), ((10, 20, 100, 50),))
+
+        ras = rpy.Raster((file1, file2), path=None)
+        result = ras.zonal_stats(shp, stats='mean', band=1)
+
+        assert len(result) == 2
+        assert result[0].mean.shape == (1,)
+        assert np.allclose(result[0].mean, result[1].mean)
+
+    def test_zonal_stats_unsupported(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        shp = polygon_shape(datadir('zones.shp'), ((10, 20, 100, 50),))
+
+        ras = rpy.Raster(file1, path=None)
+        with pytest.raises(AssertionError):
+            ras.zonal_stats(shp, stats=('mode',))
+
+
+class TestProfiler:
+    def test_profiler(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        records = []
+
+        with rpy.Profiler(trace_allocations=True, callback=records.append) as prof:
+            ras = rpy.Raster(file1, path=None)
+            ras.to_array()
+            ras.write(ras.array[0].reshape((196, 318)), datadir('out.tif'))
+
+        ras.to_array()
+        summary = prof.summary()
+
+        assert len(records) == 3
+        assert summary['Raster.to_array'].calls == 1
+        assert summary['Raster.to_array'].bytes_out == ras.array.nbytes
+        assert summary['Raster.write'].bytes_written == ras.array[0].nbytes
+        assert summary['Raster.to_array'].allocated > 0
+
+    def test_nested_peak(self):
+        from rasterpy.profiling import instrument
+
+        @instrument()
+        def inner():
+            return np.ones(10 ** 5).sum()
+
+        @instrument()
+        def outer():
+            array = np.ones(10 ** 6)
+            del array
+            return inner()
+
+        with rpy.Profiler(trace_allocations=True) as prof:
+            outer()
+
+        summary = prof.summary()
+
+        assert summary['Raster.outer'].allocated >= 8 * 10 ** 6
+        assert summary['Raster.inner'].allocated < 8 * 10 ** 6
+
+
+class TestGdalConfig:
+    def test_scope(self, datadir):
+        from osgeo import gdal
+
+        file1 = datadir('RGB.BRDF.tif')
+        cachemax = gdal.GetCacheMax()
+        threads = gdal.GetConfigOption('GDAL_NUM_THREADS')
+
+        with rpy.gdal_config(cachemax=64, num_threads=2, vsi_cache=True):
+            assert gdal.GetCacheMax() == 64 * 2 ** 20
+            assert gdal.GetConfigOption('GDAL_NUM_THREADS') == '2'
+            assert gdal.GetConfigOption('VSI_CACHE') == 'TRUE'
+
+            ras = rpy.Raster(file1, path=None)
+            ras.to_array()
+
+        assert gdal.GetCacheMax() == cachemax
+        assert gdal.GetConfigOption('GDAL_NUM_THREADS') == threads
+        assert ras.array.shape == (3, 62328)
+
+
+class TestMosaic:
+    def test_mosaic(self, datadir):
+        from osgeo import gdal
+
+        file1 = datadir('RGB.BRDF.tif')
+        left = datadir('left.tif')
+        right = datadir('right.tif')
+
+        gdal.Translate(left, file1, srcWin=[0, 0, 150, 196])
+        gdal.Translate(right, file1, srcWin=[150, 0, 168, 196])
+
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False)
+
+        tiles = rpy.Raster((left, right), path=None)
+        mosaic = tiles.mosaic()
+
+        assert mosaic.cols == 318
+        assert mosaic.rows == 196
+        assert mosaic.geotransform == ras.geotransform
+
+        mosaic.to_array(flatten=False, window=(140, 10, 20, 20))
+
+        assert np.allclose(mosaic.array, ras.array[:, 10:30, 140:160])
+
+    def test_mosaic_one(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        with pytest.raises(AssertionError):
+            ras.mosaic()
+
+
+def point_shape(filename, pixels):
+    from osgeo import ogr
+
+    shape = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(filename)
+    layer = shape.CreateLayer('points', geom_type=ogr.wkbPoint)
+
+    for x, y in pixels:
+        point = ogr.Geometry(ogr.wkbPoint)
+        point.AddPoint(625680.0 + (x + 0.5) * 20, 5693480.0 - (y + 0.5) * 20)
+
+        feat = ogr.Feature(layer.GetLayerDefn())
+        feat.SetGeometry(point)
+        layer.CreateFeature(feat)
+
+    shape = None
+
+    return filename
+
+
+class TestExtractPoint:
+    def test_extract_point(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        shp = point_shape(datadir('points.shp'), ((10, 20), (200, 100), (400, 10)))
+
+        ras = rpy.Raster(file1, path=None)
+        values = ras.extract_point(shp)
+
+        ras.to_array(flatten=False)
+
+        assert len(values) == 2
+        assert values[1][0] == 1
+        assert np.allclose(values[1][1], ras.array[:, 100, 200])
+
+    def test_extract_point_tiles(self, datadir):
+        from osgeo import gdal
+
+        file1 = datadir('RGB.BRDF.tif')
+        left = datadir('left.tif')
+        right = datadir('right.tif')
+
+        gdal.Translate(left, file1, srcWin=[0, 0, 150, 196])
+        gdal.Translate(right, file1, srcWin=[150, 0, 168, 196])
+
+        shp = point_shape(datadir('points.shp'), ((10, 20), (200, 100), (160, 5), (400, 10)))
+
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False)
+
+        tiles = rpy.Raster((left, right), path=None)
+        values = tiles.extract_point(shp, band=2)
+
+        assert [item[0] for item in values[0]] == [0]
+        assert [item[0] for item in values[1]] == [1, 2]
+        assert np.allclose(values[1][0][1], ras.array[1, 100, 200])
+        assert np.allclose(values[1][1][1], ras.array[1, 5, 160])
+
+
+class TestConvert:
+    def test_convert(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array()
+        array = ras.array
+
+        ras.convert(system='BRDF', to='BSC', system_unit='dB', output_unit='dB', iza=30, vza=20, angle_unit='DEG')
+
+        expected = 10 * np.log10(10 ** (array / 10) * np.cos(np.radians(30)) * np.cos(np.radians(20)) * 4 * np.pi)
+        assert np.allclose(ras.array, expected)
+
+    @pytest.mark.parametrize('executor', ('threads', 'processes'))
+    def test_executor(self, datadir, executor):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        angle = np.linspace(0.1, 0.5, 318)
+
+        ras = rpy.Raster(files, path=None)
+        ras.to_array(flatten=False)
+        ras.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='linear')
+        ras.convert(system='BRF', to='BSC', output_unit='dB', iza=angle, vza=0.2)
+
+        ras2 = rpy.Raster(files, path=None)
+        ras2.to_array(flatten=False)
+        ras2.set_executor(executor, max_workers=2)
+        ras2.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='linear')
+        ras2.convert(system='BRF', to='BSC', output_unit='dB', iza=angle, vza=0.2)
+        ras2.executor.close()
+
+        assert np.allclose(ras2.array[0], ras.array[0])
+        assert np.allclose(ras2.array[1], ras.array[1])
+
+    @pytest.mark.skipif(sys.version_info < (3, 8), reason="ProcessExecutor requires Python 3.8")
+    def test_process_output(self):
+        import gc
+        from rasterpy.conversion import convert_kernel
+
+        array = np.linspace(0.1, 1, 2 * 60 * 40).reshape((2, 60, 40))
+
+        with rpy.ProcessExecutor(max_workers=2) as executor:
+            out = executor.run(convert_kernel, array, system='BRDF', to='BRF')
+
+        view = out[1]
+        del out
+        gc.collect()
+
+        view[0, 0] += 1
+        assert np.allclose(view[1:], array[1, 1:] * np.pi)
+
+    def test_system(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array()
+        with pytest.raises(AssertionError):
+            ras.convert(system='BSS')
+
+    @pytest.mark.parametrize('executor', ('serial', 'threads'))
+    def test_lookup_table(self, datadir, executor):
+        file1 = datadir('RGB.byte.tif')
+
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False, keep_dtype=True)
+        assert ras.array.dtype == np.uint8
+        ras.set_executor(executor, max_workers=2)
+        ras.convert(system='BSC', to='BRF', output_unit='dB', iza=0.5, vza=0.3, quantification_factor=100)
+        ras.executor.close()
+
+        ras2 = rpy.Raster(file1, path=None)
+        ras2.to_array(flatten=False, quantification_factor=100)
+        ras2.convert(system='BSC', to='BRF', output_unit='dB', iza=0.5, vza=0.3)
+
+        assert np.allclose(ras.array, ras2.array, atol=1e-4)
+
+    def test_integer_read(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+
+        ras = rpy.Raster((file1, file1), path=None)
+        ras.to_array()
+
+        assert ras.array[0].dtype == np.float64
+
+        ras.to_array(keep_dtype=True)
+
+        assert ras.array[0].dtype == np.uint8
+
+        ras.reshape()
+        ras.flatten()
+
+        assert ras.array[1].dtype == np.uint8
+
+        ras.to_array(quantification_factor=100, keep_dtype=True)
+
+        assert ras.array[0].dtype == np.float32
+        assert ras.array[0].max() > 1
+
+    def test_integer_set_nodata(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+
+        for keep_dtype in (False, True):
+            ras = rpy.Raster(file1, path=None)
+            ras.to_array(flatten=False, keep_dtype=keep_dtype)
+            zeros = ras.array == 0
+            ras.set_nodata(np.nan)
+
+            assert ras.array.dtype == np.float64
+            assert np.isnan(ras.array[zeros]).all()
+            assert not np.isnan(ras.array[~zeros]).any()
+
+        ras = rpy.Raster((file1, file1), path=None)
+        ras.to_array(flatten=False, keep_dtype=True)
+        ras.set_nodata(255)
+
+        assert ras.array[0].dtype == np.uint8
+
+    def test_integer_read_without_nodata(self, datadir, tmpdir):
+        from osgeo import gdal
+
+        filename = str(tmpdir.join('byte.tif'))
+        outds = gdal.GetDriverByName('GTiff').Create(filename, 4, 3, 1, gdal.GDT_Byte)
+        outds.GetRasterBand(1).WriteArray(np.arange(12, dtype=np.uint8).reshape(3, 4))
+        outds = None
+
+        ras = rpy.Raster((filename, filename), path=None)
+        ras.to_array()
+
+        assert ras.nodata == (-99999, -99999)
+        assert ras.array[0].dtype == np.float64
+        assert np.array_equal(ras.array[1], np.arange(12))
+
+        ras.to_array(keep_dtype=True)
+
+        assert ras.array[0].dtype == np.uint8
+        assert np.array_equal(ras.array[1], np.arange(12))
+
+
+class TestConversion:
+    def test_static_methods(self):
+        from rasterpy import conversion
+
+        x = np.linspace(0.1, 1, 10)
+
+        assert np.allclose(rpy.Raster.dB(x), conversion.dB(x))
+        assert np.allclose(rpy.Raster.BRDF(x, 0.3, 0.2), conversion.BRDF(x, 0.3, 0.2))
+        assert np.allclose(conversion.BSC(conversion.BRDF(x, 0.3, 0.2), 0.3, 0.2), x)
+
+    @pytest.mark.skipif(sys.version_info < (3, 7), reason="Lazy imports require Python 3.7")
+    def test_import_without_gdal(self):
+        statement = "import sys, rasterpy; assert not [item for item in sys.modules if item.startswith('osgeo')]"
+
+        subprocess.check_call([sys.executable, '-c', statement])
+
+
+class TestMetadataTable:
+    def test_table(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2, file2)
+
+        ras = rpy.Raster(files, path=None)
+
+        assert len(ras.table) == 3
+        assert ras.table.column('cols') == ras.cols
+        assert ras.table.column('geotransform') == ras.geotransform
+        assert ras.table[1].projection == ras.projection[1]
+        assert ras.projection[1] is ras.projection[2]
+        assert ras.srs[1] is ras.srs[2]
+
+    def test_derived_attributes(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+        file2 = datadir('RGB.BRDF.tif')
+
+        ras = rpy.Raster((file1, file2), path=None)
+
+        # Only the table is stored, the attributes are created on first access.
+        assert not [item for item in ('cols', 'xmin', 'nodata', 'info') if item in ras.__dict__]
+        assert ras.xmin == tuple(item[0] for item in ras.geotransform)
+        assert ras.driver[0].ShortName == 'GTiff'
+        assert ras.info.dim == [ras.rows, ras.cols, ras.bands]
+
+        ras.nodata = (1, 2)
+
+        assert ras.table[1].nodata == 2
+        assert pickle.loads(pickle.dumps(ras)).nodata == (1, 2)
+
+        ras = rpy.Raster(file1, path=None)
+
+        assert ras.cols == 791
+        assert ras.dim == [718, 791, 3]
+        assert ras.info['nodata'] == ras.nodata == 0
+
+    def test_bounds(self):
+        from rasterpy.auxiliary import MetadataTable
+
+        table = MetadataTable(cols=[10, 20], rows=[10, 5], bands=[1, 1],
+                              geotransform=[(0, 1, 0, 10, 0, -1), (100, 2, 0, 50, 0, -2)], nodata=[0, 0],
+                              projection=['WKT', 'WKT'], dtype=['Byte', 'Byte'], driver=['GTiff', 'GTiff'])
+
+        assert np.allclose(table.bounds(), [[0, 0, 10, 10], [100, 40, 140, 50]])
+        assert table.intersects((5, 5, 120, 45)).tolist() == [0, 1]
+        assert table.intersects((20, 20, 30, 30)).tolist() == []
+        assert not table.same_dim()
+        assert table.projections == ['WKT']
+
+
+class TestCopy:
+    def test_copy_on_write(self, datadir):
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        ras.to_array(flatten=False)
+        source = ras.array
+        array = np.array(source)
+
+        copy = ras.copy()
+
+        assert not copy.materialized
+        assert np.shares_memory(np.asarray(copy), source)
+        assert not np.shares_memory(copy.__array__(copy=True), source)
+
+        with pytest.raises(ValueError):
+            copy.__array__(dtype=np.float32, copy=False)
+
+        copy[0, 0, 0] = -1
+        copy *= 2
+
+        assert copy.materialized
+        assert np.array_equal(ras.array, array)
+        assert copy[0, 0, 0] == -2
+
+    def test_change_source(self, datadir):
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        ras.to_array(flatten=False)
+        source = ras.array
+        array = np.array(source)
+
+        copy = ras.copy()
+
+        # The shared array is read-only for older references.
+        with pytest.raises(ValueError):
+            source[0, 0, 0] = -1
+
+        ras.array[0, 0, 0] = -1
+        ras.array *= 2
+
+        assert copy.materialized
+        assert np.array_equal(copy, array)
+        assert ras.array[0, 0, 0] == -2
+
+        copy = ras.copy()
+        ras.convert(system='BRDF', to='BRF')
+
+        assert np.array_equal(copy[0, 0, 0], -2)
+
+    def test_set_nodata(self, datadir):
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        ras.to_array(flatten=False)
+        array = np.array(ras.array)
+
+        copy = ras.copy()
+        ras.set_nodata(-1)
+
+        assert np.array_equal(copy, array)
+
+    def test_reset(self, datadir):
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        ras.to_array(flatten=False)
+        ras.dstack(unfold=True)
+        nbytes = ras.array.nbytes
+
+        assert ras.reset() == nbytes
+        assert not hasattr(ras, 'array')
+        assert not hasattr(ras, 'stack')
+        assert ras.reset() == 0
+
+
+class TestInMemory:
+    def test_bytes(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False)
+
+        with open(file1, 'rb') as f:
+            ras2 = rpy.Raster.from_bytes(f.read())
+
+        ras2.to_array(flatten=False)
+
+        assert ras2.geotransform == ras.geotransform
+        assert np.array_equal(ras2.array, ras.array)
+
+        content = ras2.write(ras2.array, 'out.tif', to_bytes=True, options=['COMPRESS=DEFLATE'])
+        ras3 = rpy.Raster.from_bytes(content)
+        ras3.to_array(flatten=False)
+
+        assert isinstance(content, bytes)
+        assert np.array_equal(ras3.array, ras.array)
+
+    def test_from_array(self):
+        array = np.arange(2 * 30 * 40, dtype=np.float32).reshape((2, 30, 40))
+        geotransform = (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0)
+
+        ras = rpy.Raster.from_array(array, geotransform, nodata=-1)
+
+        assert ras.dim == [30, 40, 2]
+        assert ras.geotransform == geotransform
+        assert ras.nodata == -1
+
+        ras.to_array(flatten=False, window=(5, 10, 20, 10))
+
+        assert np.array_equal(ras.array, array[:, 10:20, 5:25])
+
+    def test_bytes_format(self, datadir):
+        ras = rpy.Raster(datadir('RGB.byte.tif'), path=None)
+        ras.to_array(flatten=False)
+
+        with pytest.raises(AssertionError):
+            ras.write(ras.array, 'out.bin', to_bytes=True)
+
+
+class TestFocal:
+    def test_boxcar(self):
+        from rasterpy import focal
+
+        array = np.random.rand(2, 20, 30)
+        result = focal.boxcar(array, size=3)
+
+        assert np.isclose(result[1, 5, 7], array[1, 4:7, 6:9].mean())
+        assert np.isclose(result[0, 0, 0], array[0, :2, :2].mean())
+
+    def test_blocks(self, datadir, tmpdir):
+        from rasterpy import focal
+
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        ras.to_array(flatten=False)
+        expected = focal.lee(ras.array, size=5, looks=4, nodata=ras.nodata)
+
+        out = ras.lee(str(tmpdir.join('lee.tif')), size=5, looks=4, block_size=16)
+        out.to_array(flatten=False)
+
+        assert out.nodata == ras.nodata
+        assert out.geotransform == ras.geotransform
+        assert np.allclose(out.array, expected)
+
+    def test_size(self, datadir, tmpdir):
+        ras = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+
+        with pytest.raises(AssertionError):
+            ras.boxcar(str(tmpdir.join('boxcar.tif')), size=4)
+
+
+class TestPickle:
+    def test_pickle(self, datadir):
+        file1 = datadir('RGB.byte.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        ras = rpy.Raster(files, path=None)
+        ras.set_executor('threads', max_workers=2)
+
+        ras2 = pickle.loads(pickle.dumps(ras))
+
+        assert ras2.cols == ras.cols
+        assert ras2.geotransform == ras.geotransform
+        assert ras2.srs[0].ExportToWkt() == ras.srs[0].ExportToWkt()
+
+        ras.to_array(flatten=False)
+        ras2.to_array(flatten=False)
+
+        assert np.array_equal(ras2.array[0], ras.array[0])
+        assert np.array_equal(ras2.array[1], ras.array[1])
+
+    def test_pickle_mosaic(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        ras = rpy.Raster(file1, path=None)
+        ras.to_array(flatten=False)
+
+        tiles = rpy.Raster((file1, file1), path=None)
+        mosaic = pickle.loads(pickle.dumps(tiles.mosaic()))
+        mosaic.to_array(flatten=False)
+
+        assert np.allclose(mosaic.array, ras.array)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason="rasterpy.aio requires Python 3.5")
+class TestAio:
+    def test_read(self, datadir):
+        import asyncio
+        from rasterpy import aio
+
+        files = [datadir('RGB.byte.tif'), datadir('RGB.BRDF.tif')]
+
+        # asyncio.gather binds its future to the current event loop.
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            rasters = loop.run_until_complete(asyncio.gather(*[aio.Raster.aopen(item) for item in files]))
+            loop.run_until_complete(asyncio.gather(*[item.ato_array(flatten=False) for item in rasters]))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+        for item, filename in zip(rasters, files):
+            ras = rpy.Raster(filename, path=None)
+            ras.to_array(flatten=False)
+            assert np.array_equal(item.array, ras.array)
+
+    @pytest.mark.skipif(sys.version_info < (3, 7), reason="asyncio.run requires Python 3.7")
+    def test_run(self, datadir):
+        import asyncio
+        from rasterpy import aio
+
+        # asyncio.run doesn't set a current event loop.
+        ras = asyncio.run(aio.Raster.aopen(datadir('RGB.byte.tif')))
+
+        assert ras.cols == 791
+
+    def test_write(self, datadir, tmpdir):
+        import asyncio
+        from rasterpy import aio
+
+        aio.set_limits(max_in_flight=1)
+        loop = asyncio.new_event_loop()
+        try:
+            ras = loop.run_until_complete(aio.Raster.aopen(datadir('RGB.byte.tif')))
+            loop.run_until_complete(ras.ato_array(flatten=False))
+            loop.run_until_complete(ras.awrite(ras.array, str(tmpdir.join('aio.tif'))))
+        finally:
+            loop.close()
+            aio.set_limits(max_in_flight=256)
+
+        ras2 = rpy.Raster(str(tmpdir.join('aio.tif')), path=None)
+        ras2.to_array(flatten=False)
+        assert np.array_equal(ras2.array, ras.array)
+
+
+class TestPolsar:
+    def test_decompositions(self, tmpdir):
+        from rasterpy import polsar
+
+        geotransform = (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0)
+        k = np.random.randn(3, 40, 30, 3) + 1j * np.random.randn(3, 40, 30, 3)
+        matrix = np.mean(k[..., :, np.newaxis] * np.conj(k[..., np.newaxis, :]), axis=0).astype(np.complex64)
+
+        filenames = []
+        for name, (i, j, part) in zip(polsar.element_names('C3'), polsar.ELEMENTS):
+            values = matrix[..., i, j].imag if part == 'imag' else matrix[..., i, j].real
+            element = rpy.Raster.from_array(values.astype(np.float32), geotransform)
+            element.write(values.astype(np.float32), str(tmpdir.join(name + '.bin')))
+            filenames.append(name + '.bin')
+
+        ras = rpy.Raster(tuple(filenames), path=str(tmpdir))
+
+        pauli = polsar.pauli(ras, filename='pauli.tif', block_size=16)
+        pauli.to_array(flatten=False)
+        h_a_alpha = polsar.h_a_alpha(ras, block_size=16)
+
+        assert pauli.geotransform == geotransform
+        assert np.allclose(pauli.array, polsar.pauli_kernel(polsar.t3_from_c3(matrix)), rtol=1e-4)
+        assert np.allclose(h_a_alpha, polsar.h_a_alpha_kernel(polsar.t3_from_c3(matrix)), atol=1e-3)
+        assert ((h_a_alpha[0] >= 0) & (h_a_alpha[0] <= 1)).all()
+
+        # A failing kernel closes the file, so the written blocks are complete.
+        calls = []
+
+        def kernel(t3):
+            calls.append(len(t3))
+            if len(calls) > 1:
+                raise ValueError("kernel")
+
+            return polsar.pauli_kernel(t3)
+
+        # The traceback keeps the frame of decompose and thereby its writer alive.
+        with pytest.raises(ValueError) as info:
+            polsar.decompose(ras, kernel, 'T3', filename='failed.tif', block_size=16)
+
+        failed = rpy.Raster('failed.tif', path=str(tmpdir))
+        failed.to_array(flatten=False)
+        assert np.allclose(failed.array[:, :16], pauli.array[:, :16])
+        del info
+
+    def test_freeman_durden(self):
+        from rasterpy import polsar
+
+        # Surface (fs = 2, beta = 0.5), double bounce (fd = 0.5, alpha = -1) and volume (fv = 1) scattering.
+        matrix = np.zeros((1, 3, 3), dtype=np.complex64)
+        matrix[0, 0, 0] = 2 * 0.25 + 0.5 + 1
+        matrix[0, 1, 1] = 2 / 3.
+        matrix[0, 2, 2] = 2 + 0.5 + 1
+        matrix[0, 0, 2] = 2 * 0.5 - 0.5 + 1 / 3.
+        matrix[0, 2, 0] = matrix[0, 0, 2]
+
+        assert np.allclose(polsar.freeman_durden_kernel(matrix)[:, 0], [1, 8 / 3., 2.5])
+
+    def test_no_matrix(self, datadir):
+        from rasterpy import polsar
+
+        ras = rpy.Raster(datadir('RGB.byte.tif'), path=None)
+
+        with pytest.raises(AssertionError):
+            polsar.pauli(ras)
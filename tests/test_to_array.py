@@ -4,6 +4,7 @@ from distutils import dir_util
 from pytest import fixture
 import pytest
 import rasterpy as rpy
+import numpy as np
 from numpy import allclose
 
 
@@ -178,4 +179,373 @@ class TestValues:
         r.to_array(band=(1, 3))
 
         assert allclose(r.array[0].mean(), -16.39290269043384)
-        assert allclose(r.array[1].mean(), -16.39290269043384)
\ No newline at end of file
+        assert allclose(r.array[1].mean(), -16.39290269043384)
+
+
+class TestCube:
+    def test_cube(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+        r.to_cube()
+
+        assert r.cube.shape == (1, 3, 196, 318)
+        assert allclose(r.cube.mean(), -16.48756920623467)
+
+    def test_cube_tuple(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_cube(band=(1, 3))
+
+        assert r.cube.shape == (2, 2, 196, 318)
+        assert r.cube.flags['C_CONTIGUOUS']
+        assert allclose(r.cube[0].mean(), -16.39290269043384)
+        assert allclose(r.cube[1].mean(), -16.39290269043384)
+
+    def test_cube_memmap(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_cube(band=1, memmap=datadir('cube.dat'))
+
+        assert r.cube.shape == (2, 1, 196, 318)
+        assert allclose(r.cube.mean(), -16.961706109713138)
+
+    def test_cube_band_out_of_range(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+
+        with pytest.raises(AssertionError):
+            r.to_cube(band=4)
+
+
+class TestStack:
+    def test_stack(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+        r.to_stack()
+
+        r2 = rpy.Raster(file1, path=None)
+        r2.to_array()
+
+        assert r.stack.shape == (62328, 3)
+        assert allclose(r.stack[100], r2.array[:, 100])
+
+    def test_stack_tuple(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_stack(band=(1, 3))
+
+        assert r.stack.shape == (62328, 4)
+        assert allclose(r.stack[:, :2], r.stack[:, 2:])
+        assert allclose(r.stack.mean(), -16.39290269043384)
+
+
+class TestWindow:
+    def test_window(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+        r.to_array(flatten=False)
+
+        r2 = rpy.Raster(file1, path=None)
+        r2.to_array(window=(10, 20, 100, 50))
+
+        assert r2.array.shape == (3, 5000)
+
+        r2.reshape()
+
+        assert r2.array.shape == (3, 50, 100)
+        assert allclose(r2.array, r.array[:, 20:70, 10:110])
+
+    def test_bbox_tuple(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_array(flatten=False, window=(10, 20, 100, 50))
+
+        r2 = rpy.Raster(files, path=None)
+        r2.to_array(flatten=False, bbox=(625880.0, 5692080.0, 627880.0, 5693080.0))
+
+        assert r2.window == ((10, 20, 100, 50), (10, 20, 100, 50))
+        assert allclose(r2.array[0], r.array[0])
+        assert allclose(r2.array[1], r.array[1])
+
+    def test_window_out_of_range(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+
+        with pytest.raises(AssertionError):
+            r.to_array(window=(300, 0, 100, 50))
+
+        with pytest.raises(AssertionError):
+            r.to_array(bbox=(0.0, 0.0, 10.0, 10.0))
+
+
+class TestTargetGrid:
+    def test_reference_file(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_array(target_grid=0)
+
+        assert r.array[1].shape == (3, 62328)
+        assert allclose(r.array[1].mean(), -16.48756920623467)
+
+    def test_resample(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+
+        geotransform = (625680.0, 40.0, 0.0, 5693480.0, 0.0, -40.0)
+        r.to_array(flatten=False, target_grid=(geotransform, r.projection, 159, 98), resampling='average')
+
+        assert r.array.shape == (3, 98, 159)
+        assert r.geotransform == geotransform
+        assert r.cols == 159
+        assert allclose(r.array.mean(), -16.48756920623467, atol=0.1)
+
+    def test_repeated_warp(self, datadir):
+        import pickle
+
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+        r.to_array(flatten=False)
+        array = r.array.copy()
+
+        geotransform = (625680.0, 40.0, 0.0, 5693480.0, 0.0, -40.0)
+        r.to_array(flatten=False, target_grid=(geotransform, r.projection, 159, 98), resampling='average')
+
+        # The original grid is read from the file again and not from the coarse grid.
+        r.to_array(flatten=False, target_grid=0)
+
+        assert r.array.shape == array.shape
+        assert (r.array == array).all()
+
+        r2 = pickle.loads(pickle.dumps(r))
+        r2.to_array(flatten=False, target_grid=(geotransform, r.projection, 159, 98), resampling='average')
+        r2.to_array(flatten=False, target_grid=0)
+
+        assert (r2.array == array).all()
+
+
+class TestDask:
+    def test_to_dask(self, datadir):
+        pytest.importorskip('dask.array')
+
+        file1 = datadir('RGB.BRDF.tif')
+        r = rpy.Raster(file1, path=None)
+        r.to_array(flatten=False)
+
+        r2 = rpy.Raster(file1, path=None)
+        r2.to_dask(chunks=(1, 64, 64))
+
+        assert r2.array.shape == r.array.shape
+        assert r2.array.chunks[1][0] == 64
+        assert allclose(r2.array.compute(), r.array)
+        assert allclose(r2.array.mean(axis=(1, 2)).compute(), r.array.mean(axis=(1, 2)))
+
+    def test_to_dask_convert(self, datadir):
+        pytest.importorskip('dask.array')
+
+        file1 = datadir('RGB.BRDF.tif')
+        file2 = datadir('RGB.BRDF.tif')
+        files = (file1, file2)
+
+        r = rpy.Raster(files, path=None)
+        r.to_array(flatten=False, window=(10, 20, 100, 50))
+        r.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='dB')
+
+        r2 = rpy.Raster(files, path=None)
+        r2.to_dask(window=(10, 20, 100, 50))
+        r2.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='dB')
+
+        assert r2.window == ((10, 20, 100, 50), (10, 20, 100, 50))
+        assert allclose(r2.array[0].compute(), r.array[0])
+        assert allclose(r2.array[1].compute(), r.array[1])
+
+    def test_band_array(self, datadir):
+        pytest.importorskip('dask.array')
+        from rasterpy.chunked import BandArray
+
+        array = np.arange(2 * 30 * 40, dtype=np.float32).reshape((2, 30, 40))
+        geotransform = (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0)
+
+        r = rpy.Raster.from_array(array, geotransform)
+        r.to_dask()
+        r2 = rpy.Raster.from_array(array + 1, geotransform)
+        r2.to_dask()
+
+        assert r.array.name != r2.array.name
+        assert allclose(r2.array.compute(), array + 1)
+
+        r3 = rpy.Raster(datadir('RGB.BRDF.tif'), path=None)
+        view = BandArray(r3.raster, [1, 2], (0, 0, 10, 10), np.float32, r3.nodata)
+
+        assert view.__array__(dtype=np.float64, copy=None).dtype == np.float64
+        view.close()
+        assert np.asarray(view).shape == (2, 10, 10)
+
+
+class TestBandCache:
+    def test_cache(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+
+        r = rpy.Raster(file1, path=None)
+        r.to_array(band=2, flatten=False)
+
+        rpy.cache.enable(max_bytes=2 ** 24)
+        try:
+            for _ in range(3):
+                r2 = rpy.Raster(file1, path=None)
+                r2.to_array(band=2, flatten=False)
+
+                assert allclose(r2.array, r.array)
+
+            info = rpy.cache.info()
+
+            assert info.misses == 1
+            assert info.hits == 2
+            assert info.entries == 1
+
+        finally:
+            rpy.cache.disable()
+
+    def test_budget(self):
+        from rasterpy.cache import BandCache
+
+        cache = BandCache(max_bytes=1000)
+        for i in range(5):
+            cache.put(i, np.zeros(30))
+
+        assert len(cache) == 4
+        assert cache.info().evictions == 1
+        assert cache.get(0) is None
+
+        with pytest.raises(ValueError):
+            cache.get(4)[0] = 1
+
+    def test_shrink(self):
+        cache = rpy.cache.enable(max_bytes=1000)
+        try:
+            for i in range(4):
+                cache.put(i, np.zeros(30))
+
+            rpy.cache.enable(max_bytes=500)
+
+            assert cache.nbytes <= 500
+            assert len(cache) == 2
+            assert cache.get(3) is not None
+        finally:
+            rpy.cache.disable()
+
+
+class TestSparse:
+    def test_skip_empty(self, tmpdir):
+        array = np.full((2, 128, 96), -99999, dtype=np.float32)
+        array[:, 40:60, 10:30] = 1.5
+
+        ras = rpy.Raster.from_array(array, (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0), nodata=-99999)
+
+        filename = str(tmpdir.join('sparse.tif'))
+        ras.write(array, filename, sparse=True, options=['TILED=YES', 'BLOCKXSIZE=32', 'BLOCKYSIZE=32'])
+
+        r = rpy.Raster(filename, path=None)
+        r.to_array(flatten=False)
+
+        r2 = rpy.Raster(filename, path=None)
+        r2.to_array(flatten=False, skip_empty=True, window=(5, 30, 50, 60))
+
+        assert allclose(r.array, array)
+        assert allclose(r2.array, array[:, 30:90, 5:55])
+
+    def test_convert_skip_empty(self, datadir):
+        file1 = datadir('RGB.BRDF.tif')
+
+        r = rpy.Raster(file1, path=None)
+        r.to_array(flatten=False)
+        r.array[:, :100] = r.nodata
+
+        r2 = rpy.Raster(file1, path=None)
+        r2.to_array(flatten=False)
+        r2.array[:, :100] = r2.nodata
+
+        r.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='dB')
+        r2.convert(system='BRDF', to='BRF', system_unit='dB', output_unit='dB', skip_empty=True)
+
+        assert allclose(r2.array[:, 100:], r.array[:, 100:])
+
+        # The 196 rows are one block of Raster.convert, so the empty rows are checked with smaller blocks.
+        from rasterpy.conversion import convert_kernel
+        from rasterpy.executor import skip_empty_kernel
+
+        r3 = rpy.Raster(file1, path=None)
+        r3.to_array(flatten=False)
+        r3.array[:, :100] = r3.nodata
+
+        rows = []
+
+        def counting_kernel(array, **kwargs):
+            rows.append(array.shape[1])
+            return convert_kernel(array, **kwargs)
+
+        params = dict(system='BRDF', to='BRF', system_unit='dB', output_unit='dB')
+        result = skip_empty_kernel(r3.array, block_kernel=counting_kernel, nodata=r3.nodata, block_rows=50, **params)
+
+        assert (result[:, :100] == r3.nodata).all()
+        assert allclose(result[:, 100:], r.array[:, 100:])
+
+        # The first call derives the data type from one element. The empty blocks of the rows 0 to 99 are skipped.
+        assert rows == [1, 50, 46]
+
+
+class TestComplex:
+    def test_components(self):
+        array = (np.random.randn(2, 300, 40) + 1j * np.random.randn(2, 300, 40)).astype(np.complex64)
+        array[:, :5, :5] = -99999
+        geotransform = (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0)
+
+        ras = rpy.Raster.from_array(array, geotransform, nodata=-99999)
+
+        ras.to_array(flatten=False, component='intensity')
+        assert ras.array.dtype == np.float32
+        assert allclose(ras.array[:, 5:], np.abs(array[:, 5:]) ** 2, rtol=1e-5)
+        assert (ras.array[:, :5, :5] == -99999).all()
+
+        ras.to_array(flatten=False, component='phase', band=2)
+        assert allclose(ras.array[0, 5:], np.angle(array[1, 5:]), atol=1e-6)
+
+        ras.to_array(flatten=False)
+        assert np.iscomplexobj(ras.array)
+
+        with pytest.raises(AssertionError):
+            ras.convert(system='BSC', to='BRDF', iza=0.5, vza=0.5)
+
+    def test_file(self, tmpdir):
+        array = (np.random.randn(1, 300, 40) + 1j * np.random.randn(1, 300, 40)).astype(np.complex64)
+        geotransform = (600000.0, 10.0, 0.0, 5700000.0, 0.0, -10.0)
+
+        filename = str(tmpdir.join('slc.tif'))
+        rpy.Raster.from_array(array, geotransform).write(array, filename)
+
+        ras = rpy.Raster(filename, path=None)
+        ras.to_array(flatten=False)
+
+        assert ras.dtype == 'CFloat32'
+        assert ras.array.dtype == np.complex64
+        assert np.array_equal(ras.array, array)
+
+        with pytest.raises(AssertionError):
+            ras.convert(system='BSC', to='BRDF', iza=0.5, vza=0.5)
+
+        ras.to_array(flatten=False, component='amplitude')
+        assert allclose(ras.array, np.abs(array), rtol=1e-5)